@@ -6,6 +6,7 @@ Archivo principal de la aplicación web
 
 import sys
 import os
+import copy
 
 # Configurar codificación UTF-8 para Windows
 if sys.platform == 'win32':
@@ -31,7 +32,11 @@ from config.config import Config, get_config
 from config.api_config import APIConfig
 
 # Importar módulos del backend
-from backend.utils.database import DatabaseManager
+from backend.utils import arranque
+from backend.utils.database import DatabaseManager, registrar_sesion_request
+from backend.utils.metricas_sql import registrar_metricas_sql
+from backend.utils.cache import cache_api
+from backend.utils.resumenes import resumen_periodo
 from backend.utils.auth import AuthManager
 
 
@@ -72,6 +77,12 @@ mail = Mail(app)
 # Inicializar base de datos con Config
 db_manager = DatabaseManager()
 
+# Una conexión del pool por request, compartida por todos los módulos
+registrar_sesion_request(app)
+
+# Métricas SQL por request (consultas lentas, N+1; cabeceras X-SQL-* en debug)
+registrar_metricas_sql(app)
+
 # Inicializar el notificador notifaciionesfrom backend.utils.email_notifier_fixed import EmailNotifierFixed email_notifier = EmailNotifierFixed(mail, db_manager)
 
 # En app.py, después de configurar mail
@@ -92,6 +103,8 @@ def notificar(tipo, *args, **kwargs):
         return email_notifier.notify_prestamo_rechazado(*args, **kwargs)
     return False
 
+arranque.marcar_fase('configuracion')
+
 # Intentar registrar blueprints de la API
 try:
     from backend.api.blueprints import registrar_blueprints
@@ -99,6 +112,8 @@ try:
 except ImportError as e:
     print(f"⚠️  No se pudieron cargar los blueprints: {e}")
 
+arranque.marcar_fase('blueprints')
+
 # Ruta para servir archivos de uploads (imágenes de equipos)
 @app.route('/uploads/<path:filename>')
 def serve_uploads(filename):
@@ -178,15 +193,17 @@ def puede_editar(modulo):
         return True
     return permisos.get(modulo, False)
 
-def obtener_estadisticas_sistema():
-    """
-    Obtiene estadísticas del sistema para dashboard y API.
-    Queries adaptadas a schema.sql
-    
-    Returns:
-        dict: Diccionario con todas las estadísticas del sistema
-    """
-    stats = {
+# Cada espacio de caché se invalida con cualquier escritura en estas tablas
+cache_api.vincular_tablas('estadisticas_dashboard', 'equipos', 'prestamos', 'usuarios', 'inventario')
+cache_api.vincular_tablas('laboratorios', 'laboratorios', 'usuarios')  # responsable_nombre
+cache_api.vincular_tablas('categorias_equipos', 'categorias_equipos')
+cache_api.vincular_tablas('tipos_mantenimiento', 'tipos_mantenimiento')
+
+# None = aún no verificado; la tabla inventario no existe en todas las instalaciones
+_tabla_inventario_existe = None
+
+def _estadisticas_vacias():
+    return {
         'equipos_estado': {
             'disponible': 0,
             'prestado': 0,
@@ -199,58 +216,75 @@ def obtener_estadisticas_sistema():
         'usuarios_activos_hoy': 0,
         'comandos_hoy': 0
     }
+
+def _consultar_estadisticas_sistema():
+    """
+    Calcula las estadísticas del dashboard con una sola consulta agregada
+    
+    Returns:
+        dict con las estadísticas o None si la consulta falló
+    """
+    global _tabla_inventario_existe
+    if _tabla_inventario_existe is None:
+        resultado = db_manager.obtener_uno("""
+            SELECT COUNT(*) as total FROM information_schema.tables
+            WHERE table_schema = DATABASE() AND table_name = 'inventario'
+        """)
+        if resultado is None:
+            return None
+        _tabla_inventario_existe = resultado['total'] > 0
+    
+    inventario = ("(SELECT COUNT(*) FROM inventario WHERE cantidad_actual <= cantidad_minima)"
+                  if _tabla_inventario_existe else "0")
+    
+    # Un solo recorrido del índice de estado de equipos y dos conteos por índice
+    query = f"""
+        SELECT
+            COALESCE(SUM(e.estado = 'disponible'), 0) as disponible,
+            COALESCE(SUM(e.estado = 'prestado'), 0) as prestado,
+            COALESCE(SUM(e.estado = 'mantenimiento'), 0) as mantenimiento,
+            COALESCE(SUM(e.estado = 'reparacion'), 0) as reparacion,
+            COALESCE(SUM(e.estado = 'dado_baja'), 0) as dado_baja,
+            (SELECT COUNT(*) FROM prestamos WHERE estado = 'activo') as prestamos_activos,
+            (SELECT COUNT(*) FROM usuarios WHERE estado = 'activo') as usuarios_activos,
+            {inventario} as inventario_critico
+        FROM equipos e
+    """
+    fila = db_manager.obtener_uno(query)
+    if fila is None:
+        return None
     
+    stats = _estadisticas_vacias()
+    for estado in stats['equipos_estado']:
+        stats['equipos_estado'][estado] = int(fila[estado])
+    stats['inventario_critico'] = int(fila['inventario_critico'])
+    stats['reservas_activas'] = int(fila['prestamos_activos'])
+    stats['usuarios_activos_hoy'] = int(fila['usuarios_activos'])
+    return stats
+
+def obtener_estadisticas_sistema():
+    """
+    Obtiene estadísticas del sistema para dashboard y API.
+    Queries adaptadas a schema.sql
+    
+    El resultado se sirve desde una instantánea en caché de vida corta
+    (CACHE_DASHBOARD_TIMEOUT) que se invalida al escribir en equipos,
+    préstamos o usuarios.
+    
+    Returns:
+        dict: Diccionario con todas las estadísticas del sistema
+    """
     try:
-        # Contar equipos por estado (columna 'estado' según schema.sql)
-        query_equipos = """
-            SELECT estado, COUNT(*) as total 
-            FROM equipos 
-            GROUP BY estado
-        """
-        resultados = db_manager.ejecutar_query(query_equipos)
-        for row in resultados:
-            estado = row.get('estado', '')
-            total = row.get('total', 0)
-            if estado in stats['equipos_estado']:
-                stats['equipos_estado'][estado] = total
-        
-        # Contar inventario crítico - Nota: tabla puede no existir
-        try:
-            query_inventario = """
-                SELECT COUNT(*) as total 
-                FROM inventario 
-                WHERE cantidad_actual <= cantidad_minima
-            """
-            resultado = db_manager.obtener_uno(query_inventario)
-            if resultado:
-                stats['inventario_critico'] = resultado.get('total', 0)
-        except:
-            pass
-        
-        # Contar préstamos activos (columna 'estado' según schema.sql)
-        query_prestamos = """
-            SELECT COUNT(*) as total 
-            FROM prestamos 
-            WHERE estado = 'activo'
-        """
-        resultado = db_manager.obtener_uno(query_prestamos)
-        if resultado:
-            stats['reservas_activas'] = resultado.get('total', 0)
-        
-        # Contar usuarios activos (columna 'estado' según schema.sql)
-        query_usuarios = """
-            SELECT COUNT(DISTINCT id) as total 
-            FROM usuarios 
-            WHERE estado = 'activo'
-        """
-        resultado = db_manager.obtener_uno(query_usuarios)
-        if resultado:
-            stats['usuarios_activos_hoy'] = resultado.get('total', 0)
-            
+        stats = cache_api.obtener_o_calcular(
+            'estadisticas_dashboard', 'sistema', _consultar_estadisticas_sistema,
+            timeout=APIConfig.CACHE_DASHBOARD_TIMEOUT
+        )
     except Exception as e:
         print(f"Error obteniendo estadísticas: {e}")
+        stats = None
     
-    return stats
+    # Copia: los llamadores no deben modificar la instantánea compartida
+    return copy.deepcopy(stats) if stats else _estadisticas_vacias()
 
 def enviar_email_reset(email, reset_url, nombre):
     """Enviar email con enlace de restablecimiento de contraseña"""
@@ -1487,7 +1521,8 @@ def usuarios():
             SELECT u.id, u.documento, u.nombres, u.apellidos, u.email, u.telefono,
                    u.id_rol, u.estado,
                    DATE_FORMAT(u.fecha_registro, '%d/%m/%Y') as fecha_registro,
-                   r.nombre_rol
+                   r.nombre_rol,
+                   EXISTS(SELECT 1 FROM rostros_usuario ru WHERE ru.id_usuario = u.id) as tiene_rostro
             FROM usuarios u
             LEFT JOIN roles r ON u.id_rol = r.id
             ORDER BY u.nombres, u.apellidos
@@ -1507,7 +1542,7 @@ def usuarios():
                 'email': u['email'],
                 'telefono': u['telefono'],
                 'registro': u['fecha_registro'],
-                'tiene_rostro': 'No'
+                'tiene_rostro': 'Sí' if u.get('tiene_rostro') else 'No'
             })
     except Exception as e:
         flash(f'Error cargando usuarios: {str(e)}', 'error')
@@ -1537,58 +1572,41 @@ def reportes():
         fecha_inicio = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
     
     try:
-        # ===== ESTADÍSTICAS GENERALES =====
-        stats = {}
-        
-        # Total de equipos
-        query_equipos = "SELECT COUNT(*) as total FROM equipos WHERE estado != 'dado_baja'"
-        result = db_manager.ejecutar_query(query_equipos)
-        stats['total_equipos'] = result[0]['total'] if result else 0
-        
-        # Equipos disponibles
-        query_disponibles = "SELECT COUNT(*) as total FROM equipos WHERE estado = 'disponible'"
-        result = db_manager.ejecutar_query(query_disponibles)
-        stats['equipos_disponibles'] = result[0]['total'] if result else 0
-        
-        # Préstamos activos
-        query_prestamos = "SELECT COUNT(*) as total FROM prestamos WHERE estado = 'activo'"
-        result = db_manager.ejecutar_query(query_prestamos)
-        stats['prestamos_activos'] = result[0]['total'] if result else 0
+        # Todas las consultas del reporte se envían en un solo lote
+        consultas = {}
         
-        # Préstamos vencidos
-        query_vencidos = """
-            SELECT COUNT(*) as total FROM prestamos 
-            WHERE estado = 'activo' AND fecha_devolucion_programada < NOW()
-        """
-        result = db_manager.ejecutar_query(query_vencidos)
-        stats['prestamos_vencidos'] = result[0]['total'] if result else 0
+        # ===== ESTADÍSTICAS GENERALES =====
+        # Total y disponibles se derivan de graf_equipos_estado; los conteos
+        # por período salen de los resúmenes diarios (backend/utils/resumenes.py)
         
-        # Mantenimientos del mes
-        query_mant = """
-            SELECT COUNT(*) as total FROM historial_mantenimiento 
-            WHERE MONTH(fecha_inicio) = MONTH(NOW()) AND YEAR(fecha_inicio) = YEAR(NOW())
+        # Préstamos activos y vencidos
+        consultas['prestamos_activos'] = """
+            SELECT COUNT(*) as total,
+                   COALESCE(SUM(fecha_devolucion_programada < NOW()), 0) as vencidos
+            FROM prestamos 
+            WHERE estado = 'activo'
         """
-        result = db_manager.ejecutar_query(query_mant)
-        stats['mantenimientos_mes'] = result[0]['total'] if result else 0
         
-        # Prácticas del mes
-        query_prac = """
-            SELECT COUNT(*) as total FROM practicas_laboratorio 
-            WHERE MONTH(fecha) = MONTH(NOW()) AND YEAR(fecha) = YEAR(NOW())
-        """
-        result = db_manager.ejecutar_query(query_prac)
-        stats['practicas_mes'] = result[0]['total'] if result else 0
+        # Mantenimientos y prácticas del mes en curso
+        # (mes completo: incluye lo programado después de hoy)
+        primer_dia_mes = datetime.now().date().replace(day=1)
+        primer_dia_mes_siguiente = (primer_dia_mes + timedelta(days=32)).replace(day=1)
+        rango_mes = (primer_dia_mes, primer_dia_mes_siguiente)
+        consultas['mantenimientos_mes'] = ("""
+            SELECT COALESCE(SUM(total), 0) as total FROM resumen_diario_mantenimientos 
+            WHERE fecha >= %s AND fecha < %s
+        """, rango_mes)
+        consultas['practicas_mes'] = ("""
+            SELECT COALESCE(SUM(total), 0) as total FROM resumen_diario_practicas 
+            WHERE fecha >= %s AND fecha < %s
+        """, rango_mes)
         
         # ===== DATOS PARA TABLAS (según tipo_reporte) =====
-        equipos = []
-        prestamos = []
-        mantenimientos = []
-        practicas = []
         
         # Consultar solo los datos relevantes según el tipo de reporte
         if tipo_reporte == 'general' or tipo_reporte == 'equipos':
             # Equipos
-            query_equipos_list = """
+            consultas['equipos'] = """
                 SELECT e.codigo_interno, e.nombre, c.nombre as categoria, 
                        l.nombre as laboratorio, e.estado, e.estado_fisico, e.valor_adquisicion
                 FROM equipos e
@@ -1598,11 +1616,10 @@ def reportes():
                 ORDER BY e.fecha_registro DESC
                 LIMIT 100
             """
-            equipos = db_manager.ejecutar_query(query_equipos_list) or []
         
         if tipo_reporte == 'general' or tipo_reporte == 'prestamos':
             # Préstamos
-            query_prestamos_list = """
+            consultas['prestamos'] = ("""
                 SELECT p.codigo, e.nombre as equipo_nombre, 
                        CONCAT(u.nombres, ' ', u.apellidos) as solicitante,
                        DATE_FORMAT(p.fecha, '%d/%m/%Y') as fecha_prestamo,
@@ -1615,12 +1632,11 @@ def reportes():
                 WHERE p.fecha BETWEEN %s AND %s
                 ORDER BY p.fecha DESC
                 LIMIT 100
-            """
-            prestamos = db_manager.ejecutar_query(query_prestamos_list, (fecha_inicio, fecha_fin)) or []
+            """, (fecha_inicio, fecha_fin))
         
         if tipo_reporte == 'general' or tipo_reporte == 'mantenimiento':
             # Mantenimientos
-            query_mant_list = """
+            consultas['mantenimientos'] = ("""
                 SELECT e.nombre as equipo_nombre, tm.nombre as tipo_mantenimiento,
                        CONCAT(u.nombres, ' ', u.apellidos) as tecnico,
                        DATE_FORMAT(hm.fecha_inicio, '%d/%m/%Y') as fecha_inicio,
@@ -1633,12 +1649,11 @@ def reportes():
                 WHERE hm.fecha_inicio BETWEEN %s AND %s
                 ORDER BY hm.fecha_inicio DESC
                 LIMIT 100
-            """
-            mantenimientos = db_manager.ejecutar_query(query_mant_list, (fecha_inicio, fecha_fin)) or []
+            """, (fecha_inicio, fecha_fin))
         
         if tipo_reporte == 'general' or tipo_reporte == 'practicas':
             # Prácticas
-            query_prac_list = """
+            consultas['practicas'] = ("""
                 SELECT pl.codigo, pl.nombre, pf.nombre_programa as programa,
                        CONCAT(u.nombres, ' ', u.apellidos) as instructor,
                        l.nombre as laboratorio,
@@ -1652,64 +1667,88 @@ def reportes():
                 WHERE pl.fecha BETWEEN %s AND %s
                 ORDER BY pl.fecha DESC
                 LIMIT 100
-            """
-            practicas = db_manager.ejecutar_query(query_prac_list, (fecha_inicio, fecha_fin)) or []
+            """, (fecha_inicio, fecha_fin))
         
         # ===== DATOS PARA GRÁFICOS =====
-        datos_graficos = {}
         
         # Gráfico: Equipos por Estado
-        query_eq_estado = """
+        consultas['graf_equipos_estado'] = """
             SELECT estado, COUNT(*) as total 
             FROM equipos 
             WHERE estado != 'dado_baja'
             GROUP BY estado
         """
-        result = db_manager.ejecutar_query(query_eq_estado) or []
-        datos_graficos['equipos_estado'] = {
-            'labels': [r['estado'].capitalize() for r in result],
-            'data': [r['total'] for r in result]
-        }
         
         # Gráfico: Préstamos por Mes (últimos 6 meses)
-        query_prest_mes = """
-            SELECT DATE_FORMAT(fecha, '%Y-%m') as mes, COUNT(*) as total
-            FROM prestamos
-            WHERE fecha >= DATE_SUB(NOW(), INTERVAL 6 MONTH)
+        consultas['graf_prestamos_mes'] = """
+            SELECT DATE_FORMAT(fecha, '%Y-%m') as mes, SUM(total) as total
+            FROM resumen_diario_prestamos
+            WHERE fecha >= DATE_SUB(CURDATE(), INTERVAL 6 MONTH)
             GROUP BY mes
+            HAVING total > 0
             ORDER BY mes
         """
-        result = db_manager.ejecutar_query(query_prest_mes) or []
-        datos_graficos['prestamos_mes'] = {
-            'labels': [r['mes'] for r in result],
-            'data': [r['total'] for r in result]
-        }
         
         # Gráfico: Mantenimientos por Tipo
-        query_mant_tipo = """
-            SELECT tm.nombre, COUNT(*) as total
-            FROM historial_mantenimiento hm
-            JOIN tipos_mantenimiento tm ON hm.id_tipo_mantenimiento = tm.id
-            WHERE hm.fecha_inicio >= DATE_SUB(NOW(), INTERVAL 3 MONTH)
+        consultas['graf_mantenimientos'] = """
+            SELECT tm.nombre, SUM(r.total) as total
+            FROM resumen_diario_mantenimientos r
+            JOIN tipos_mantenimiento tm ON r.id_tipo_mantenimiento = tm.id
+            WHERE r.fecha >= DATE_SUB(CURDATE(), INTERVAL 3 MONTH)
             GROUP BY tm.nombre
+            HAVING total > 0
         """
-        result = db_manager.ejecutar_query(query_mant_tipo) or []
-        datos_graficos['mantenimientos'] = {
-            'labels': [r['nombre'] for r in result],
-            'data': [r['total'] for r in result]
-        }
         
         # Gráfico: Uso de Laboratorios (horas de prácticas)
-        query_lab_uso = """
-            SELECT l.nombre, COALESCE(SUM(pl.duracion_horas), 0) as horas_uso
+        consultas['graf_laboratorios'] = """
+            SELECT l.nombre, COALESCE(SUM(r.horas), 0) as horas_uso
             FROM laboratorios l
-            LEFT JOIN practicas_laboratorio pl ON l.id = pl.id_laboratorio
-                AND pl.fecha >= DATE_SUB(NOW(), INTERVAL 1 MONTH)
+            LEFT JOIN resumen_diario_practicas r ON l.id = r.id_laboratorio
+                AND r.fecha >= DATE_SUB(CURDATE(), INTERVAL 1 MONTH)
             GROUP BY l.id, l.nombre
             ORDER BY horas_uso DESC
             LIMIT 5
         """
-        result = db_manager.ejecutar_query(query_lab_uso) or []
+        
+        resultados = dict(zip(consultas, db_manager.ejecutar_lote(list(consultas.values()))))
+        
+        equipos_estado = resultados['graf_equipos_estado'] or []
+        prestamos_activos = resultados['prestamos_activos']
+        stats = {
+            'total_equipos': sum(r['total'] for r in equipos_estado),
+            'equipos_disponibles': next((r['total'] for r in equipos_estado if r['estado'] == 'disponible'), 0),
+            'prestamos_activos': prestamos_activos[0]['total'] if prestamos_activos else 0,
+            'prestamos_vencidos': int(prestamos_activos[0]['vencidos']) if prestamos_activos else 0
+        }
+        for clave in ('mantenimientos_mes', 'practicas_mes'):
+            result = resultados[clave]
+            stats[clave] = int(result[0]['total']) if result else 0
+        
+        equipos = resultados.get('equipos') or []
+        prestamos = resultados.get('prestamos') or []
+        mantenimientos = resultados.get('mantenimientos') or []
+        practicas = resultados.get('practicas') or []
+        
+        datos_graficos = {}
+        
+        datos_graficos['equipos_estado'] = {
+            'labels': [r['estado'].capitalize() for r in equipos_estado],
+            'data': [r['total'] for r in equipos_estado]
+        }
+        
+        result = resultados['graf_prestamos_mes'] or []
+        datos_graficos['prestamos_mes'] = {
+            'labels': [r['mes'] for r in result],
+            'data': [int(r['total']) for r in result]
+        }
+        
+        result = resultados['graf_mantenimientos'] or []
+        datos_graficos['mantenimientos'] = {
+            'labels': [r['nombre'] for r in result],
+            'data': [int(r['total']) for r in result]
+        }
+        
+        result = resultados['graf_laboratorios'] or []
         datos_graficos['laboratorios'] = {
             'labels': [r['nombre'] for r in result],
             'data': [float(r['horas_uso']) for r in result]
@@ -1807,22 +1846,23 @@ def exportar_reporte_pdf():
             fecha_inicio_dt = fecha_inicio
             fecha_fin_dt = fecha_fin
         
-        # Estadísticas
-        stats = {}
+        # Estadísticas: estado actual + totales del período desde los resúmenes diarios
         query_equipos = "SELECT COUNT(*) as total FROM equipos WHERE estado != 'dado_baja'"
-        result = db_manager.ejecutar_query(query_equipos)
-        stats['total_equipos'] = result[0]['total'] if result else 0
-        
         query_prestamos = "SELECT COUNT(*) as total FROM prestamos WHERE estado = 'activo'"
-        result = db_manager.ejecutar_query(query_prestamos)
-        stats['prestamos_activos'] = result[0]['total'] if result else 0
+        res_equipos, res_prestamos = db_manager.ejecutar_lote([query_equipos, query_prestamos])
+        periodo = resumen_periodo(db_manager, fecha_inicio_dt, fecha_fin_dt)
         
         # Tabla de estadísticas
         elements.append(Paragraph("Resumen Ejecutivo", styles['Heading2']))
         data_stats = [
             ['Métrica', 'Valor'],
-            ['Total Equipos', str(stats['total_equipos'])],
-            ['Préstamos Activos', str(stats['prestamos_activos'])]
+            ['Total Equipos', str(res_equipos[0]['total'] if res_equipos else 0)],
+            ['Préstamos Activos', str(res_prestamos[0]['total'] if res_prestamos else 0)],
+            ['Préstamos en el Período', str(periodo['prestamos'])],
+            ['Mantenimientos en el Período', str(periodo['mantenimientos'])],
+            ['Costo de Mantenimientos', f"${periodo['costo_mantenimientos']:,.0f}"],
+            ['Prácticas en el Período', str(periodo['practicas'])],
+            ['Horas de Uso de Laboratorios', f"{periodo['horas_laboratorio']:.1f}"]
         ]
         
         table_stats = Table(data_stats, colWidths=[3*inch, 2*inch])
@@ -1992,6 +2032,7 @@ def exportar_reporte_excel():
     
     try:
         from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
         from openpyxl.styles import Font, PatternFill, Alignment
         from io import BytesIO
         from datetime import datetime, timedelta
@@ -2004,50 +2045,61 @@ def exportar_reporte_excel():
             fecha_fin = datetime.now().strftime('%Y-%m-%d')
             fecha_inicio = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
         
-        # Crear workbook
-        wb = Workbook()
+        # Crear workbook en modo de solo escritura: las filas se vuelcan a
+        # medida que llegan del cursor, sin mantener todas las celdas en memoria
+        wb = Workbook(write_only=True)
+        relleno_titulo = PatternFill(start_color='667eea', end_color='667eea', fill_type='solid')
         
-        # Hoja 1: Resumen
-        ws1 = wb.active
-        ws1.title = "Resumen"
+        def celda(ws, valor, **estilos):
+            """Celda con estilo para hojas write_only"""
+            c = WriteOnlyCell(ws, value=valor)
+            for nombre, estilo in estilos.items():
+                setattr(c, nombre, estilo)
+            return c
         
-        # Título
-        ws1['A1'] = 'Reporte de Gestión de Laboratorios'
-        ws1['A1'].font = Font(size=16, bold=True, color='667eea')
-        ws1['A2'] = f'Período: {fecha_inicio} a {fecha_fin}'
-        ws1['A3'] = f'Generado: {datetime.now().strftime("%d/%m/%Y %H:%M")}'
-        
-        # Estadísticas
-        ws1['A5'] = 'Métrica'
-        ws1['B5'] = 'Valor'
-        ws1['A5'].font = Font(bold=True)
-        ws1['B5'].font = Font(bold=True)
-        ws1['A5'].fill = PatternFill(start_color='667eea', end_color='667eea', fill_type='solid')
-        ws1['B5'].fill = PatternFill(start_color='667eea', end_color='667eea', fill_type='solid')
+        # Hoja 1: Resumen
+        ws1 = wb.create_sheet("Resumen")
+        ws1.column_dimensions['A'].width = 40
+        ws1.column_dimensions['B'].width = 20
         
         query_equipos = "SELECT COUNT(*) as total FROM equipos WHERE estado != 'dado_baja'"
-        result = db_manager.ejecutar_query(query_equipos)
-        total_equipos = result[0]['total'] if result else 0
-        
         query_prestamos = "SELECT COUNT(*) as total FROM prestamos WHERE estado = 'activo'"
-        result = db_manager.ejecutar_query(query_prestamos)
-        prestamos_activos = result[0]['total'] if result else 0
+        res_equipos, res_prestamos = db_manager.ejecutar_lote([query_equipos, query_prestamos])
+        total_equipos = res_equipos[0]['total'] if res_equipos else 0
+        prestamos_activos = res_prestamos[0]['total'] if res_prestamos else 0
+        periodo = resumen_periodo(db_manager, fecha_inicio, fecha_fin)
         
-        ws1['A6'] = 'Total Equipos'
-        ws1['B6'] = total_equipos
-        ws1['A7'] = 'Préstamos Activos'
-        ws1['B7'] = prestamos_activos
+        # Título
+        ws1.append([celda(ws1, 'Reporte de Gestión de Laboratorios', font=Font(size=16, bold=True, color='667eea'))])
+        ws1.append([f'Período: {fecha_inicio} a {fecha_fin}'])
+        ws1.append([f'Generado: {datetime.now().strftime("%d/%m/%Y %H:%M")}'])
+        ws1.append([])
         
-        # Hoja 2: Préstamos
+        # Estadísticas
+        ws1.append([
+            celda(ws1, 'Métrica', font=Font(bold=True), fill=relleno_titulo),
+            celda(ws1, 'Valor', font=Font(bold=True), fill=relleno_titulo)
+        ])
+        ws1.append(['Total Equipos', total_equipos])
+        ws1.append(['Préstamos Activos', prestamos_activos])
+        ws1.append(['Préstamos en el Período', periodo['prestamos']])
+        ws1.append(['Mantenimientos en el Período', periodo['mantenimientos']])
+        ws1.append(['Costo de Mantenimientos', periodo['costo_mantenimientos']])
+        ws1.append(['Prácticas en el Período', periodo['practicas']])
+        ws1.append(['Horas de Uso de Laboratorios', periodo['horas_laboratorio']])
+        
+        # Hoja 2: Préstamos (todo el período, leído por bloques)
         ws2 = wb.create_sheet("Préstamos")
         headers = ['Código', 'Equipo', 'Solicitante', 'Fecha', 'Estado']
-        ws2.append(headers)
+        for letra, ancho in zip('ABCDE', (20, 40, 35, 14, 14)):
+            ws2.column_dimensions[letra].width = ancho
         
         # Estilo de encabezados
-        for cell in ws2[1]:
-            cell.font = Font(bold=True, color='FFFFFF')
-            cell.fill = PatternFill(start_color='667eea', end_color='667eea', fill_type='solid')
-            cell.alignment = Alignment(horizontal='center')
+        ws2.append([
+            celda(ws2, h, font=Font(bold=True, color='FFFFFF'), fill=relleno_titulo,
+                  alignment=Alignment(horizontal='center'))
+            for h in headers
+        ])
         
         query_prestamos_list = """
             SELECT p.codigo, e.nombre as equipo, 
@@ -2059,26 +2111,10 @@ def exportar_reporte_excel():
             JOIN usuarios u ON p.id_usuario_solicitante = u.id
             WHERE p.fecha BETWEEN %s AND %s
             ORDER BY p.fecha DESC
-            LIMIT 100
         """
-        prestamos = db_manager.ejecutar_query(query_prestamos_list, (fecha_inicio, fecha_fin)) or []
-        
-        for p in prestamos:
-            ws2.append([p['codigo'], p['equipo'], p['solicitante'], p['fecha'], p['estado']])
-        
-        # Ajustar ancho de columnas
-        for ws in [ws1, ws2]:
-            for column in ws.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(cell.value)
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)
-                ws.column_dimensions[column_letter].width = adjusted_width
+        for p in db_manager.iterar_query(query_prestamos_list, (fecha_inicio, fecha_fin),
+                                         dictionary=False):
+            ws2.append(list(p))
         
         # Guardar en buffer
         buffer = BytesIO()
@@ -2629,6 +2665,16 @@ def inject_user():
         return dict(user=get_user_data())
     return dict(user=None)
 
+arranque.marcar_fase('rutas')
+
+# Modelos de IA: se importan en el primer uso; los workers con
+# ML_CALENTAR_MODELOS los calientan después del fork
+arranque.programar_calentamiento_tras_fork()
+_reporte = arranque.reporte_arranque()
+print(f"⏱️  App cargada en {_reporte['arranque_segundos']} s "
+      f"({_reporte['memoria_mb']} MB, IA cargada: "
+      f"{', '.join(m for m, cargado in _reporte['modulos_ml'].items() if cargado) or 'ninguna'})")
+
 # ========================================
 # INICIALIZACIÓN
 # ========================================
@@ -2656,6 +2702,12 @@ def init_app():
             os.makedirs(dir_path)
             print(f"📁 Directorio creado: {dir_name}")
     
+    # Servidor de desarrollo: calentar solo en el proceso que atiende (no
+    # en el vigilante del reloader)
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true' and arranque.modelos_configurados():
+        arranque.calentar_en_segundo_plano()
+        print(f"🔥 Calentando modelos de IA: {', '.join(arranque.modelos_configurados())}")
+    
     print("\n🚀 Servidor iniciando...")
     print("📍 URL: http://localhost:5000")
     print("📍 Login: http://localhost:5000/login")
@@ -2,13 +2,15 @@
 # Centro Minero SENA
 # Solo accesible para Administradores (id_rol = 1)
 
-from flask import Blueprint, request, jsonify, session, send_file
+from flask import Blueprint, request, jsonify, session, send_file, Response, stream_with_context
 from functools import wraps
 import subprocess
 import os
 import datetime
 import gzip
 import shutil
+import csv
+import io
 import sys
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
@@ -207,6 +209,65 @@ def descargar_backup(filename):
     except Exception as e:
         return jsonify({'success': False, 'message': f'Error descargando backup: {str(e)}'}), 500
 
+@backups_bp.route('/exportar-csv/<tabla>', methods=['GET'])
+@require_admin
+def exportar_tabla_csv(tabla):
+    """
+    Exportar una tabla completa a CSV
+    
+    Las filas se leen por bloques con un cursor sin buffer y se envían al
+    cliente a medida que se generan, sin cargar la tabla en memoria.
+    Las columnas binarias (BLOB) se omiten.
+    """
+    try:
+        # Validar la tabla contra el esquema y obtener sus columnas
+        columnas = db.ejecutar_query("""
+            SELECT column_name as nombre, data_type as tipo
+            FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = %s
+            ORDER BY ordinal_position
+        """, (tabla,))
+        
+        if not columnas:
+            return jsonify({'success': False, 'message': 'Tabla no encontrada'}), 404
+        
+        tipos_binarios = ('blob', 'tinyblob', 'mediumblob', 'longblob', 'binary', 'varbinary')
+        nombres = [c['nombre'] for c in columnas if c['tipo'].lower() not in tipos_binarios]
+        query = f"SELECT {', '.join(f'`{n}`' for n in nombres)} FROM `{tabla}`"
+        
+        def generar():
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(nombres)
+            for bloque in db.iterar_query(query, chunk=1000, dictionary=False, por_bloques=True):
+                writer.writerows(bloque)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+            if buffer.tell():
+                yield buffer.getvalue()
+        
+        # Registrar exportación en logs
+        try:
+            log_query = """
+                INSERT INTO logs_sistema (modulo, nivel_log, mensaje, id_usuario, ip_address)
+                VALUES ('backups', 'INFO', %s, %s, %s)
+            """
+            mensaje = f'Tabla exportada a CSV: {tabla}'
+            db.ejecutar_comando(log_query, (mensaje, session.get('user_id'), request.remote_addr))
+        except:
+            pass
+        
+        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        return Response(
+            stream_with_context(generar()),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f'attachment; filename={tabla}_{timestamp}.csv'}
+        )
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error exportando tabla: {str(e)}'}), 500
+
 @backups_bp.route('/eliminar', methods=['POST'])
 @require_admin
 def eliminar_backup():
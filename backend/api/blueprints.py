@@ -18,6 +18,10 @@ except ImportError:
     APIConfig = None
 
 from backend.utils.database import DatabaseManager
+from backend.utils.metricas_sql import monitor_sql
+from backend.utils.cache import cache_api, cachear_respuesta
+from backend.utils.resumenes import reconstruir_resumenes
+from backend.utils.arranque import reporte_arranque
 
 # Crear blueprint principal de la API
 api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
@@ -34,6 +38,9 @@ usuarios_bp = Blueprint('usuarios', __name__, url_prefix='/api/usuarios')
 # Blueprint para backups (usado por backend/api/backups.py) - SOLO ADMINISTRADORES
 backups_bp = Blueprint('backups', __name__, url_prefix='/api/backups')
 
+# Blueprint para reconocimiento facial (usado por backend/api/facial.py)
+facial_bp = Blueprint('facial', __name__, url_prefix='/api/facial')
+
 # Instancia de base de datos
 db = DatabaseManager()
 
@@ -246,7 +253,8 @@ def api_equipo_detalle(equipo_id):
     
     if not equipo:
         return jsonify({'success': False, 'message': 'Equipo no encontrado'}), 404
-    
+
+    equipo.pop('imagen_vector', None)  # BLOB interno de /api/equipos/reconocer
     return jsonify({'success': True, 'data': equipo})
 
 
@@ -480,6 +488,7 @@ def api_estadisticas_dashboard():
 
 @api_bp.route('/laboratorios', methods=['GET'])
 @require_auth
+@cachear_respuesta('laboratorios')
 def api_laboratorios_lista():
     """Lista laboratorios"""
     query = """
@@ -516,10 +525,71 @@ def api_health():
         'success': True,
         'status': 'ok',
         'database': db_status,
+        'pool': DatabaseManager.estadisticas_pool(),
+        'arranque': reporte_arranque(),
         'version': '1.0.0'
     })
 
 
+@api_bp.route('/admin/metricas-sql', methods=['GET'])
+@require_auth
+@require_level(5)
+def api_metricas_sql():
+    """Métricas SQL agregadas: consultas más costosas, endpoints, lentas y N+1"""
+    limite = request.args.get('limite', 20, type=int)
+    return jsonify({
+        'success': True,
+        'data': monitor_sql.estadisticas(limite=max(1, min(limite, 200)))
+    })
+
+
+@api_bp.route('/admin/metricas-sql', methods=['DELETE'])
+@require_auth
+@require_level(5)
+def api_reiniciar_metricas_sql():
+    """Reinicia las métricas SQL acumuladas"""
+    monitor_sql.reiniciar()
+    return jsonify({'success': True, 'message': 'Métricas SQL reiniciadas'})
+
+
+@api_bp.route('/admin/cache', methods=['GET'])
+@require_auth
+@require_level(5)
+def api_estadisticas_cache():
+    """Estado de la caché de la API: backend, entradas y tasa de aciertos"""
+    return jsonify({'success': True, 'data': cache_api.estadisticas()})
+
+
+@api_bp.route('/admin/cache', methods=['DELETE'])
+@require_auth
+@require_level(5)
+def api_limpiar_cache():
+    """Descarta todas las entradas de la caché de la API"""
+    cache_api.limpiar()
+    return jsonify({'success': True, 'message': 'Caché limpiada'})
+
+
+@api_bp.route('/admin/resumenes/reconstruir', methods=['POST'])
+@require_auth
+@require_level(5)
+def api_reconstruir_resumenes():
+    """
+    Recalcula los resúmenes diarios de reportes desde las tablas origen
+    
+    Body JSON opcional: {"desde": "YYYY-MM-DD", "hasta": "YYYY-MM-DD"};
+    sin rango se reconstruye todo el histórico.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        filas = reconstruir_resumenes(db, data.get('desde'), data.get('hasta'))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Formato de fecha inválido (YYYY-MM-DD)'}), 400
+    
+    if filas is None:
+        return jsonify({'success': False, 'error': 'Error reconstruyendo resúmenes'}), 500
+    return jsonify({'success': True, 'data': filas})
+
+
 # =========================================================
 # FUNCIÓN PARA REGISTRAR BLUEPRINTS
 # =========================================================
@@ -557,6 +627,16 @@ def registrar_blueprints(app):
         import traceback
         traceback.print_exc()
     
+    # Registrar blueprint de reconocimiento facial
+    try:
+        import backend.api.facial  # Esto carga las rutas en facial_bp
+        app.register_blueprint(facial_bp)
+        print("✅ API Reconocimiento Facial registrada en /api/facial")
+    except Exception as e:
+        print(f"⚠️  Error registrando facial_bp: {e}")
+        import traceback
+        traceback.print_exc()
+    
     # Registrar blueprint de usuarios
     try:
         import backend.api.usuarios  # Esto carga las rutas en usuarios_bp
@@ -5,8 +5,11 @@ from flask import request, jsonify, send_file, session
 from functools import wraps
 from .blueprints import equipos_bp
 from ..utils.database import DatabaseManager
+from ..utils.paginacion import consultar_pagina, CursorInvalido
+from ..utils.cache import cachear_respuesta
 import json
 import os
+import re
 
 db = DatabaseManager()
 
@@ -37,6 +40,7 @@ def listar_equipos():
     
     Query params:
         - estado: Filtrar por estado (disponible, prestado, mantenimiento, reparacion, dado_baja)
+        - limite, cursor, incluir_total: Paginación por cursor (opcional)
     """
     try:
         # Filtro por estado
@@ -63,16 +67,15 @@ def listar_equipos():
             FROM equipos e
             LEFT JOIN laboratorios l ON e.id_laboratorio = l.id
             LEFT JOIN categorias_equipos c ON e.id_categoria = c.id
+            WHERE 1=1
         """
         
         params = []
         if estado_filtro:
-            query += " WHERE e.estado = %s"
+            query += " AND e.estado = %s"
             params.append(estado_filtro)
         
-        query += " ORDER BY e.nombre"
-        
-        equipos = db.ejecutar_query(query, tuple(params) if params else None)
+        equipos, paginacion = consultar_pagina(db, query, params, [('e.nombre', 'ASC'), ('e.id', 'ASC')])
         
         # Procesar especificaciones JSON
         for equipo in equipos:
@@ -82,8 +85,10 @@ def listar_equipos():
                 except:
                     equipo['especificaciones'] = {}
         
-        return jsonify({'success': True, 'equipos': equipos}), 200
+        return jsonify({'success': True, 'equipos': equipos, 'paginacion': paginacion}), 200
         
+    except CursorInvalido as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'Error listando equipos: {str(e)}'}), 500
 
@@ -314,6 +319,9 @@ def actualizar_equipo(equipo_id):
             datos_actualizar['codigo_qr'] = data['codigo_qr'] if data['codigo_qr'] else None
         if 'imagen_url' in data:
             datos_actualizar['imagen_url'] = data['imagen_url'] if data['imagen_url'] else None
+            # pHash y vector se recalculan desde el archivo al recargar los índices
+            datos_actualizar['imagen_phash'] = None
+            datos_actualizar['imagen_vector'] = None
         if 'imagen_hash' in data:
             datos_actualizar['imagen_hash'] = data['imagen_hash'] if data['imagen_hash'] else None
         
@@ -321,6 +329,11 @@ def actualizar_equipo(equipo_id):
             return jsonify({'error': 'No hay campos válidos para actualizar'}), 400
         
         db.actualizar('equipos', datos_actualizar, 'id = %s', (equipo_id,))
+        if 'imagen_url' in datos_actualizar:
+            from ..services.hash_perceptual import indice_hashes
+            from ..services.vectores_equipos import indice_vectores
+            indice_hashes.notificar_cambio(db)
+            indice_vectores.notificar_cambio(db)
         
         return jsonify({
             'success': True,
@@ -340,6 +353,11 @@ def eliminar_equipo(equipo_id):
             return jsonify({'error': 'Equipo no encontrado'}), 404
         
         db.eliminar('equipos', 'id = %s', (equipo_id,))
+        # Sus fotos y las de entrenamiento (ON DELETE CASCADE) salen de los índices
+        from ..services.hash_perceptual import indice_hashes
+        from ..services.vectores_equipos import indice_vectores
+        indice_hashes.notificar_cambio(db)
+        indice_vectores.notificar_cambio(db, [equipo_id])
         
         return jsonify({
             'success': True,
@@ -472,6 +490,10 @@ def subir_imagen(equipo_id):
         
         import hashlib
         import base64
+        from ..services.hash_perceptual import indice_hashes, phash_desde_bytes
+        from ..services.vectores_equipos import (
+            VERSION_DESCRIPTOR, indice_vectores, vector_a_bytes, vector_desde_bytes
+        )
         
         # Procesar imagen
         if 'imagen' in request.files:
@@ -484,6 +506,18 @@ def subir_imagen(equipo_id):
         # Calcular hash
         imagen_hash = hashlib.md5(imagen_data).hexdigest()
         
+        # Casi duplicada de la foto (o de imágenes de entrenamiento) de otro equipo
+        imagen_phash = phash_desde_bytes(imagen_data)
+        if imagen_phash:
+            otros = [c for c in indice_hashes.obtener(db).buscar(imagen_phash) if c['id_equipo'] != equipo_id]
+            if otros:
+                return jsonify({
+                    'error': 'La imagen es casi idéntica a una ya registrada para otro equipo',
+                    'equipo_id': otros[0]['id_equipo'],
+                    'imagen_url': otros[0]['ruta'],
+                    'distancia': otros[0]['distancia']
+                }), 409
+        
         # Guardar imagen
         upload_dir = os.path.join(os.path.dirname(__file__), '..', '..', 'uploads', 'equipos')
         os.makedirs(upload_dir, exist_ok=True)
@@ -498,10 +532,17 @@ def subir_imagen(equipo_id):
         imagen_url_web = f"/uploads/equipos/{filename}"
         
         # Actualizar BD con URL web accesible
+        # Vector para /api/equipos/reconocer: se calcula una vez, aquí
+        vector = vector_desde_bytes(imagen_data)
         db.actualizar('equipos', {
             'imagen_url': imagen_url_web,
-            'imagen_hash': imagen_hash
+            'imagen_hash': imagen_hash,
+            'imagen_phash': imagen_phash,
+            'imagen_vector': vector_a_bytes(vector) if vector is not None else None,
+            'imagen_vector_version': VERSION_DESCRIPTOR if vector is not None else None
         }, 'id = %s', (equipo_id,))
+        indice_hashes.notificar_cambio(db)
+        indice_vectores.notificar_cambio(db, [equipo_id])
         
         print(f"📷 Imagen guardada: {filepath} -> URL: {imagen_url_web}")
         
@@ -509,7 +550,8 @@ def subir_imagen(equipo_id):
             'success': True,
             'message': 'Imagen subida exitosamente',
             'imagen_url': imagen_url_web,
-            'imagen_hash': imagen_hash
+            'imagen_hash': imagen_hash,
+            'imagen_phash': imagen_phash
         }), 200
         
     except Exception as e:
@@ -562,74 +604,77 @@ def equipos_disponibles():
 @equipos_bp.route('/reconocer', methods=['POST'])
 @equipos_bp.route('/recognize', methods=['POST'])  # Alias para compatibilidad
 def reconocer_equipo():
-    """POST /api/equipos/reconocer - Reconocer equipo por imagen (prototipo básico)"""
+    """POST /api/equipos/reconocer - Reconocer equipo por imagen
+    
+    Compara la foto contra las fotos registradas de los equipos
+    (vectores calculados al subirlas) y retorna los más parecidos.
+    
+    Form-data:
+        imagen: Foto del equipo
+        k: Máximo de equipos a retornar (default 5, máx. 50)
+    """
     try:
         # Obtener imagen del request
         if 'imagen' not in request.files:
             return jsonify({'error': 'No se proporcionó imagen'}), 400
         
-        imagen_file = request.files['imagen']
-        imagen_data = imagen_file.read()
-        
-        # Calcular hash de la imagen capturada
-        import hashlib
-        import cv2
-        import numpy as np
+        from ..services.vectores_equipos import SIMILITUD_MINIMA, indice_vectores, vector_desde_bytes
         
-        # Convertir bytes a imagen OpenCV
-        nparr = np.frombuffer(imagen_data, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        imagen_data = request.files['imagen'].read()
+        k = max(1, min(request.form.get('k', 5, type=int), 50))
         
-        if img is None:
+        vector = vector_desde_bytes(imagen_data)
+        if vector is None:
             return jsonify({'error': 'Imagen inválida'}), 400
         
-        # Calcular hash de la imagen
-        img_hash = hashlib.md5(imagen_data).hexdigest()
-        
-        # Buscar equipos con imágenes similares (comparación básica por hash)
-        query = """
-            SELECT 
-                e.id,
-                e.codigo_interno,
-                e.nombre,
-                CONCAT(e.marca, ' ', e.modelo) as tipo,
-                e.estado,
-                e.ubicacion_especifica as ubicacion,
-                e.imagen_url,
-                e.imagen_hash
-            FROM equipos e
-            WHERE e.imagen_url IS NOT NULL
-            ORDER BY e.nombre
-        """
-        equipos = db.ejecutar_query(query)
-        
-        # Implementación prototipo: retornar todos los equipos con imagen
-        # En producción se haría comparación más sofisticada
-        equipos_encontrados = []
-        
-        for equipo in equipos:
-            # Por ahora, agregar todos los equipos que tengan imagen
-            # Esto es un prototipo básico según las guías
-            equipos_encontrados.append({
-                'id': equipo['id'],
-                'nombre': equipo['nombre'],
-                'tipo': equipo['tipo'],
-                'estado': equipo['estado'],
-                'ubicacion': equipo['ubicacion'],
-                'similitud': 0.75  # Valor simulado para prototipo
-            })
+        # Top-k en el índice residente; solo se leen de la BD los equipos ganadores
+        indice = indice_vectores.obtener(db)
+        similares = [(i, s) for i, s in indice.buscar(vector, k) if s >= SIMILITUD_MINIMA]
+        
+        equipos = {}
+        if similares:
+            ids = [i for i, _ in similares]
+            query = f"""
+                SELECT 
+                    e.id,
+                    e.codigo_interno,
+                    e.nombre,
+                    CONCAT(e.marca, ' ', e.modelo) as tipo,
+                    e.estado,
+                    e.ubicacion_especifica as ubicacion,
+                    e.imagen_url
+                FROM equipos e
+                WHERE e.id IN ({', '.join(['%s'] * len(ids))})
+            """
+            equipos = {e['id']: e for e in db.ejecutar_query(query, tuple(ids)) or []}
+        
+        equipos_encontrados = [
+            {
+                'id': equipos[i]['id'],
+                'codigo_interno': equipos[i]['codigo_interno'],
+                'nombre': equipos[i]['nombre'],
+                'tipo': equipos[i]['tipo'],
+                'estado': equipos[i]['estado'],
+                'ubicacion': equipos[i]['ubicacion'],
+                'imagen_url': equipos[i]['imagen_url'],
+                'similitud': round(similitud, 4)
+            }
+            for i, similitud in similares if i in equipos
+        ]
         
         if equipos_encontrados:
             return jsonify({
                 'success': True,
                 'equipos': equipos_encontrados,
-                'message': f'Se encontraron {len(equipos_encontrados)} equipos con imagen registrada'
+                'indice': indice.tipo,
+                'message': f'Se encontraron {len(equipos_encontrados)} equipos similares'
             }), 200
         else:
             return jsonify({
                 'success': True,
                 'equipos': [],
-                'message': 'No se encontraron equipos con imágenes registradas'
+                'indice': indice.tipo,
+                'message': 'No se encontraron equipos similares a la imagen'
             }), 200
             
     except Exception as e:
@@ -641,14 +686,18 @@ def reconocer_equipo():
 @equipos_bp.route('/buscar-por-hash', methods=['POST'])
 @require_auth_or_session
 def buscar_por_hash():
-    """POST /api/equipos/buscar-por-hash - Buscar equipo por hash de imagen"""
+    """POST /api/equipos/buscar-por-hash - Buscar equipo por hash de imagen
+    
+    Body (una de las opciones):
+        {"imagen_hash": "<md5>"}          coincidencia exacta del archivo
+        {"phash": "<16 hex>"}             pHash calculado por el cliente
+        {"image_base64": "..."} o archivo 'imagen' (multipart): foto del equipo,
+        se compara por pHash y admite recompresión, escalado o recortes leves
+    """
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         imagen_hash = data.get('imagen_hash') or data.get('hash')
         
-        if not imagen_hash:
-            return jsonify({'error': 'Hash de imagen requerido'}), 400
-        
         query = """
             SELECT 
                 e.id, e.codigo_interno, e.nombre, e.marca, e.modelo,
@@ -659,15 +708,43 @@ def buscar_por_hash():
             FROM equipos e
             LEFT JOIN laboratorios l ON e.id_laboratorio = l.id
             LEFT JOIN categorias_equipos c ON e.id_categoria = c.id
-            WHERE e.imagen_hash = %s
         """
-        equipo = db.obtener_uno(query, (imagen_hash,))
+        
+        if imagen_hash:
+            equipo = db.obtener_uno(query + " WHERE e.imagen_hash = %s", (imagen_hash,))
+            distancia = 0 if equipo else None
+        else:
+            from ..services.hash_perceptual import indice_hashes, phash_desde_bytes
+            import base64
+            
+            phash = data.get('phash')
+            if not phash:
+                if 'imagen' in request.files:
+                    imagen_data = request.files['imagen'].read()
+                elif data.get('image_base64'):
+                    imagen_base64 = data['image_base64']
+                    imagen_data = base64.b64decode(imagen_base64.split(',')[1] if ',' in imagen_base64 else imagen_base64)
+                else:
+                    return jsonify({'error': 'Hash de imagen requerido'}), 400
+                phash = phash_desde_bytes(imagen_data)
+                if phash is None:
+                    return jsonify({'error': 'Imagen inválida'}), 400
+            if not re.fullmatch(r'[0-9a-fA-F]{16}', str(phash)):
+                return jsonify({'error': 'phash debe tener 16 caracteres hexadecimales'}), 400
+            coincidencias = indice_hashes.obtener(db).buscar(phash)
+            
+            # Fotos de entrenamiento y del equipo cuentan por igual: la más cercana
+            equipo, distancia = None, None
+            if coincidencias:
+                distancia = coincidencias[0]['distancia']
+                equipo = db.obtener_uno(query + " WHERE e.id = %s", (coincidencias[0]['id_equipo'],))
         
         if equipo:
             return jsonify({
                 'success': True,
                 'encontrado': True,
-                'equipo': equipo
+                'equipo': equipo,
+                'distancia': distancia
             }), 200
         else:
             return jsonify({
@@ -681,6 +758,7 @@ def buscar_por_hash():
 
 @equipos_bp.route('/categorias', methods=['GET'])
 @require_auth_or_session
+@cachear_respuesta('categorias_equipos')
 def listar_categorias():
     """GET /api/equipos/categorias - Listar categorías de equipos"""
     try:
@@ -6,12 +6,18 @@ Centro Minero de Sogamoso - SENA
 Campos de tabla usuarios según schema.sql:
 - id, documento, nombres, apellidos, email, telefono, id_rol, 
 - password_hash, fecha_registro, ultimo_acceso, estado
-- rostro_data (LONGBLOB) - agregado para reconocimiento facial
+
+Los rostros se guardan en rostros_usuario (una fila por plantilla:
+JPEG, embedding y versión del descriptor), fuera de la tabla usuarios.
 """
 
 from flask import request, jsonify, session
 from .blueprints import facial_bp
 from ..utils.database import DatabaseManager
+from ..services.rostros import (
+    UMBRAL_SIMILITUD, galeria_rostros, calcular_embedding, detectar_rostro,
+    cargar_embeddings, guardar_plantilla, similitud_plantillas
+)
 from werkzeug.utils import secure_filename
 import cv2
 import numpy as np
@@ -57,79 +63,42 @@ def base64_to_image(base64_string):
         print(f"Error convirtiendo base64 a imagen: {e}")
         return None
 
-def detectar_rostro(imagen):
+def iniciar_sesion_facial(usuario, similitud):
     """
-    Detecta rostro en imagen usando Haar Cascade
+    Crea la sesión del usuario reconocido y arma la respuesta de éxito
     
     Args:
-        imagen: numpy array de la imagen
+        usuario: Fila de usuarios con nombre_rol
+        similitud: Similitud de la mejor plantilla (0 a 1)
         
     Returns:
-        Rostro extraído y redimensionado, o None
-    """
-    try:
-        cascade_cara = cv2.CascadeClassifier(
-            cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-        )
-        
-        gris = cv2.cvtColor(imagen, cv2.COLOR_BGR2GRAY)
-        rostros = cascade_cara.detectMultiScale(
-            gris,
-            scaleFactor=1.1,
-            minNeighbors=5,
-            minSize=(30, 30)
-        )
-        
-        if len(rostros) == 0:
-            return None
-        
-        # Tomar el rostro más grande
-        rostro_principal = max(rostros, key=lambda r: r[2] * r[3])
-        x, y, w, h = rostro_principal
-        
-        # Extraer y redimensionar
-        rostro = imagen[y:y+h, x:x+w]
-        rostro_redimensionado = cv2.resize(rostro, (200, 200))
-        
-        return rostro_redimensionado
-    except Exception as e:
-        print(f"Error detectando rostro: {e}")
-        return None
-
-def calcular_similitud(rostro1, rostro2):
+        Respuesta JSON con código 200
     """
-    Calcula similitud entre dos rostros
+    nombre_completo = f"{usuario['nombres']} {usuario['apellidos']}"
     
-    Args:
-        rostro1: Primera imagen de rostro
-        rostro2: Segunda imagen de rostro
-        
-    Returns:
-        Valor de similitud entre 0 y 1
-    """
-    try:
-        # Redimensionar al mismo tamaño
-        rostro1_resize = cv2.resize(rostro1, (200, 200))
-        rostro2_resize = cv2.resize(rostro2, (200, 200))
-        
-        # Convertir a escala de grises
-        gris1 = cv2.cvtColor(rostro1_resize, cv2.COLOR_BGR2GRAY)
-        gris2 = cv2.cvtColor(rostro2_resize, cv2.COLOR_BGR2GRAY)
-        
-        # Normalizar
-        gris1 = cv2.equalizeHist(gris1)
-        gris2 = cv2.equalizeHist(gris2)
-        
-        # Calcular diferencia
-        diferencia = cv2.absdiff(gris1, gris2)
-        
-        # Calcular similitud (inverso de la diferencia)
-        similitud = 1.0 - (np.mean(diferencia) / 255.0)
-        
-        return similitud
-    except Exception as e:
-        print(f"Error calculando similitud: {e}")
-        return 0.0
+    # Crear sesión
+    session['user_id'] = usuario['documento']
+    session['user_name'] = nombre_completo
+    session['user_type'] = usuario.get('nombre_rol', 'Usuario')
+    session['user_level'] = usuario.get('id_rol', 1)
+    session['login_method'] = 'facial'
+    
+    # Actualizar último acceso
+    update_acceso = "UPDATE usuarios SET ultimo_acceso = NOW() WHERE id = %s"
+    db.ejecutar_comando(update_acceso, (usuario['id'],))
+    
+    return jsonify({
+        'success': True,
+        'user': {
+            'id': usuario['id'],
+            'documento': usuario['documento'],
+            'nombre': nombre_completo,
+            'rol': usuario.get('nombre_rol', 'Usuario'),
+            'email': usuario.get('email')
+        },
+        'similitud': round(similitud * 100, 2),
+        'message': f'Bienvenido {nombre_completo}'
+    }), 200
 
 # =====================================================================
 # ENDPOINTS API
@@ -168,87 +137,45 @@ def login_facial():
                 'error': 'No se detectó ningún rostro en la imagen'
             }), 400
         
-        # Obtener todos los usuarios con rostro registrado
         if not db.conectar():
             return jsonify({
                 'success': False,
                 'error': 'Error conectando a la base de datos'
             }), 500
         
-        # Usar campos correctos del schema.sql
-        query = """
-            SELECT u.id, u.documento, u.nombres, u.apellidos, u.email, 
-                u.id_rol, u.rostro_data, r.nombre_rol
-            FROM usuarios u
-            LEFT JOIN roles r ON u.id_rol = r.id
-            WHERE u.rostro_data IS NOT NULL AND u.estado = 'activo'
-        """
-        usuarios = db.ejecutar_query(query)
-        
-        if not usuarios:
+        # Comparar contra todos los usuarios con un solo producto matriz-vector
+        galeria = galeria_rostros.obtener(db)
+        if len(galeria) == 0:
             return jsonify({
                 'success': False,
                 'error': 'No hay usuarios registrados con reconocimiento facial'
             }), 404
         
-        # Comparar con cada usuario
+        id_usuario, mejor_similitud = galeria.buscar(calcular_embedding(rostro_actual))
+        umbral_similitud = UMBRAL_SIMILITUD
+        
         mejor_coincidencia = None
-        mejor_similitud = 0
-        umbral_similitud = 0.65  # 65% de similitud mínima
-        
-        for usuario in usuarios:
-            if not usuario.get('rostro_data'):
-                continue
-            # Convertir bytes a imagen
-            rostro_db = cv2.imdecode(
-                np.frombuffer(usuario['rostro_data'], np.uint8),
-                cv2.IMREAD_COLOR
-            )
-            
-            if rostro_db is None:
-                continue
-            
-            # Calcular similitud
-            similitud = calcular_similitud(rostro_actual, rostro_db)
-            
-            if similitud > mejor_similitud:
-                mejor_similitud = similitud
-                mejor_coincidencia = usuario
+        if mejor_similitud >= umbral_similitud:
+            # Solo se consultan los datos del usuario identificado
+            query = """
+                SELECT u.id, u.documento, u.nombres, u.apellidos, u.email, 
+                    u.id_rol, r.nombre_rol
+                FROM usuarios u
+                LEFT JOIN roles r ON u.id_rol = r.id
+                WHERE u.id = %s AND u.estado = 'activo'
+            """
+            mejor_coincidencia = db.obtener_uno(query, (id_usuario,))
         
         # Verificar si supera el umbral
-        if mejor_similitud >= umbral_similitud and mejor_coincidencia:
+        if mejor_coincidencia:
             # Usuario identificado exitosamente
-            nombre_completo = f"{mejor_coincidencia['nombres']} {mejor_coincidencia['apellidos']}"
-            
-            # Crear sesión
-            session['user_id'] = mejor_coincidencia['documento']
-            session['user_name'] = nombre_completo
-            session['user_type'] = mejor_coincidencia.get('nombre_rol', 'Usuario')
-            session['user_level'] = mejor_coincidencia.get('id_rol', 1)
-            session['login_method'] = 'facial'
-            
-            # Actualizar último acceso
-            update_acceso = "UPDATE usuarios SET ultimo_acceso = NOW() WHERE id = %s"
-            db.ejecutar_comando(update_acceso, (mejor_coincidencia['id'],))
-            
-            return jsonify({
-                'success': True,
-                'user': {
-                    'id': mejor_coincidencia['id'],
-                    'documento': mejor_coincidencia['documento'],
-                    'nombre': nombre_completo,
-                    'rol': mejor_coincidencia.get('nombre_rol', 'Usuario'),
-                    'email': mejor_coincidencia.get('email')
-                },
-                'similitud': round(mejor_similitud * 100, 2),
-                'message': f'Bienvenido {nombre_completo}'
-            }), 200
+            return iniciar_sesion_facial(mejor_coincidencia, mejor_similitud)
         else:
             # No se pudo identificar al usuario
             return jsonify({
                 'success': False,
                 'error': 'No se pudo identificar al usuario',
-                'similitud_maxima': round(mejor_similitud * 100, 2),
+                'similitud_maxima': round(max(mejor_similitud, 0.0) * 100, 2),
                 'umbral_requerido': round(umbral_similitud * 100, 2)
             }), 401
             
@@ -263,12 +190,106 @@ def login_facial():
     finally:
         db.desconectar()
 
+@facial_bp.route('/verify', methods=['POST'])
+def verificar_facial():
+    """
+    POST /api/facial/verify - Verificación 1:1 por documento
+    
+    Para kioscos donde el usuario digita o escanea su documento: la captura
+    se compara solo con las plantillas de ese usuario, sin recorrer la
+    galería completa.
+    
+    Body: { "documento": "...", "image": "base64_image_data" }
+    Returns: { "success": true, "user": {...} } o error
+    """
+    try:
+        data = request.get_json()
+        
+        if not data or not data.get('documento') or 'image' not in data:
+            return jsonify({
+                'success': False,
+                'error': 'Se requiere documento e image'
+            }), 400
+        
+        documento = str(data['documento']).strip()
+        
+        # Convertir imagen base64 a numpy array
+        imagen = base64_to_image(data['image'])
+        if imagen is None:
+            return jsonify({
+                'success': False,
+                'error': 'No se pudo procesar la imagen'
+            }), 400
+        
+        # Detectar rostro en la imagen
+        rostro_actual = detectar_rostro(imagen)
+        if rostro_actual is None:
+            return jsonify({
+                'success': False,
+                'error': 'No se detectó ningún rostro en la imagen'
+            }), 400
+        
+        if not db.conectar():
+            return jsonify({
+                'success': False,
+                'error': 'Error conectando a la base de datos'
+            }), 500
+        
+        query = """
+            SELECT u.id, u.documento, u.nombres, u.apellidos, u.email, 
+                u.id_rol, r.nombre_rol
+            FROM usuarios u
+            LEFT JOIN roles r ON u.id_rol = r.id
+            WHERE u.documento = %s AND u.estado = 'activo'
+        """
+        usuario = db.obtener_uno(query, (documento,))
+        if not usuario:
+            return jsonify({
+                'success': False,
+                'error': f'Usuario con documento {documento} no encontrado o inactivo'
+            }), 404
+        
+        _, plantillas = cargar_embeddings(db, [usuario['id']])
+        if not plantillas:
+            return jsonify({
+                'success': False,
+                'error': 'El usuario no tiene rostro registrado'
+            }), 404
+        
+        # Cuenta la plantilla más parecida a la captura
+        similitud = similitud_plantillas(np.vstack(plantillas), calcular_embedding(rostro_actual))
+        
+        if similitud >= UMBRAL_SIMILITUD:
+            return iniciar_sesion_facial(usuario, similitud)
+        
+        return jsonify({
+            'success': False,
+            'error': 'El rostro no coincide con el documento indicado',
+            'similitud_maxima': round(max(similitud, 0.0) * 100, 2),
+            'umbral_requerido': round(UMBRAL_SIMILITUD * 100, 2)
+        }), 401
+        
+    except Exception as e:
+        print(f"Error en verificación facial: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            'success': False,
+            'error': f'Error procesando solicitud: {str(e)}'
+        }), 500
+    finally:
+        db.desconectar()
+
 @facial_bp.route('/register', methods=['POST'])
 def registrar_rostro():
     """
     POST /api/facial/register - Registrar rostro de usuario
     
-    Body: { "user_id": "documento_usuario", "image": "base64_image_data" }
+    Con "agregar": true la captura se suma a las plantillas existentes del
+    usuario (se conservan las FACIAL_MAX_PLANTILLAS más recientes); si no,
+    las reemplaza.
+    
+    Body: { "user_id": "documento_usuario", "image": "base64_image_data", "agregar": false }
     Returns: { "success": true, "message": "..." } o error
     """
     try:
@@ -338,27 +359,24 @@ def registrar_rostro():
         except Exception as e:
             print(f"[FACIAL] No se pudo guardar imagen en archivo: {e}")
         
-        # Guardar en base de datos
-        query_update = "UPDATE usuarios SET rostro_data = %s WHERE documento = %s"
-        print(f"[FACIAL] Ejecutando UPDATE para documento: {user_id}")
-        resultado_update = db.ejecutar_comando(query_update, (imagen_bytes, user_id))
+        # Guardar en base de datos junto con el embedding usado en el login
+        print(f"[FACIAL] Guardando plantilla para documento: {user_id}")
+        total_plantillas = guardar_plantilla(
+            db, usuario['id'], imagen_bytes, calcular_embedding(rostro),
+            reemplazar=not data.get('agregar')
+        )
         
-        print(f"[FACIAL] Resultado del UPDATE: {resultado_update}")
+        print(f"[FACIAL] Plantillas registradas: {total_plantillas}")
         
-        if not resultado_update:
-            print(f"[FACIAL] ERROR: UPDATE falló para usuario: {user_id}")
+        if total_plantillas is None:
+            print(f"[FACIAL] ERROR: no se guardó la plantilla para usuario: {user_id}")
             return jsonify({
                 'success': False,
                 'error': 'Error al guardar el rostro en la base de datos. Verifica los permisos.'
             }), 500
         
         print(f"[FACIAL] Rostro guardado exitosamente para usuario: {user_id}")
-        
-        # Verificar que se guardó correctamente
-        query_verify = "SELECT LENGTH(rostro_data) as size FROM usuarios WHERE documento = %s"
-        verify_result = db.obtener_uno(query_verify, (user_id,))
-        size = verify_result['size'] if verify_result and verify_result.get('size') else 0
-        print(f"[FACIAL] Verificación: rostro_data tiene {size} bytes")
+        galeria_rostros.notificar_cambio(db, [usuario['id']])
         
         # Desconectar DESPUÉS de todo
         db.desconectar()
@@ -367,7 +385,8 @@ def registrar_rostro():
             'success': True,
             'message': f'Rostro registrado exitosamente para {nombre_completo}',
             'user_id': user_id,
-            'nombre': nombre_completo
+            'nombre': nombre_completo,
+            'plantillas': total_plantillas
         }), 200
         
     except Exception as e:
@@ -399,7 +418,8 @@ def verificar_rostro_registrado(user_id):
             return jsonify({'error': 'Error conectando a BD'}), 500
         
         query = """
-            SELECT u.id, u.documento, u.nombres, u.apellidos, u.rostro_data,
+            SELECT u.id, u.documento, u.nombres, u.apellidos,
+                   EXISTS(SELECT 1 FROM rostros_usuario ru WHERE ru.id_usuario = u.id) AS tiene_rostro,
                    r.nombre_rol
             FROM usuarios u
             LEFT JOIN roles r ON u.id_rol = r.id
@@ -415,7 +435,7 @@ def verificar_rostro_registrado(user_id):
                 'user_id': user_id
             }), 404
         
-        tiene_rostro = resultado.get('rostro_data') is not None
+        tiene_rostro = bool(resultado.get('tiene_rostro'))
         nombre_completo = f"{resultado['nombres']} {resultado['apellidos']}"
         
         return jsonify({
@@ -454,7 +474,12 @@ def estadisticas_facial():
         total_usuarios = total['total'] if total else 0
         
         # Usuarios con rostro
-        query_rostro = "SELECT COUNT(*) as total FROM usuarios WHERE rostro_data IS NOT NULL AND estado = 'activo'"
+        query_rostro = """
+            SELECT COUNT(DISTINCT ru.id_usuario) as total
+            FROM rostros_usuario ru
+            JOIN usuarios u ON ru.id_usuario = u.id
+            WHERE u.estado = 'activo'
+        """
         con_rostro = db.obtener_uno(query_rostro)
         usuarios_con_rostro = con_rostro['total'] if con_rostro else 0
         
@@ -462,9 +487,10 @@ def estadisticas_facial():
         query_rol = """
             SELECT r.nombre_rol as rol, 
             COUNT(u.id) as total,
-            SUM(CASE WHEN u.rostro_data IS NOT NULL THEN 1 ELSE 0 END) as con_rostro
+            SUM(CASE WHEN ru.id_usuario IS NOT NULL THEN 1 ELSE 0 END) as con_rostro
             FROM usuarios u
             LEFT JOIN roles r ON u.id_rol = r.id
+            LEFT JOIN (SELECT DISTINCT id_usuario FROM rostros_usuario) ru ON ru.id_usuario = u.id
             WHERE u.estado = 'activo'
             GROUP BY r.nombre_rol
         """
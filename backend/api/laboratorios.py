@@ -4,6 +4,7 @@
 from flask import Blueprint, request, jsonify, session
 from ..utils.database import DatabaseManager
 from ..utils.validators import Validator
+from ..utils.cache import cachear_respuesta
 
 laboratorios_bp = Blueprint('laboratorios', __name__, url_prefix='/api/laboratorios')
 db = DatabaseManager()
@@ -21,6 +22,7 @@ def require_auth_session(f):
 
 @laboratorios_bp.route('', methods=['GET'])
 @require_auth_session
+@cachear_respuesta('laboratorios')
 def listar_laboratorios():
     """GET /api/laboratorios - Listar todos los laboratorios"""
     try:
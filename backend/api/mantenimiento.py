@@ -5,6 +5,8 @@ Gestión de mantenimientos preventivos y correctivos
 
 from flask import Blueprint, request, jsonify, session
 from ..utils.database import DatabaseManager
+from ..utils.paginacion import consultar_pagina, CursorInvalido
+from ..utils.cache import cachear_respuesta
 from datetime import datetime, timedelta
 import json
 
@@ -27,7 +29,8 @@ def listar_mantenimientos():
     - estado: Filtrar por estado (en_proceso, completado, cancelado)
     - fecha_desde: Fecha inicio (YYYY-MM-DD)
     - fecha_hasta: Fecha fin (YYYY-MM-DD)
-    - limit: Límite de resultados (default 100)
+    - limit: Límite de resultados sin paginar (default 100)
+    - limite, cursor, incluir_total: Paginación por cursor (opcional)
     """
     print("📋 API Mantenimiento: GET /api/mantenimiento llamado")
     try:
@@ -91,10 +94,10 @@ def listar_mantenimientos():
             query += " AND hm.fecha_inicio <= %s"
             params.append(fecha_hasta)
         
-        query += " ORDER BY hm.fecha_inicio DESC LIMIT %s"
-        params.append(limit)
-        
-        mantenimientos = db.ejecutar_query(query, tuple(params)) or []
+        mantenimientos, paginacion = consultar_pagina(
+            db, query, params, [('hm.fecha_inicio', 'DESC'), ('hm.id', 'DESC')],
+            limite_sin_paginar=limit
+        )
         
         # Formatear fechas
         for m in mantenimientos:
@@ -110,9 +113,12 @@ def listar_mantenimientos():
         return jsonify({
             'success': True,
             'mantenimientos': mantenimientos,
-            'total': len(mantenimientos)
+            'total': len(mantenimientos),
+            'paginacion': paginacion
         }), 200
         
+    except CursorInvalido as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -340,43 +346,45 @@ def completar_mantenimiento(id):
                 fecha_inicio = datetime.strptime(fecha_inicio, '%Y-%m-%d %H:%M:%S')
             tiempo_inactividad = round((datetime.now() - fecha_inicio).total_seconds() / 3600, 2)
         
-        # Actualizar el registro de mantenimiento
-        db.actualizar('historial_mantenimiento', {
-            'estado': 'completado',
-            'fecha_fin': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'descripcion_trabajo': descripcion or mantenimiento.get('descripcion_trabajo', ''),
-            'partes_reemplazadas': data.get('partes_reemplazadas', ''),
-            'costo_mantenimiento': data.get('costo_mantenimiento', 0),
-            'tiempo_inactividad_horas': tiempo_inactividad or 0,
-            'observaciones': data.get('observaciones', ''),
-            'estado_post_mantenimiento': estado_post,
-            'proxima_fecha_mantenimiento': proxima_fecha.strftime('%Y-%m-%d') if proxima_fecha else None
-        }, 'id = %s', (id,))
-        
-        # Actualizar estado del equipo
-        estado_anterior = mantenimiento['equipo_estado']
-        if estado_post in ['excelente', 'bueno', 'regular']:
-            db.actualizar('equipos', {
-                'estado': 'disponible',
-                'estado_fisico': estado_post
-            }, 'id = %s', (mantenimiento['id_equipo'],))
-            nuevo_estado_equipo = 'disponible'
-        else:
-            db.actualizar('equipos', {
-                'estado': 'reparacion',
-                'estado_fisico': 'malo'
-            }, 'id = %s', (mantenimiento['id_equipo'],))
-            nuevo_estado_equipo = 'reparacion'
-        
-        # Resolver alertas pendientes (solo si el equipo quedó operativo)
-        if estado_post in ['excelente', 'bueno', 'regular']:
-            db.ejecutar_query("""
-                UPDATE alertas_mantenimiento 
-                SET estado_alerta = 'resuelta', 
-                    fecha_resolucion = NOW(),
-                    observaciones_resolucion = %s
-                WHERE id_equipo = %s AND estado_alerta IN ('pendiente', 'en_proceso')
-            """, (f'Resuelto por mantenimiento #{id}', mantenimiento['id_equipo']))
+        # Mantenimiento, equipo y alertas se confirman en un solo COMMIT
+        with db.transaccion() as tx:
+            # Actualizar el registro de mantenimiento
+            tx.actualizar('historial_mantenimiento', {
+                'estado': 'completado',
+                'fecha_fin': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'descripcion_trabajo': descripcion or mantenimiento.get('descripcion_trabajo', ''),
+                'partes_reemplazadas': data.get('partes_reemplazadas', ''),
+                'costo_mantenimiento': data.get('costo_mantenimiento', 0),
+                'tiempo_inactividad_horas': tiempo_inactividad or 0,
+                'observaciones': data.get('observaciones', ''),
+                'estado_post_mantenimiento': estado_post,
+                'proxima_fecha_mantenimiento': proxima_fecha.strftime('%Y-%m-%d') if proxima_fecha else None
+            }, 'id = %s', (id,))
+            
+            # Actualizar estado del equipo
+            estado_anterior = mantenimiento['equipo_estado']
+            if estado_post in ['excelente', 'bueno', 'regular']:
+                tx.actualizar('equipos', {
+                    'estado': 'disponible',
+                    'estado_fisico': estado_post
+                }, 'id = %s', (mantenimiento['id_equipo'],))
+                nuevo_estado_equipo = 'disponible'
+            else:
+                tx.actualizar('equipos', {
+                    'estado': 'reparacion',
+                    'estado_fisico': 'malo'
+                }, 'id = %s', (mantenimiento['id_equipo'],))
+                nuevo_estado_equipo = 'reparacion'
+            
+            # Resolver alertas pendientes (solo si el equipo quedó operativo)
+            if estado_post in ['excelente', 'bueno', 'regular']:
+                tx.ejecutar("""
+                    UPDATE alertas_mantenimiento 
+                    SET estado_alerta = 'resuelta', 
+                        fecha_resolucion = NOW(),
+                        observaciones_resolucion = %s
+                    WHERE id_equipo = %s AND estado_alerta IN ('pendiente', 'en_proceso')
+                """, (f'Resuelto por mantenimiento #{id}', mantenimiento['id_equipo']))
         
         return jsonify({
             'success': True,
@@ -815,6 +823,7 @@ def listar_tecnicos_mantenimiento():
 
 
 @mantenimiento_bp.route('/tipos', methods=['GET'])
+@cachear_respuesta('tipos_mantenimiento')
 def listar_tipos():
     """
     GET /api/mantenimiento/tipos
@@ -969,6 +978,7 @@ def listar_alertas():
     - estado: pendiente, en_proceso, resuelta, cancelada
     - prioridad: baja, media, alta, critica
     - equipo_id: Filtrar por equipo
+    - limite, cursor, incluir_total: Paginación por cursor (opcional)
     """
     try:
         estado = request.args.get('estado')
@@ -1010,9 +1020,13 @@ def listar_alertas():
             query += " AND am.id_equipo = %s"
             params.append(equipo_id)
         
-        query += " ORDER BY FIELD(am.prioridad, 'critica', 'alta', 'media', 'baja'), am.fecha_limite ASC"
-        
-        alertas = db.ejecutar_query(query, tuple(params)) or []
+        # fecha_limite puede ser NULL: se ordena como la fecha mínima (igual que
+        # MySQL ubica los NULL primero) para que el cursor pueda compararla
+        alertas, paginacion = consultar_pagina(db, query, params, [
+            ("FIELD(am.prioridad, 'critica', 'alta', 'media', 'baja')", 'ASC'),
+            ("COALESCE(am.fecha_limite, '1000-01-01')", 'ASC'),
+            ('am.id', 'ASC')
+        ])
         
         # Formatear fechas
         for a in alertas:
@@ -1026,9 +1040,12 @@ def listar_alertas():
         return jsonify({
             'success': True,
             'alertas': alertas,
-            'total': len(alertas)
+            'total': len(alertas),
+            'paginacion': paginacion
         }), 200
         
+    except CursorInvalido as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -1119,7 +1136,7 @@ def generar_alertas():
     - Equipos en mal estado
     """
     try:
-        alertas_creadas = 0
+        nuevas_alertas = []
         
         # 1. Alertas por mantenimiento vencido
         vencidos = db.ejecutar_query("""
@@ -1135,7 +1152,7 @@ def generar_alertas():
         """) or []
         
         for v in vencidos:
-            db.insertar('alertas_mantenimiento', {
+            nuevas_alertas.append({
                 'id_equipo': v['id_equipo'],
                 'tipo_alerta': 'mantenimiento_vencido',
                 'descripcion_alerta': f"Mantenimiento vencido para {v['nombre']}. Fecha programada: {v['proxima_fecha_mantenimiento']}",
@@ -1143,7 +1160,6 @@ def generar_alertas():
                 'prioridad': 'alta',
                 'estado_alerta': 'pendiente'
             })
-            alertas_creadas += 1
         
         # 2. Alertas por mantenimiento próximo (7 días)
         proximos = db.ejecutar_query("""
@@ -1159,7 +1175,7 @@ def generar_alertas():
         """) or []
         
         for p in proximos:
-            db.insertar('alertas_mantenimiento', {
+            nuevas_alertas.append({
                 'id_equipo': p['id_equipo'],
                 'tipo_alerta': 'mantenimiento_programado',
                 'descripcion_alerta': f"Mantenimiento programado para {p['nombre']}. Fecha: {p['proxima_fecha_mantenimiento']}",
@@ -1167,7 +1183,6 @@ def generar_alertas():
                 'prioridad': 'media',
                 'estado_alerta': 'pendiente'
             })
-            alertas_creadas += 1
         
         # 3. Alertas por equipos en mal estado
         mal_estado = db.ejecutar_query("""
@@ -1182,7 +1197,7 @@ def generar_alertas():
         """) or []
         
         for m in mal_estado:
-            db.insertar('alertas_mantenimiento', {
+            nuevas_alertas.append({
                 'id_equipo': m['id'],
                 'tipo_alerta': 'revision_urgente',
                 'descripcion_alerta': f"Revisión urgente requerida para {m['nombre']} ({m['codigo_interno']}). Estado físico: malo",
@@ -1190,7 +1205,12 @@ def generar_alertas():
                 'prioridad': 'critica',
                 'estado_alerta': 'pendiente'
             })
-            alertas_creadas += 1
+        
+        # Todas las alertas en un solo INSERT multi-fila
+        ids = db.insertar_muchos('alertas_mantenimiento', nuevas_alertas)
+        if ids is None:
+            return jsonify({'success': False, 'error': 'No se pudieron registrar las alertas'}), 500
+        alertas_creadas = len(nuevas_alertas)
         
         return jsonify({
             'success': True,
@@ -10,6 +10,7 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
 from backend.utils.database import DatabaseManager
+from backend.utils.paginacion import consultar_pagina, CursorInvalido
 from backend.utils.validators import Validator
 
 # Blueprint para prácticas
@@ -88,7 +89,10 @@ def actualizar_estados_automaticos():
 @practicas_bp.route('', methods=['GET'])
 @require_auth_session
 def listar_practicas():
-    """Obtener lista de todas las prácticas con filtros opcionales"""
+    """Obtener lista de todas las prácticas con filtros opcionales
+    
+    Paginación por cursor opcional: ?limite=N&cursor=...&incluir_total=true
+    """
     try:
         # Actualizar estados automáticamente antes de listar
         actualizar_estados_automaticos()
@@ -133,16 +137,19 @@ def listar_practicas():
             query += " AND p.id_programa = %s"
             params.append(int(programa))
         
-        query += " ORDER BY p.fecha DESC"
-        
-        practicas = db.ejecutar_query(query, tuple(params) if params else None) or []
+        practicas, paginacion = consultar_pagina(
+            db, query, params, [('p.fecha', 'DESC'), ('p.id', 'DESC')]
+        )
         
         return jsonify({
             'success': True, 
             'practicas': practicas,
-            'total': len(practicas)
+            'total': len(practicas),
+            'paginacion': paginacion
         }), 200
         
+    except CursorInvalido as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'message': f'Error obteniendo prácticas: {str(e)}'}), 500
 
@@ -311,11 +318,10 @@ def crear_practica():
             estado
         )
         
-        db.ejecutar_comando(query, params)
-        
-        # Obtener ID
-        result = db.obtener_uno("SELECT LAST_INSERT_ID() as id")
-        nuevo_id = result['id'] if result else None
+        # El ID se obtiene en la misma conexión del INSERT
+        with db.transaccion() as tx:
+            tx.ejecutar(query, params)
+            nuevo_id = tx.lastrowid
         
         return jsonify({
             'success': True, 
@@ -808,6 +814,9 @@ def crear_prestamos_practica(practica_id):
         if not equipos_ids:
             return jsonify({'success': False, 'message': 'No hay equipos asignados a esta práctica'}), 400
         
+        # Un equipo repetido en equipos_requeridos genera un solo préstamo
+        equipos_ids = list(dict.fromkeys(int(equipo_id) for equipo_id in equipos_ids))
+        
         from datetime import datetime, timedelta
         fecha_inicio = practica['fecha']
         duracion = float(practica['duracion_horas'] or 1.0)
@@ -820,44 +829,64 @@ def crear_prestamos_practica(practica_id):
         prestamos_creados = []
         errores = []
         
-        for equipo_id in equipos_ids:
-            try:
-                equipo = db.obtener_uno("SELECT estado FROM equipos WHERE id = %s", (equipo_id,))
+        # Un solo COMMIT y un solo INSERT multi-fila para todos los equipos
+        with db.transaccion() as tx:
+            placeholders = ', '.join(['%s'] * len(equipos_ids))
+            estados = {
+                e['id']: e['estado'] for e in tx.consultar(
+                    f"SELECT id, estado FROM equipos WHERE id IN ({placeholders}) FOR UPDATE",
+                    tuple(equipos_ids)
+                )
+            }
+            
+            codigos = {
+                equipo_id: f"PRAC-{practica['codigo']}-EQ{equipo_id}" for equipo_id in equipos_ids
+            }
+            codigos_existentes = {
+                p['codigo'] for p in tx.consultar(
+                    f"SELECT codigo FROM prestamos WHERE codigo IN ({placeholders})",
+                    tuple(codigos.values())
+                )
+            }
+            
+            filas_prestamos = []
+            for equipo_id in equipos_ids:
+                estado_equipo = estados.get(equipo_id)
+                codigo_prestamo = codigos[equipo_id]
                 
-                if not equipo:
+                if estado_equipo is None:
                     errores.append(f'Equipo {equipo_id} no encontrado')
                     continue
                 
-                if equipo['estado'] != 'disponible':
-                    errores.append(f'Equipo {equipo_id} no está disponible (estado: {equipo["estado"]})')
+                if estado_equipo != 'disponible':
+                    errores.append(f'Equipo {equipo_id} no está disponible (estado: {estado_equipo})')
                     continue
                 
-                codigo_prestamo = f"PRAC-{practica['codigo']}-EQ{equipo_id}"
-                
-                query_prestamo = """
-                    INSERT INTO prestamos
-                    (codigo, id_equipo, id_usuario_solicitante, id_usuario_autorizador,
-                     fecha_solicitud, fecha, fecha_devolucion_programada, proposito, estado)
-                    VALUES (%s, %s, %s, %s, NOW(), %s, %s, %s, %s)
-                """
-                params = (
-                    codigo_prestamo,
-                    equipo_id,
-                    practica['instructor_usuario_id'],
-                    session.get('user_id'),
-                    fecha_inicio,
-                    fecha_fin,
-                    f"Práctica: {practica['nombre']}",
-                    'activo'
-                )
-                
-                db.ejecutar_comando(query_prestamo, params)
-                db.ejecutar_comando("UPDATE equipos SET estado = 'prestado' WHERE id = %s", (equipo_id,))
+                if codigo_prestamo in codigos_existentes:
+                    errores.append(f'Error con equipo {equipo_id}: ya existe el préstamo {codigo_prestamo}')
+                    continue
                 
+                codigos_existentes.add(codigo_prestamo)
+                filas_prestamos.append({
+                    'codigo': codigo_prestamo,
+                    'id_equipo': equipo_id,
+                    'id_usuario_solicitante': practica['instructor_usuario_id'],
+                    'id_usuario_autorizador': session.get('user_id'),
+                    'fecha_solicitud': datetime.now(),
+                    'fecha': fecha_inicio,
+                    'fecha_devolucion_programada': fecha_fin,
+                    'proposito': f"Práctica: {practica['nombre']}",
+                    'estado': 'activo'
+                })
                 prestamos_creados.append(equipo_id)
-                
-            except Exception as e:
-                errores.append(f'Error con equipo {equipo_id}: {str(e)}')
+            
+            if filas_prestamos:
+                tx.insertar_muchos('prestamos', filas_prestamos)
+                placeholders = ', '.join(['%s'] * len(prestamos_creados))
+                tx.ejecutar(
+                    f"UPDATE equipos SET estado = 'prestado' WHERE id IN ({placeholders})",
+                    tuple(prestamos_creados)
+                )
         
         mensaje = f'{len(prestamos_creados)} préstamo(s) creado(s) exitosamente'
         if errores:
@@ -12,6 +12,7 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
 from backend.utils.database import DatabaseManager
+from backend.utils.paginacion import consultar_pagina, CursorInvalido
 from backend.utils.validators import Validator
 
 # Blueprint para préstamos
@@ -61,7 +62,10 @@ def require_permission(permiso):
 @prestamos_bp.route('', methods=['GET'])
 @require_auth_session
 def listar_prestamos():
-    """GET /api/prestamos - Listar todos los préstamos con filtros"""
+    """GET /api/prestamos - Listar todos los préstamos con filtros
+    
+    Paginación por cursor opcional: ?limite=N&cursor=...&incluir_total=true
+    """
     try:
         estado = request.args.get('estado', '').strip()
         usuario = request.args.get('usuario', '').strip()
@@ -117,16 +121,19 @@ def listar_prestamos():
                         OR us.nombres LIKE %s OR us.apellidos LIKE %s)"""
             params.extend([f'%{busqueda}%'] * 4)
         
-        query += " ORDER BY p.fecha_solicitud DESC"
-        
-        prestamos = db.ejecutar_query(query, tuple(params) if params else None) or []
+        prestamos, paginacion = consultar_pagina(
+            db, query, params, [('p.fecha_solicitud', 'DESC'), ('p.id', 'DESC')]
+        )
         
         return jsonify({
             'success': True,
             'prestamos': prestamos,
-            'total': len(prestamos)
+            'total': len(prestamos),
+            'paginacion': paginacion
         }), 200
         
+    except CursorInvalido as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'message': f'Error listando préstamos: {str(e)}'}), 500
 
@@ -347,38 +354,47 @@ def crear_prestamo():
                 (fecha >= %s AND fecha_devolucion_programada <= %s)
             )
         """
-        conflicto = db.obtener_uno(conflicto_query, (
-            id_equipo,
-            fecha_inicio, fecha_inicio,
-            fecha_devolucion, fecha_devolucion,
-            fecha_inicio, fecha_devolucion
-        ))
-        
-        if conflicto and conflicto['total'] > 0:
-            return jsonify({
-                'success': False, 
-                'message': 'Ya existe un préstamo para este equipo en el horario solicitado'
-            }), 400
         
         # Generar código único
         codigo = f"PREST-{uuid.uuid4().hex[:8].upper()}"
         user_id = session.get('user_id')
         
-        # Crear préstamo
-        query = """
-            INSERT INTO prestamos 
-            (codigo, id_equipo, id_usuario_solicitante, fecha, fecha_devolucion_programada, 
-             proposito, observaciones, estado)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, 'solicitado')
-        """
-        db.ejecutar_comando(query, (
-            codigo, id_equipo, user_id, fecha_inicio, fecha_devolucion,
-            proposito, data.get('observaciones', '')
-        ))
-        
-        # Obtener ID del préstamo creado
-        result = db.obtener_uno("SELECT LAST_INSERT_ID() as id")
-        nuevo_id = result['id'] if result else None
+        # Verificación de conflicto e inserción en la misma transacción.
+        # El bloqueo de la fila del equipo serializa las solicitudes
+        # concurrentes: la segunda espera y ve el préstamo de la primera.
+        mensaje_error = None
+        nuevo_id = None
+        with db.transaccion() as tx:
+            equipo = tx.obtener_uno(
+                "SELECT id, estado, nombre FROM equipos WHERE id = %s FOR UPDATE", (id_equipo,))
+            if not equipo or equipo['estado'] != 'disponible':
+                mensaje_error = 'El equipo ya no está disponible'
+            else:
+                conflicto = tx.obtener_uno(conflicto_query, (
+                    id_equipo,
+                    fecha_inicio, fecha_inicio,
+                    fecha_devolucion, fecha_devolucion,
+                    fecha_inicio, fecha_devolucion
+                ))
+                if conflicto and conflicto['total'] > 0:
+                    mensaje_error = 'Ya existe un préstamo para este equipo en el horario solicitado'
+            
+            # Sin escrituras si hay conflicto: el COMMIT solo libera el bloqueo
+            if mensaje_error is None:
+                # Crear préstamo (el ID sale de la misma conexión)
+                nuevo_id = tx.insertar('prestamos', {
+                    'codigo': codigo,
+                    'id_equipo': id_equipo,
+                    'id_usuario_solicitante': user_id,
+                    'fecha': fecha_inicio,
+                    'fecha_devolucion_programada': fecha_devolucion,
+                    'proposito': proposito,
+                    'observaciones': data.get('observaciones', ''),
+                    'estado': 'solicitado'
+                })
+        
+        if mensaje_error:
+            return jsonify({'success': False, 'message': mensaje_error}), 400
         
         # =============================================
         # SECCIÓN DE NOTIFICACIONES - FORMA CORRECTA
@@ -11,6 +11,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
 from backend.utils.database import DatabaseManager
 from backend.utils.validators import Validator
+from backend.utils.cache import cachear_respuesta
 
 # Blueprint para programas
 programas_bp = Blueprint('programas', __name__, url_prefix='/api/programas')
@@ -169,17 +170,14 @@ def crear_programa():
             return jsonify({'success': False, 'message': 'Ya existe un programa con ese código'}), 400
         
         # Insertar programa
-        query = """
-            INSERT INTO programas_formacion 
-            (codigo_programa, nombre_programa, tipo_programa, descripcion, duracion_meses, estado)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """
-        db.ejecutar_comando(query, (codigo, nombre, tipo, descripcion, duracion, estado))
-        
-        # Obtener ID del programa creado
-        query_id = "SELECT LAST_INSERT_ID() as id"
-        result = db.obtener_uno(query_id)
-        nuevo_id = result['id'] if result else None
+        nuevo_id = db.insertar('programas_formacion', {
+            'codigo_programa': codigo,
+            'nombre_programa': nombre,
+            'tipo_programa': tipo,
+            'descripcion': descripcion,
+            'duracion_meses': duracion,
+            'estado': estado
+        })
         
         return jsonify({
             'success': True, 
@@ -261,6 +259,7 @@ def actualizar_programa(programa_id):
 
 @programas_bp.route('/tipos', methods=['GET'])
 @require_auth_session
+@cachear_respuesta('tipos_programa', timeout=3600)
 def obtener_tipos():
     """Obtener tipos de programas disponibles"""
     tipos = [
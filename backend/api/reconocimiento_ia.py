@@ -6,7 +6,9 @@ Endpoints para el sistema de reconocimiento de equipos mediante MobileNet
 Basado en documento de formulación MGA - Objetivo Específico 1
 
 Endpoints implementados:
-- POST /api/reconocimiento/entrenar - Entrenar modelo con nuevos equipos
+- POST /api/reconocimiento/entrenar - Encolar entrenamiento del modelo con nuevos equipos
+- GET /api/reconocimiento/entrenar/<id> - Estado y avance de un entrenamiento
+- GET /api/reconocimiento/entrenamientos - Últimos entrenamientos
 - POST /api/reconocimiento/identificar - Identificar equipo por imagen
 - POST /api/reconocimiento/registrar-equipo - Registrar nuevo equipo con imágenes
 - GET /api/reconocimiento/estadisticas - Estadísticas del sistema
@@ -17,18 +19,25 @@ Endpoints implementados:
 from flask import request, jsonify, session
 from .blueprints import reconocimiento_bp
 from ..utils.database import DatabaseManager
+from ..utils.versiones import leer_version
+from ..services.entrenamiento import (
+    VERSION_MODELO_RECONOCIMIENTO, consultar_equipos_entrenamiento, encolar_entrenamiento,
+    listar_trabajos, obtener_trabajo
+)
 from werkzeug.utils import secure_filename
 import os
 import json
 import logging
 from datetime import datetime
 import base64
+import threading
 
 # Imports opcionales para reconocimiento de imágenes
 try:
     import numpy as np
     import cv2
     from ..reconocimiento_mobilenet import ReconocimientoMobileNet, validar_calidad_imagen, calcular_hash_imagen
+    from ..services.hash_perceptual import DISTANCIA_MAXIMA, distancia_hamming, indice_hashes, phash_archivo
     CV2_DISPONIBLE = True
 except ImportError:
     CV2_DISPONIBLE = False
@@ -37,29 +46,99 @@ except ImportError:
     ReconocimientoMobileNet = None
     validar_calidad_imagen = None
     calcular_hash_imagen = None
+    indice_hashes = None
 
 db = DatabaseManager()
 logger = logging.getLogger(__name__)
 
 # Inicializar sistema de reconocimiento
 sistema_reconocimiento = None
+version_modelo_cargada = None
+_lock_sistema = threading.Lock()
 
 def obtener_sistema():
-    """Obtiene o inicializa el sistema de reconocimiento"""
-    global sistema_reconocimiento
+    """
+    Obtiene o inicializa el sistema de reconocimiento
+    
+    El worker de entrenamiento incrementa la versión 'modelo_reconocimiento'
+    al terminar; si cambió desde la última carga, el modelo se recarga.
+    """
+    global sistema_reconocimiento, version_modelo_cargada
     if not CV2_DISPONIBLE:
         return None
-    if sistema_reconocimiento is None:
-        sistema_reconocimiento = ReconocimientoMobileNet()
-        # Intentar cargar modelo existente
-        try:
-            sistema_reconocimiento.cargar_modelo()
-            logger.info("✅ Modelo MobileNet cargado exitosamente")
-        except FileNotFoundError:
-            logger.info("⚠️ No hay modelo entrenado. Esperando primer entrenamiento.")
+    version = leer_version(db, VERSION_MODELO_RECONOCIMIENTO)
+    with _lock_sistema:
+        if sistema_reconocimiento is None or (version is not None and version != version_modelo_cargada):
+            sistema = ReconocimientoMobileNet()
+            # Intentar cargar modelo existente
+            try:
+                sistema.cargar_modelo()
+                logger.info("✅ Modelo MobileNet cargado exitosamente")
+            except FileNotFoundError:
+                logger.info("⚠️ No hay modelo entrenado. Esperando primer entrenamiento.")
+            if sistema_reconocimiento is not None:
+                sistema_reconocimiento.cerrar()
+            sistema_reconocimiento = sistema
+            version_modelo_cargada = version
     return sistema_reconocimiento
 
 
+def _fila_imagen_entrenamiento(equipo_id, ruta_web, angulo, resolucion, tamano, hash_img, phash, calidad):
+    """Fila de imagenes_entrenamiento para insertar en lote con db.insertar_muchos"""
+    return {
+        'id_equipo': equipo_id,
+        'ruta_imagen': ruta_web,
+        'angulo_captura': angulo,
+        'resolucion': resolucion,
+        'formato': 'jpg',
+        'tamano_bytes': tamano,
+        'hash_imagen': hash_img,
+        'phash': phash,
+        'calidad_imagen': calidad,
+        'estado': 'pendiente'
+    }
+
+
+def _buscar_duplicada(indice, phash, filas_lote):
+    """
+    Imagen ya registrada (o enviada antes en el mismo lote) casi idéntica
+
+    Returns:
+        dict con 'id_equipo', 'ruta' y 'distancia' de la más parecida, o None
+    """
+    if phash is None:
+        return None
+    for fila in filas_lote:
+        if fila['phash'] and distancia_hamming(phash, fila['phash']) <= DISTANCIA_MAXIMA:
+            return {'id_equipo': fila['id_equipo'], 'ruta': fila['ruta_imagen'],
+                    'distancia': distancia_hamming(phash, fila['phash'])}
+    coincidencias = indice.buscar(phash)
+    return coincidencias[0] if coincidencias else None
+
+
+def _insertar_imagenes_entrenamiento(filas):
+    """
+    Inserta las imágenes en un solo lote y las agrega al índice de pHash
+
+    Returns:
+        False si la inserción falló
+    """
+    if not filas:
+        return True
+    ids = db.insertar_muchos('imagenes_entrenamiento', filas)
+    if ids is None:
+        return False
+    nuevas = None
+    if len(ids) == len(filas):
+        nuevas = [
+            (fila['phash'], {'origen': 'entrenamiento', 'id': id_imagen,
+                             'id_equipo': fila['id_equipo'], 'ruta': fila['ruta_imagen']})
+            for fila, id_imagen in zip(filas, ids) if fila['phash']
+        ]
+    indice_hashes.notificar_cambio(db, nuevas)
+    return True
+
+
 @reconocimiento_bp.route('/estadisticas', methods=['GET'])
 def estadisticas_reconocimiento():
     """
@@ -214,6 +293,9 @@ def agregar_imagenes_entrenamiento(equipo_id):
         os.makedirs(directorio_equipo, exist_ok=True)
         
         imagenes_guardadas = []
+        imagenes_duplicadas = []
+        filas_imagenes = []
+        indice = indice_hashes.obtener(db)
         
         for idx, img_base64 in enumerate(imagenes_base64):
             try:
@@ -239,18 +321,20 @@ def agregar_imagenes_entrenamiento(equipo_id):
                     img = cv2.imread(ruta_imagen)
                     h, w = img.shape[:2] if img is not None else (0, 0)
                     hash_img = calcular_hash_imagen(ruta_imagen)
+                    phash = phash_archivo(ruta_imagen)
                     
-                    # Insertar en imagenes_entrenamiento
-                    query_img = """
-                        INSERT INTO imagenes_entrenamiento (
-                            id_equipo, ruta_imagen, angulo_captura,
-                            resolucion, formato, tamano_bytes, hash_imagen,
-                            calidad_imagen, estado
-                        ) VALUES (%s, %s, %s, %s, 'jpg', %s, %s, %s, 'pendiente')
-                    """
-                    db.ejecutar_comando(query_img, (
+                    # Casi duplicada (recomprimida, escalada, recortada): no aporta al entrenamiento
+                    duplicada = _buscar_duplicada(indice, phash, filas_imagenes)
+                    if duplicada:
+                        logger.warning(f"⚠️ Imagen {idx} rechazada: casi idéntica a {duplicada['ruta']}")
+                        imagenes_duplicadas.append({'indice': idx, **duplicada})
+                        os.remove(ruta_imagen)
+                        continue
+                    
+                    # Se inserta en imagenes_entrenamiento al final, en un solo lote
+                    filas_imagenes.append(_fila_imagen_entrenamiento(
                         equipo_id, ruta_web, angulo, f'{w}x{h}',
-                        tamano, hash_img, validacion['calidad']
+                        tamano, hash_img, phash, validacion['calidad']
                     ))
                     
                     imagenes_guardadas.append({
@@ -266,6 +350,9 @@ def agregar_imagenes_entrenamiento(equipo_id):
                 logger.error(f"❌ Error procesando imagen {idx}: {e}")
                 continue
         
+        if not _insertar_imagenes_entrenamiento(filas_imagenes):
+            return jsonify({'success': False, 'error': 'No se pudieron registrar las imágenes'}), 500
+        
         # Contar total de imágenes del equipo
         total = db.obtener_uno(
             "SELECT COUNT(*) as total FROM imagenes_entrenamiento WHERE id_equipo = %s",
@@ -278,6 +365,7 @@ def agregar_imagenes_entrenamiento(equipo_id):
             'success': True,
             'mensaje': f'{len(imagenes_guardadas)} imágenes agregadas exitosamente',
             'imagenes_guardadas': len(imagenes_guardadas),
+            'imagenes_duplicadas': imagenes_duplicadas,
             'total_imagenes_equipo': total['total'] if total else len(imagenes_guardadas),
             'listo_para_entrenar': (total['total'] if total else 0) >= 5
         }), 201
@@ -342,6 +430,9 @@ def registrar_equipo():
         os.makedirs(directorio_equipo, exist_ok=True)
         
         imagenes_guardadas = []
+        imagenes_duplicadas = []
+        filas_imagenes = []
+        indice = indice_hashes.obtener(db)
         
         for idx, img_base64 in enumerate(imagenes_base64):
             try:
@@ -363,14 +454,18 @@ def registrar_equipo():
                     img = cv2.imread(ruta_imagen)
                     h, w = img.shape[:2] if img is not None else (0, 0)
                     hash_img = calcular_hash_imagen(ruta_imagen)
+                    phash = phash_archivo(ruta_imagen)
                     
-                    db.ejecutar_comando("""
-                        INSERT INTO imagenes_entrenamiento (
-                            id_equipo, ruta_imagen, angulo_captura,
-                            resolucion, formato, tamano_bytes, hash_imagen,
-                            calidad_imagen, estado
-                        ) VALUES (%s, %s, %s, %s, 'jpg', %s, %s, %s, 'pendiente')
-                    """, (equipo_id, ruta_web, angulo, f'{w}x{h}', tamano, hash_img, validacion['calidad']))
+                    duplicada = _buscar_duplicada(indice, phash, filas_imagenes)
+                    if duplicada:
+                        logger.warning(f"⚠️ Imagen {idx} rechazada: casi idéntica a {duplicada['ruta']}")
+                        imagenes_duplicadas.append({'indice': idx, **duplicada})
+                        os.remove(ruta_imagen)
+                        continue
+                    
+                    filas_imagenes.append(_fila_imagen_entrenamiento(
+                        equipo_id, ruta_web, angulo, f'{w}x{h}', tamano, hash_img, phash, validacion['calidad']
+                    ))
                     
                     imagenes_guardadas.append({'ruta': ruta_web, 'angulo': angulo})
                 else:
@@ -381,10 +476,14 @@ def registrar_equipo():
                 logger.error(f"❌ Error procesando imagen {idx}: {e}")
                 continue
         
+        if not _insertar_imagenes_entrenamiento(filas_imagenes):
+            return jsonify({'success': False, 'error': 'No se pudieron registrar las imágenes'}), 500
+        
         if len(imagenes_guardadas) < 5:
             return jsonify({
                 'success': False,
-                'error': f'Solo {len(imagenes_guardadas)} imágenes válidas. Se requieren al menos 5.'
+                'error': f'Solo {len(imagenes_guardadas)} imágenes válidas. Se requieren al menos 5.',
+                'imagenes_duplicadas': imagenes_duplicadas
             }), 400
         
         logger.info(f"✅ Equipo {codigo_equipo} registrado con {len(imagenes_guardadas)} imágenes para entrenamiento")
@@ -396,6 +495,7 @@ def registrar_equipo():
             'codigo_equipo': codigo_equipo,
             'nombre': equipo['nombre'],
             'imagenes_guardadas': len(imagenes_guardadas),
+            'imagenes_duplicadas': imagenes_duplicadas,
             'proximo_paso': 'Entrenar el modelo desde la sección IA Visual'
         }), 201
         
@@ -410,8 +510,9 @@ def registrar_equipo():
 def entrenar_modelo():
     """
     POST /api/reconocimiento/entrenar
-    Entrena el modelo MobileNet con equipos que tienen imágenes de entrenamiento
-    Usa tablas: equipos + imagenes_entrenamiento + modelos_ia
+    Encola el entrenamiento del modelo MobileNet con los equipos que tienen
+    imágenes de entrenamiento. El worker de backend/services/entrenamiento.py
+    lo ejecuta; el avance se consulta en GET /api/reconocimiento/entrenar/<id>
     
     Body (opcional):
     {
@@ -419,6 +520,9 @@ def entrenar_modelo():
         "epochs": 10,
         "validation_split": 0.2
     }
+    
+    Respuestas: 202 con trabajo_id; 409 si ya hay un entrenamiento en cola
+    o en proceso (incluye su trabajo_id)
     """
     if not CV2_DISPONIBLE:
         return jsonify({'success': False, 'error': 'Reconocimiento no disponible. OpenCV no instalado.'}), 503
@@ -426,157 +530,81 @@ def entrenar_modelo():
     try:
         data = request.get_json() or {}
         
-        equipos_ids = data.get('equipos_ids', [])
-        epochs = data.get('epochs', 10)
-        validation_split = data.get('validation_split', 0.2)
-        
-        # Obtener equipos con mínimo 5 imágenes de entrenamiento
-        if equipos_ids:
-            placeholders = ','.join(['%s'] * len(equipos_ids))
-            query = f"""
-                SELECT 
-                    e.id,
-                    e.codigo_interno as codigo_equipo,
-                    e.nombre as nombre_objeto,
-                    c.nombre as categoria,
-                    GROUP_CONCAT(ie.ruta_imagen) as rutas_imagenes,
-                    COUNT(ie.id) as cantidad_imagenes
-                FROM equipos e
-                LEFT JOIN categorias_equipos c ON e.id_categoria = c.id
-                INNER JOIN imagenes_entrenamiento ie ON e.id = ie.id_equipo
-                WHERE e.id IN ({placeholders})
-                GROUP BY e.id
-                HAVING COUNT(ie.id) >= 5
-            """
-            equipos = db.ejecutar_query(query, tuple(equipos_ids))
-        else:
-            query = """
-                SELECT 
-                    e.id,
-                    e.codigo_interno as codigo_equipo,
-                    e.nombre as nombre_objeto,
-                    c.nombre as categoria,
-                    GROUP_CONCAT(ie.ruta_imagen) as rutas_imagenes,
-                    COUNT(ie.id) as cantidad_imagenes
-                FROM equipos e
-                LEFT JOIN categorias_equipos c ON e.id_categoria = c.id
-                INNER JOIN imagenes_entrenamiento ie ON e.id = ie.id_equipo
-                GROUP BY e.id
-                HAVING COUNT(ie.id) >= 5
-            """
-            equipos = db.ejecutar_query(query)
+        equipos_ids = data.get('equipos_ids') or []
+        try:
+            equipos_ids = [int(i) for i in equipos_ids]
+            epochs = int(data.get('epochs', 10))
+            validation_split = float(data.get('validation_split', 0.2))
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'Parámetros de entrenamiento inválidos'}), 400
+        if not 1 <= epochs <= 200 or not 0 < validation_split < 1:
+            return jsonify({
+                'success': False,
+                'error': 'epochs debe estar entre 1 y 200 y validation_split entre 0 y 1'
+            }), 400
         
+        # Validación rápida: el worker vuelve a consultar los equipos al empezar
+        equipos = consultar_equipos_entrenamiento(db, equipos_ids)
         if not equipos:
             return jsonify({
                 'success': False,
                 'error': 'No hay equipos con suficientes imágenes (mínimo 5) para entrenamiento'
             }), 400
         
-        logger.info(f"🎓 Iniciando entrenamiento con {len(equipos)} equipos...")
-        
-        # Preparar datos para el modelo
-        equipos_para_entrenar = []
-        for eq in equipos:
-            rutas = eq['rutas_imagenes'].split(',') if eq['rutas_imagenes'] else []
-            # Convertir rutas web a rutas de archivo
-            rutas_archivo = []
-            for ruta in rutas:
-                if ruta.startswith('/uploads/'):
-                    ruta_completa = os.path.join(os.path.dirname(__file__), '..', '..', ruta.lstrip('/'))
-                else:
-                    ruta_completa = ruta
-                if os.path.exists(ruta_completa):
-                    rutas_archivo.append(ruta_completa)
-            
-            equipos_para_entrenar.append({
-                'id': eq['id'],
-                'codigo_equipo': eq['codigo_equipo'],
-                'nombre_objeto': eq['nombre_objeto'],
-                'categoria_entrenamiento': eq.get('categoria') or 'General',
-                'rutas_imagenes': json.dumps(rutas_archivo)
-            })
-        
-        # Entrenar modelo
-        sistema = obtener_sistema()
-        sistema.EPOCHS = epochs
+        trabajo_id, activo_id = encolar_entrenamiento(db, {
+            'equipos_ids': equipos_ids,
+            'epochs': epochs,
+            'validation_split': validation_split
+        }, solicitado_por=session.get('user_id'))
         
-        try:
-            metricas = sistema.entrenar_modelo(equipos_para_entrenar, validation_split)
-            
-            # Actualizar estado de imágenes a 'entrenado'
-            for eq in equipos:
-                db.ejecutar_comando(
-                    "UPDATE imagenes_entrenamiento SET estado = 'entrenado' WHERE id_equipo = %s",
-                    (eq['id'],)
-                )
-            
-            # Registrar/actualizar modelo en modelos_ia
-            modelo_existente = db.obtener_uno(
-                "SELECT id FROM modelos_ia WHERE tipo = 'reconocimiento_imagenes' AND nombre = 'MobileNetV2'"
-            )
-            
-            if modelo_existente:
-                db.ejecutar_comando("""
-                    UPDATE modelos_ia 
-                    SET precision_modelo = %s,
-                        fecha_entrenamiento = CURDATE(),
-                        estado = 'activo',
-                        parametros_modelo = %s
-                    WHERE id = %s
-                """, (
-                    metricas['val_accuracy'],
-                    json.dumps({
-                        'epochs': epochs,
-                        'clases': metricas['num_clases'],
-                        'imagenes': metricas['total_imagenes']
-                    }),
-                    modelo_existente['id']
-                ))
-            else:
-                db.ejecutar_comando("""
-                    INSERT INTO modelos_ia (nombre, tipo, version, ruta_archivo, precision_modelo, 
-                                           fecha_entrenamiento, estado, parametros_modelo)
-                    VALUES ('MobileNetV2', 'reconocimiento_imagenes', '2.0', %s, %s, CURDATE(), 'activo', %s)
-                """, (
-                    'models/reconocimiento/mobilenet_equipos.h5',
-                    metricas['val_accuracy'],
-                    json.dumps({
-                        'epochs': epochs,
-                        'clases': metricas['num_clases'],
-                        'imagenes': metricas['total_imagenes']
-                    })
-                ))
-            
-            logger.info(f"✅ Entrenamiento completado exitosamente")
-            
+        if trabajo_id is None:
             return jsonify({
-                'success': True,
-                'mensaje': 'Modelo entrenado exitosamente',
-                'metricas': {
-                    'precision_entrenamiento': f"{metricas['train_accuracy']*100:.2f}%",
-                    'precision_validacion': f"{metricas['val_accuracy']*100:.2f}%",
-                    'clases_entrenadas': metricas['num_clases'],
-                    'total_imagenes': metricas['total_imagenes'],
-                    'objetivo_mga_alcanzado': metricas['objetivo_alcanzado']
-                }
-            }), 200
-            
-        except Exception as e_train:
-            # Marcar imágenes como error
-            for eq in equipos:
-                db.ejecutar_comando(
-                    "UPDATE imagenes_entrenamiento SET estado = 'error' WHERE id_equipo = %s",
-                    (eq['id'],)
-                )
-            raise e_train
+                'success': False,
+                'error': 'Ya hay un entrenamiento en cola o en proceso',
+                'trabajo_id': activo_id
+            }), 409
+        
+        logger.info(f"🎓 Entrenamiento encolado (trabajo {trabajo_id}) con {len(equipos)} equipos")
+        
+        return jsonify({
+            'success': True,
+            'mensaje': 'Entrenamiento en cola',
+            'trabajo_id': trabajo_id,
+            'equipos': len(equipos),
+            'estado_url': f"/api/reconocimiento/entrenar/{trabajo_id}"
+        }), 202
         
     except Exception as e:
-        logger.error(f"❌ Error entrenando modelo: {e}")
+        logger.error(f"❌ Error encolando entrenamiento: {e}")
         import traceback
         traceback.print_exc()
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@reconocimiento_bp.route('/entrenar/<int:trabajo_id>', methods=['GET'])
+def estado_entrenamiento(trabajo_id):
+    """
+    GET /api/reconocimiento/entrenar/<id>
+    Estado de un trabajo de entrenamiento: en_cola, en_proceso, completado
+    o error, con la época actual, pérdida/precisión y métricas finales
+    """
+    trabajo = obtener_trabajo(db, trabajo_id)
+    if not trabajo:
+        return jsonify({'success': False, 'error': 'Trabajo de entrenamiento no encontrado'}), 404
+    return jsonify({'success': True, 'trabajo': trabajo}), 200
+
+
+@reconocimiento_bp.route('/entrenamientos', methods=['GET'])
+def listar_entrenamientos():
+    """
+    GET /api/reconocimiento/entrenamientos?limite=20
+    Últimos trabajos de entrenamiento
+    """
+    limite = min(max(request.args.get('limite', 20, type=int), 1), 100)
+    trabajos = listar_trabajos(db, limite)
+    return jsonify({'success': True, 'trabajos': trabajos, 'total': len(trabajos)}), 200
+
+
 @reconocimiento_bp.route('/identificar', methods=['POST'])
 def identificar_equipo():
     """
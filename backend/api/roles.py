@@ -11,6 +11,7 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
 from backend.utils.database import DatabaseManager
+from backend.utils.cache import cachear_respuesta
 
 # Blueprint para roles
 roles_bp = Blueprint('roles', __name__, url_prefix='/api/roles')
@@ -151,16 +152,12 @@ def crear_rol():
         # Convertir permisos a JSON string
         permisos_json = json.dumps(permisos) if isinstance(permisos, dict) else permisos
         
-        query = """
-            INSERT INTO roles (nombre_rol, descripcion, permisos, estado)
-            VALUES (%s, %s, %s, %s)
-        """
-        db.ejecutar_comando(query, (nombre_rol, descripcion, permisos_json, estado))
-        
-        # Obtener el ID del rol creado
-        query_id = "SELECT LAST_INSERT_ID() as id"
-        result = db.obtener_uno(query_id)
-        nuevo_id = result['id'] if result else None
+        nuevo_id = db.insertar('roles', {
+            'nombre_rol': nombre_rol,
+            'descripcion': descripcion,
+            'permisos': permisos_json,
+            'estado': estado
+        })
         
         return jsonify({
             'success': True, 
@@ -284,6 +281,7 @@ def actualizar_permisos_rol(rol_id):
 
 @roles_bp.route('/permisos-disponibles', methods=['GET'])
 @require_auth_session
+@cachear_respuesta('permisos_disponibles', timeout=3600)
 def listar_permisos_disponibles():
     """Obtener lista de todos los permisos disponibles en el sistema"""
     permisos_disponibles = [
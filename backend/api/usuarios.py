@@ -5,6 +5,8 @@
 from flask import request, jsonify, session
 from .blueprints import usuarios_bp
 from ..utils.database import DatabaseManager
+from ..utils.paginacion import consultar_pagina, CursorInvalido
+from ..services.rostros import galeria_rostros
 import hashlib
 
 db = DatabaseManager()
@@ -33,7 +35,10 @@ def hash_password(password):
 @usuarios_bp.route('', methods=['GET'])
 @require_auth_session
 def listar_usuarios():
-    """GET /api/usuarios - Listar todos los usuarios"""
+    """GET /api/usuarios - Listar todos los usuarios
+    
+    Paginación por cursor opcional: ?limite=N&cursor=...&incluir_total=true
+    """
     try:
         query = """
             SELECT u.id, u.documento, u.nombres, u.apellidos, u.email, u.telefono,
@@ -42,9 +47,11 @@ def listar_usuarios():
                    r.nombre_rol
             FROM usuarios u
             LEFT JOIN roles r ON u.id_rol = r.id
-            ORDER BY u.nombres, u.apellidos
+            WHERE 1=1
         """
-        usuarios = db.ejecutar_query(query)
+        usuarios, paginacion = consultar_pagina(
+            db, query, [], [('u.nombres', 'ASC'), ('u.apellidos', 'ASC'), ('u.id', 'ASC')]
+        )
         
         # Transformar para compatibilidad con frontend
         usuarios_formateados = []
@@ -63,8 +70,10 @@ def listar_usuarios():
                 'tiene_rostro': 'No'
             })
         
-        return jsonify({'success': True, 'usuarios': usuarios_formateados}), 200
+        return jsonify({'success': True, 'usuarios': usuarios_formateados, 'paginacion': paginacion}), 200
         
+    except CursorInvalido as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'message': f'Error listando usuarios: {str(e)}'}), 500
 
@@ -239,6 +248,8 @@ def actualizar_usuario(usuario_id):
         
         if datos_actualizar:
             db.actualizar('usuarios', datos_actualizar, 'id = %s', (usuario_id,))
+            if 'estado' in datos_actualizar:
+                galeria_rostros.notificar_cambio(db, [usuario_id])
         
         return jsonify({
             'success': True,
@@ -264,6 +275,7 @@ def toggle_usuario(usuario_id):
         nuevo_estado = 'activo' if activo == 1 else 'inactivo'
         
         db.actualizar('usuarios', {'estado': nuevo_estado}, 'id = %s', (usuario_id,))
+        galeria_rostros.notificar_cambio(db, [usuario_id])
         
         return jsonify({
             'success': True,
@@ -288,6 +300,7 @@ def eliminar_usuario(usuario_id):
         
         # Eliminar usuario
         db.eliminar('usuarios', 'id = %s', (usuario_id,))
+        galeria_rostros.notificar_cambio(db, [usuario_id])
         
         return jsonify({
             'success': True,
@@ -307,6 +320,7 @@ def desactivar_usuario(usuario_id):
             return jsonify({'success': False, 'message': 'Usuario no encontrado'}), 404
         
         db.actualizar('usuarios', {'estado': 'inactivo'}, 'id = %s', (usuario_id,))
+        galeria_rostros.notificar_cambio(db, [usuario_id])
         
         return jsonify({
             'success': True,
@@ -326,6 +340,7 @@ def activar_usuario(usuario_id):
             return jsonify({'success': False, 'message': 'Usuario no encontrado'}), 404
         
         db.actualizar('usuarios', {'estado': 'activo'}, 'id = %s', (usuario_id,))
+        galeria_rostros.notificar_cambio(db, [usuario_id])
         
         return jsonify({
             'success': True,
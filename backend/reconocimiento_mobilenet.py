@@ -12,10 +12,19 @@ import os
 import json
 import logging
 import hashlib
+import importlib.util
 import time
+import threading
 from datetime import datetime
 import numpy as np
 
+from .utils.lotes import DespachadorLotes
+
+try:
+    from config.config import Config
+except ImportError:
+    Config = None
+
 # Configurar logging
 logger = logging.getLogger(__name__)
 
@@ -27,19 +36,54 @@ except ImportError:
     CV2_DISPONIBLE = False
     logger.warning("⚠️ OpenCV no disponible")
 
-try:
-    import tensorflow as tf
-    from tensorflow.keras.applications import MobileNetV2
-    from tensorflow.keras.applications.mobilenet_v2 import preprocess_input, decode_predictions
-    from tensorflow.keras.preprocessing import image
-    from tensorflow.keras.models import Model, load_model
-    from tensorflow.keras.layers import Dense, GlobalAveragePooling2D, Dropout
-    from tensorflow.keras.optimizers import Adam
-    from tensorflow.keras.callbacks import EarlyStopping, ModelCheckpoint
-    TF_DISPONIBLE = True
-except ImportError:
-    TF_DISPONIBLE = False
+# TensorFlow se importa al crear el primer ReconocimientoMobileNet (~4 s y
+# ~600 MB): los workers que solo atienden CRUD no pagan ese costo
+TF_DISPONIBLE = importlib.util.find_spec('tensorflow') is not None
+if not TF_DISPONIBLE:
     logger.warning("⚠️ TensorFlow no disponible")
+tf = None
+MobileNetV2 = preprocess_input = decode_predictions = image = None
+Model = load_model = Dense = GlobalAveragePooling2D = Dropout = Adam = EarlyStopping = None
+InterpreteTFLite = None  # LiteRT si está instalado (reemplaza a tf.lite.Interpreter)
+_lock_tensorflow = threading.Lock()
+
+
+def _importar_tensorflow():
+    """
+    Importa TensorFlow/Keras en los nombres del módulo (una vez por proceso)
+
+    Returns:
+        bool: True si TensorFlow quedó disponible
+    """
+    global TF_DISPONIBLE, tf, MobileNetV2, preprocess_input, decode_predictions, image
+    global Model, load_model, Dense, GlobalAveragePooling2D, Dropout, Adam, EarlyStopping
+    global InterpreteTFLite
+    if tf is not None or not TF_DISPONIBLE:
+        return TF_DISPONIBLE
+    with _lock_tensorflow:
+        if tf is not None:
+            return True
+        inicio = time.perf_counter()
+        try:
+            import tensorflow
+            from tensorflow.keras.applications import MobileNetV2
+            from tensorflow.keras.applications.mobilenet_v2 import preprocess_input, decode_predictions
+            from tensorflow.keras.preprocessing import image
+            from tensorflow.keras.models import Model, load_model
+            from tensorflow.keras.layers import Dense, GlobalAveragePooling2D, Dropout
+            from tensorflow.keras.optimizers import Adam
+            from tensorflow.keras.callbacks import EarlyStopping
+        except ImportError as e:
+            TF_DISPONIBLE = False
+            logger.warning(f"⚠️ TensorFlow no disponible: {e}")
+            return False
+        try:
+            from ai_edge_litert.interpreter import Interpreter as InterpreteTFLite
+        except ImportError:
+            InterpreteTFLite = tensorflow.lite.Interpreter
+        tf = tensorflow  # Último: marca la importación como completa para otros hilos
+        logger.info(f"✅ TensorFlow importado en {time.perf_counter() - inicio:.1f} s")
+        return True
 
 try:
     from PIL import Image
@@ -54,10 +98,150 @@ MODELO_DIR = 'models/reconocimiento'
 MODELO_PATH = os.path.join(MODELO_DIR, 'mobilenet_equipos.h5')
 CLASES_PATH = os.path.join(MODELO_DIR, 'clases_equipos.json')
 CONFIG_PATH = os.path.join(MODELO_DIR, 'config_modelo.json')
+MODELO_TFLITE_PATH = os.path.join(MODELO_DIR, 'mobilenet_equipos.tflite')
 
 # Parámetros de imagen
 IMG_SIZE = (224, 224)
 UMBRAL_CONFIANZA = 0.85  # 85% según objetivo MGA
+# Inferencia por lotes: solicitudes concurrentes que llegan dentro de
+# ESPERA_LOTE_MS se evalúan juntas (hasta LOTE_MAXIMO imágenes)
+LOTE_MAXIMO = getattr(Config, 'AI_IMAGES_LOTE_MAXIMO', 16)
+ESPERA_LOTE_MS = getattr(Config, 'AI_IMAGES_ESPERA_LOTE_MS', 5)
+# Backend de inferencia: 'auto' usa el modelo TFLite cuantizado si pasó la
+# verificación de paridad del último entrenamiento; 'keras' usa siempre el .h5
+BACKEND_INFERENCIA = getattr(Config, 'AI_IMAGES_BACKEND', 'auto')
+CUANTIZACION = getattr(Config, 'AI_IMAGES_CUANTIZACION', 'int8')  # int8, float16 o ninguna
+TOLERANCIA_PARIDAD = getattr(Config, 'AI_IMAGES_TOLERANCIA_PARIDAD', 0.02)  # Pérdida de precisión admitida
+NUM_AUGMENTACIONES = 4  # Variaciones por imagen de entrenamiento
+
+# Caché de características: vector de MobileNetV2 (congelado) por imagen,
+# guardado por hash MD5 del archivo. Cambiar VERSION_EXTRACTOR si cambia el
+# extractor, el preprocesamiento o la augmentación: la caché anterior se ignora.
+CARACTERISTICAS_DIR = os.path.join(MODELO_DIR, 'caracteristicas')
+VERSION_EXTRACTOR = 'mobilenetv2-imagenet-224-gap-v1'
+
+# MobileNetV2 + pooling, cargado una vez por proceso y compartido por los
+# entrenamientos (el worker de entrenamiento no recarga los pesos de ImageNet)
+_extractor = None
+
+
+def _obtener_extractor():
+    """MobileNetV2 congelado que produce el vector de 1280 características"""
+    global _extractor
+    if _extractor is None:
+        base_model = MobileNetV2(
+            weights='imagenet',
+            include_top=False,
+            input_shape=(224, 224, 3)
+        )
+        base_model.trainable = False
+        salida = GlobalAveragePooling2D()(base_model.output)
+        _extractor = Model(inputs=base_model.input, outputs=salida)
+        logger.info("✅ Extractor MobileNetV2 cargado")
+    return _extractor
+
+
+def _directorio_caracteristicas():
+    return os.path.join(CARACTERISTICAS_DIR, f"{VERSION_EXTRACTOR}-aug{NUM_AUGMENTACIONES}")
+
+
+# Histogramas HSV de referencia para la penalización por similitud
+REFERENCIAS_PATH = os.path.join(MODELO_DIR, 'caracteristicas_referencia.npz')
+REFERENCIAS_JSON_PATH = os.path.join(MODELO_DIR, 'caracteristicas_referencia.json')  # formato anterior
+
+
+class ReferenciasHistograma:
+    """
+    Histogramas de referencia residentes en memoria como una sola matriz
+
+    Se cargan una vez del .npz escrito por el entrenamiento y se recargan
+    solo si el archivo cambia (fecha de modificación o tamaño). comparar()
+    calcula correlación, chi-cuadrado e intersección contra todas las
+    referencias en una pasada vectorizada, con las mismas fórmulas que
+    cv2.compareHist (HISTCMP_CORREL, HISTCMP_CHISQR, HISTCMP_INTERSECT).
+    """
+
+    def __init__(self, ruta=REFERENCIAS_PATH, ruta_json=REFERENCIAS_JSON_PATH):
+        self.ruta = ruta
+        self.ruta_json = ruta_json
+        self._lock = threading.Lock()
+        self._firma = None
+        # (matriz, centrada, normas) o None: matriz (n, bins) float32, sus
+        # filas menos su media (correlación) y la norma de cada fila
+        # centrada. Una sola tupla para que una recarga en otro hilo nunca
+        # mezcle arreglos de dos archivos
+        self._datos = None
+
+    def _firma_archivo(self):
+        for ruta in (self.ruta, self.ruta_json):
+            try:
+                info = os.stat(ruta)
+                return ruta, info.st_mtime_ns, info.st_size
+            except OSError:
+                continue
+        return None
+
+    def _leer(self, ruta):
+        if ruta.endswith('.npz'):
+            with np.load(ruta) as datos:
+                return datos['histogramas'].astype(np.float32)
+        # Modelos entrenados antes del formato .npz
+        with open(ruta, 'r') as f:
+            histogramas = json.load(f).get('histogramas', [])
+        return np.asarray(histogramas, dtype=np.float32)
+
+    def obtener(self):
+        """Tupla (matriz, centrada, normas) vigente (None si no hay archivo)"""
+        firma = self._firma_archivo()
+        if firma != self._firma:
+            with self._lock:
+                if firma != self._firma:
+                    self._cargar(firma)
+        return self._datos
+
+    def _cargar(self, firma):
+        datos = None
+        if firma is not None:
+            matriz = self._leer(firma[0])
+            if matriz.ndim == 2 and len(matriz) > 0:
+                centrada = matriz - matriz.mean(axis=1, keepdims=True)
+                datos = (matriz, centrada, np.linalg.norm(centrada, axis=1))
+                logger.info(f"✅ {len(matriz)} histogramas de referencia cargados")
+        self._datos = datos
+        self._firma = firma
+
+    def comparar(self, histograma):
+        """
+        Similitud de un histograma contra todas las referencias
+
+        Returns:
+            Tupla (correlacion, chi_cuadrado, interseccion), un arreglo por
+            referencia, o None si no hay referencias
+        """
+        datos = self.obtener()
+        if datos is None:
+            return None
+        matriz, centrada, normas = datos
+        h = histograma.astype(np.float32)
+
+        # Correlación de Pearson (cv2.HISTCMP_CORREL)
+        hc = h - h.mean()
+        denominador = normas * np.linalg.norm(hc)
+        correlacion = np.divide(centrada @ hc, denominador,
+                                out=np.ones(len(matriz), dtype=np.float64), where=denominador > 0)
+
+        # Chi-cuadrado sum((h - r)^2 / h) sobre bins con h > 0 (cv2.HISTCMP_CHISQR)
+        activos = h > np.finfo(np.float32).eps
+        diferencias = matriz[:, activos] - h[activos]
+        chi = (diferencias * diferencias) @ (1.0 / h[activos])
+
+        # Intersección sum(min(h, r)) (cv2.HISTCMP_INTERSECT)
+        interseccion = np.minimum(matriz, h).sum(axis=1, dtype=np.float64)
+
+        return correlacion, chi, interseccion
+
+
+referencias_histograma = ReferenciasHistograma()
 
 
 def validar_calidad_imagen(ruta_imagen):
@@ -175,6 +359,10 @@ class ReconocimientoMobileNet:
         self.clases = {}
         self.num_clases = 0
         self.modelo_cargado = False
+        self._despachador = None
+        self._lock_despachador = threading.Lock()
+        self._interprete = None
+        _importar_tensorflow()
         self.estadisticas = {
             'total_identificaciones': 0,
             'identificaciones_exitosas': 0,
@@ -192,43 +380,35 @@ class ReconocimientoMobileNet:
         
         logger.info("🤖 Sistema de Reconocimiento MobileNet inicializado")
     
-    def _crear_modelo_base(self, num_clases):
-        """Crea el modelo base MobileNetV2 con capas personalizadas"""
-        if not TF_DISPONIBLE:
-            raise ImportError("TensorFlow no está instalado")
-        
-        # Cargar MobileNetV2 preentrenado (sin capas superiores)
-        base_model = MobileNetV2(
-            weights='imagenet',
-            include_top=False,
-            input_shape=(224, 224, 3)
-        )
-        
-        # Congelar capas base inicialmente
-        for layer in base_model.layers:
-            layer.trainable = False
-        
-        # Agregar capas personalizadas
-        x = base_model.output
-        x = GlobalAveragePooling2D()(x)
-        x = Dense(512, activation='relu')(x)
+    def _crear_cabeza(self, num_clases, dimension):
+        """
+        Capas personalizadas que se entrenan sobre las características del
+        extractor (MobileNetV2 permanece congelado)
+        """
+        entrada = tf.keras.Input(shape=(dimension,))
+        x = Dense(512, activation='relu')(entrada)
         x = Dropout(0.3)(x)
         x = Dense(256, activation='relu')(x)
         x = Dropout(0.2)(x)
         predictions = Dense(num_clases, activation='softmax')(x)
         
-        # Crear modelo final
-        modelo = Model(inputs=base_model.input, outputs=predictions)
-        
-        # Compilar
-        modelo.compile(
+        cabeza = Model(inputs=entrada, outputs=predictions)
+        cabeza.compile(
             optimizer=Adam(learning_rate=self.LEARNING_RATE),
             loss='categorical_crossentropy',
             metrics=['accuracy']
         )
         
         logger.info(f"✅ Modelo creado con {num_clases} clases")
-        return modelo
+        return cabeza
+    
+    def _ensamblar_modelo(self, cabeza):
+        """Modelo completo (imagen -> clase): extractor seguido de la cabeza entrenada"""
+        extractor = _obtener_extractor()
+        x = extractor.output
+        for capa in cabeza.layers[1:]:
+            x = capa(x)
+        return Model(inputs=extractor.input, outputs=x)
     
     def _preparar_imagen(self, imagen_path_o_array):
         """Prepara una imagen para el modelo"""
@@ -258,13 +438,16 @@ class ReconocimientoMobileNet:
         
         return img_array
     
-    def entrenar_modelo(self, equipos_data, validation_split=0.2):
+    def entrenar_modelo(self, equipos_data, validation_split=0.2, progreso=None):
         """
         Entrena el modelo con los equipos proporcionados
         
         Args:
             equipos_data: Lista de dicts con {codigo_equipo, nombre_objeto, categoria_entrenamiento, rutas_imagenes}
             validation_split: Proporción de datos para validación
+            progreso: Función opcional progreso(epoca, logs) llamada al final
+                de cada época (epoca desde 1; logs con loss, accuracy,
+                val_loss y val_accuracy)
             
         Returns:
             dict: Métricas de entrenamiento
@@ -274,8 +457,8 @@ class ReconocimientoMobileNet:
         
         logger.info(f"🎓 Iniciando entrenamiento con {len(equipos_data)} equipos...")
         
-        # Preparar datos
-        imagenes = []
+        # Preparar datos: solo rutas y etiquetas; las imágenes se leen por lotes
+        rutas_imagenes = []
         etiquetas = []
         self.clases = {}
         
@@ -292,51 +475,65 @@ class ReconocimientoMobileNet:
             
             for ruta in rutas:
                 if os.path.exists(ruta):
-                    try:
-                        img_array = self._preparar_imagen(ruta)
-                        imagenes.append(img_array[0])  # Quitar dimensión batch
-                        etiquetas.append(idx)
-                    except Exception as e:
-                        logger.warning(f"⚠️ Error procesando {ruta}: {e}")
+                    rutas_imagenes.append(ruta)
+                    etiquetas.append(idx)
+                else:
+                    logger.warning(f"⚠️ Imagen no encontrada: {ruta}")
         
-        if len(imagenes) < 5:
-            raise ValueError(f"Insuficientes imágenes para entrenamiento: {len(imagenes)}. Se requieren mínimo 5.")
+        if len(rutas_imagenes) < 5:
+            raise ValueError(f"Insuficientes imágenes para entrenamiento: {len(rutas_imagenes)}. Se requieren mínimo 5.")
         
         self.num_clases = len(self.clases)
         
-        # Convertir a arrays numpy
-        X = np.array(imagenes)
-        y_labels = np.array(etiquetas)
+        logger.info(f"📊 Dataset original: {len(rutas_imagenes)} imágenes, {self.num_clases} clases")
         
-        logger.info(f"📊 Dataset original: {len(X)} imágenes, {self.num_clases} clases")
+        # Características del extractor (de la caché salvo imágenes nuevas)
+        caracteristicas = dict(zip(rutas_imagenes, self._obtener_caracteristicas(rutas_imagenes)))
         
-        # Aplicar Data Augmentation para generar más variaciones
-        X_augmented, y_augmented = self._aplicar_data_augmentation(X, y_labels)
+        # Validación con imágenes originales distintas de las de entrenamiento
+        # (sin variaciones de una misma foto a ambos lados)
+        entrenamiento, validacion = self._dividir_validacion(rutas_imagenes, etiquetas, validation_split)
+        X_train, y_train = self._matriz_caracteristicas(caracteristicas, *entrenamiento, solo_originales=False)
+        X_val, y_val = self._matriz_caracteristicas(caracteristicas, *validacion, solo_originales=True)
+        if len(X_train) == 0 or len(X_val) == 0:
+            raise ValueError("No se pudieron leer suficientes imágenes para entrenamiento y validación")
         
-        # Convertir etiquetas a one-hot
-        y = tf.keras.utils.to_categorical(y_augmented, num_classes=self.num_clases)
+        logger.info(f"📊 Dataset aumentado: {len(X_train)} vectores de entrenamiento "
+                    f"(con Data Augmentation), {len(X_val)} de validación")
         
-        logger.info(f"📊 Dataset aumentado: {len(X_augmented)} imágenes, {self.num_clases} clases")
-        
-        # Crear modelo
-        self.modelo = self._crear_modelo_base(self.num_clases)
+        # Solo se entrena la cabeza: MobileNetV2 está congelado
+        cabeza = self._crear_cabeza(self.num_clases, X_train.shape[1])
         
         # Callbacks
-        callbacks = [
-            EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True),
-            ModelCheckpoint(MODELO_PATH, monitor='val_accuracy', save_best_only=True)
-        ]
+        parada = EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)
+        callbacks = [parada]
+        if progreso is not None:
+            callbacks.append(tf.keras.callbacks.LambdaCallback(
+                on_epoch_end=lambda epoch, logs: progreso(epoch + 1, logs or {})
+            ))
         
         # Entrenar con más épocas para mejor convergencia
-        history = self.modelo.fit(
-            X_augmented, y,
+        history = cabeza.fit(
+            X_train, y_train,
             epochs=self.EPOCHS,
             batch_size=self.BATCH_SIZE,
-            validation_split=validation_split,
+            validation_data=(X_val, y_val),
+            shuffle=True,
             callbacks=callbacks,
             verbose=1
         )
         
+        # Guardar el modelo completo; el reemplazo atómico evita que otro
+        # proceso lea un archivo a medio escribir
+        self.modelo = self._ensamblar_modelo(cabeza)
+        self._interprete = None
+        ruta_temporal = os.path.join(MODELO_DIR, 'mobilenet_equipos.tmp.h5')
+        self.modelo.save(ruta_temporal)
+        os.replace(ruta_temporal, MODELO_PATH)
+        
+        # Versión cuantizada para inferencia en CPU (si mantiene la precisión)
+        inferencia = self._exportar_tflite(*validacion)
+        
         # Guardar clases y configuración
         with open(CLASES_PATH, 'w', encoding='utf-8') as f:
             json.dump(self.clases, f, ensure_ascii=False, indent=2)
@@ -346,7 +543,8 @@ class ReconocimientoMobileNet:
             'umbral_confianza': self.umbral_confianza,
             'fecha_entrenamiento': datetime.now().isoformat(),
             'epochs': self.EPOCHS,
-            'total_imagenes': len(X)
+            'total_imagenes': len(rutas_imagenes),
+            'inferencia': inferencia
         }
         with open(CONFIG_PATH, 'w', encoding='utf-8') as f:
             json.dump(config, f, indent=2)
@@ -354,9 +552,7 @@ class ReconocimientoMobileNet:
         # Guardar características de referencia para validación de similitud
         self._guardar_caracteristicas_referencia(equipos_data)
         
-        # Métricas finales
-        train_acc = history.history['accuracy'][-1]
-        val_acc = history.history['val_accuracy'][-1]
+        train_acc, val_acc = self._precision_epoca_restaurada(history.history, parada)
         
         self.modelo_cargado = True
         
@@ -364,14 +560,30 @@ class ReconocimientoMobileNet:
             'train_accuracy': train_acc,
             'val_accuracy': val_acc,
             'num_clases': self.num_clases,
-            'total_imagenes': len(X),
-            'objetivo_alcanzado': val_acc >= 0.85
+            'total_imagenes': len(rutas_imagenes),
+            'objetivo_alcanzado': val_acc >= 0.85,
+            'inferencia': inferencia
         }
         
         logger.info(f"✅ Entrenamiento completado: Precisión={val_acc*100:.2f}%")
         
         return metricas
     
+    @staticmethod
+    def _precision_epoca_restaurada(historial, parada):
+        """
+        Precisión de entrenamiento y validación de la época cuyos pesos se guardaron
+
+        EarlyStopping(restore_best_weights=True) restaura la mejor época al
+        terminar aunque no se haya detenido antes: las métricas deben ser
+        las de best_epoch, no las de la última época.
+
+        Returns:
+            Tupla (train_accuracy, val_accuracy)
+        """
+        mejor = parada.best_epoch
+        return historial['accuracy'][mejor], historial['val_accuracy'][mejor]
+    
     def _calcular_histograma(self, img):
         """Calcula histograma de color normalizado"""
         hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
@@ -393,74 +605,310 @@ class ReconocimientoMobileNet:
                         if img is not None:
                             img_resized = cv2.resize(img, (224, 224))
                             hist = self._calcular_histograma(img_resized)
-                            histogramas.append(hist.tolist())
-            
-            ref_data = {
-                'histogramas': histogramas,
-                'fecha': datetime.now().isoformat(),
-                'num_equipos': len(equipos_data)
-            }
+                            histogramas.append(hist)
             
-            ref_path = os.path.join(MODELO_DIR, 'caracteristicas_referencia.json')
-            with open(ref_path, 'w') as f:
-                json.dump(ref_data, f)
+            # .npz binario; el nombre temporal termina en .npz para que
+            # numpy no le agregue la extensión
+            temporal = f"{REFERENCIAS_PATH[:-4]}.{os.getpid()}.tmp.npz"
+            np.savez(
+                temporal,
+                histogramas=np.asarray(histogramas, dtype=np.float32).reshape(-1, 50 * 60),
+                fecha=datetime.now().isoformat(),
+                num_equipos=len(equipos_data)
+            )
+            os.replace(temporal, REFERENCIAS_PATH)
+            if os.path.exists(REFERENCIAS_JSON_PATH):
+                os.remove(REFERENCIAS_JSON_PATH)
             
             logger.info(f"✅ Guardadas {len(histogramas)} características de referencia")
             
         except Exception as e:
             logger.warning(f"⚠️ Error guardando características de referencia: {e}")
     
-    def _aplicar_data_augmentation(self, X, y):
+    def _exportar_tflite(self, rutas_validacion, etiquetas_validacion):
         """
-        Aplica Data Augmentation para generar más variaciones de las imágenes.
-        Esto mejora significativamente la precisión del modelo.
-        """
-        X_augmented = list(X)
-        y_augmented = list(y)
+        Exporta el modelo entrenado a TFLite cuantizado y verifica su paridad
         
-        # Número de augmentaciones por imagen
-        num_augmentaciones = 4
+        Compara Keras y TFLite sobre las imágenes de validación: precisión de
+        cada uno, coincidencia del top-1 y latencia por imagen. El archivo
+        .tflite solo se conserva si la precisión no cae más de
+        TOLERANCIA_PARIDAD; si no, la inferencia sigue con el modelo .h5.
         
-        for i, img in enumerate(X):
-            etiqueta = y[i]
+        Returns:
+            dict: Reporte con 'backend' ('tflite' o 'keras') y las mediciones
+        """
+        reporte = {'backend': 'keras', 'cuantizacion': CUANTIZACION}
+        try:
+            if CUANTIZACION == 'ninguna':
+                reporte['motivo'] = 'Cuantización desactivada (AI_IMAGES_CUANTIZACION)'
+                return reporte
             
-            for _ in range(num_augmentaciones):
-                img_aug = img.copy()
-                
-                # Aplicar transformaciones aleatorias
-                # 1. Flip horizontal (50% probabilidad)
-                if np.random.random() > 0.5:
-                    img_aug = np.fliplr(img_aug)
-                
-                # 2. Rotación pequeña (-15 a +15 grados)
-                if np.random.random() > 0.3:
-                    angle = np.random.uniform(-15, 15)
-                    img_aug = self._rotar_imagen(img_aug, angle)
-                
-                # 3. Ajuste de brillo (-20% a +20%)
-                if np.random.random() > 0.3:
-                    factor = np.random.uniform(0.8, 1.2)
-                    img_aug = np.clip(img_aug * factor, -1, 1)
-                
-                # 4. Zoom aleatorio (90% a 110%)
-                if np.random.random() > 0.5:
-                    zoom = np.random.uniform(0.9, 1.1)
-                    img_aug = self._zoom_imagen(img_aug, zoom)
-                
-                # 5. Ruido gaussiano pequeño
-                if np.random.random() > 0.7:
-                    noise = np.random.normal(0, 0.02, img_aug.shape)
-                    img_aug = np.clip(img_aug + noise, -1, 1)
-                
-                X_augmented.append(img_aug)
-                y_augmented.append(etiqueta)
+            convertidor = tf.lite.TFLiteConverter.from_keras_model(self.modelo)
+            # Optimize.DEFAULT sin dataset representativo: pesos int8, activaciones float
+            convertidor.optimizations = [tf.lite.Optimize.DEFAULT]
+            if CUANTIZACION == 'float16':
+                convertidor.target_spec.supported_types = [tf.float16]
+            contenido = convertidor.convert()
+            interprete = self._crear_interprete(contenido=contenido)
+            
+            imagenes, etiquetas = [], []
+            for ruta, etiqueta in zip(rutas_validacion, etiquetas_validacion):
+                try:
+                    imagenes.append(self._preparar_imagen(ruta))
+                    etiquetas.append(etiqueta)
+                except Exception as e:
+                    logger.warning(f"⚠️ Error procesando {ruta}: {e}")
+            if not imagenes:
+                reporte['motivo'] = 'Sin imágenes de validación para verificar paridad'
+                return reporte
+            etiquetas = np.array(etiquetas)
+            
+            # Una imagen por llamada, como en identificar_equipo
+            def evaluar(funcion):
+                clases, tiempos = [], []
+                for img in imagenes:
+                    inicio = time.perf_counter()
+                    salida = funcion(img)
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+                    clases.append(int(np.argmax(salida[0])))
+                return np.array(clases), float(np.median(tiempos))
+            
+            inferir_keras = self.modelo.predict_on_batch
+            inferir_tflite = lambda img: self._invocar_tflite(interprete, img)
+            # Calentamiento: la primera llamada de cada backend prepara el grafo
+            inferir_keras(imagenes[0])
+            inferir_tflite(imagenes[0])
+            clases_keras, ms_keras = evaluar(inferir_keras)
+            clases_tflite, ms_tflite = evaluar(inferir_tflite)
+            
+            precision_keras = float(np.mean(clases_keras == etiquetas))
+            precision_tflite = float(np.mean(clases_tflite == etiquetas))
+            reporte.update({
+                'imagenes_validacion': len(imagenes),
+                'precision_keras': round(precision_keras, 4),
+                'precision_tflite': round(precision_tflite, 4),
+                'coincidencia_top1': round(float(np.mean(clases_keras == clases_tflite)), 4),
+                'latencia_keras_ms': round(ms_keras, 2),
+                'latencia_tflite_ms': round(ms_tflite, 2),
+                'tamano_keras_mb': round(os.path.getsize(MODELO_PATH) / 2**20, 2),
+                'tamano_tflite_mb': round(len(contenido) / 2**20, 2)
+            })
+            
+            if precision_tflite + TOLERANCIA_PARIDAD >= precision_keras:
+                temporal = f"{MODELO_TFLITE_PATH}.tmp"
+                with open(temporal, 'wb') as f:
+                    f.write(contenido)
+                os.replace(temporal, MODELO_TFLITE_PATH)
+                reporte['backend'] = 'tflite'
+                logger.info(f"✅ TFLite {CUANTIZACION}: precisión {precision_tflite*100:.1f}% "
+                            f"(Keras {precision_keras*100:.1f}%), {ms_tflite:.1f} ms vs {ms_keras:.1f} ms por imagen")
+            else:
+                reporte['motivo'] = 'La precisión del modelo cuantizado cae más de la tolerancia'
+                logger.warning(f"⚠️ TFLite descartado: precisión {precision_tflite*100:.1f}% "
+                               f"vs Keras {precision_keras*100:.1f}%")
+        
+        except Exception as e:
+            logger.warning(f"⚠️ Error exportando modelo TFLite: {e}")
+            reporte['motivo'] = str(e)
+        
+        finally:
+            # Un .tflite de un entrenamiento anterior no corresponde a las clases nuevas
+            if reporte['backend'] != 'tflite' and os.path.exists(MODELO_TFLITE_PATH):
+                os.remove(MODELO_TFLITE_PATH)
+        
+        return reporte
+    
+    def _crear_interprete(self, contenido=None, ruta=None):
+        """Intérprete TFLite listo para invocar (desde bytes o desde archivo)"""
+        if InterpreteTFLite is None:
+            raise ImportError("TensorFlow Lite no está disponible")
+        interprete = InterpreteTFLite(model_content=contenido, model_path=ruta, num_threads=os.cpu_count())
+        interprete.allocate_tensors()
+        return interprete
+    
+    def _invocar_tflite(self, interprete, lote):
+        """
+        Probabilidades del intérprete TFLite para un lote de imágenes preparadas
+        
+        Se invoca imagen por imagen: cambiar el tamaño del tensor de entrada
+        obliga a reasignar memoria (allocate_tensors), más costoso que el
+        ahorro de agrupar en CPU.
+        """
+        entrada = interprete.get_input_details()[0]['index']
+        salida = interprete.get_output_details()[0]['index']
+        resultados = []
+        for img in lote.astype(np.float32):
+            interprete.set_tensor(entrada, img[np.newaxis])
+            interprete.invoke()
+            resultados.append(interprete.get_tensor(salida)[0].copy())
+        return np.stack(resultados)
+    
+    def _dividir_validacion(self, rutas, etiquetas, validation_split):
+        """
+        Separa las imágenes originales en entrenamiento y validación por clase
+        
+        Cada clase con al menos 2 imágenes aporta una fracción a validación,
+        de modo que todas las clases quedan representadas en ambos conjuntos.
+        
+        Returns:
+            Tupla ((rutas, etiquetas) de entrenamiento, (rutas, etiquetas) de validación)
+        """
+        rng = np.random.default_rng()
+        por_clase = {}
+        for ruta, etiqueta in zip(rutas, etiquetas):
+            por_clase.setdefault(etiqueta, []).append(ruta)
+        
+        entrenamiento = ([], [])
+        validacion = ([], [])
+        for etiqueta, rutas_clase in por_clase.items():
+            rutas_clase = [rutas_clase[i] for i in rng.permutation(len(rutas_clase))]
+            n_val = 0
+            if len(rutas_clase) >= 2:
+                n_val = min(max(1, round(len(rutas_clase) * validation_split)), len(rutas_clase) - 1)
+            for i, ruta in enumerate(rutas_clase):
+                destino = validacion if i < n_val else entrenamiento
+                destino[0].append(ruta)
+                destino[1].append(etiqueta)
+        return entrenamiento, validacion
+    
+    def _matriz_caracteristicas(self, caracteristicas, rutas, etiquetas, solo_originales):
+        """
+        Matriz de vectores y etiquetas one-hot para entrenar la cabeza
+        
+        Args:
+            caracteristicas: Dict ruta -> matriz (1 + NUM_AUGMENTACIONES, dimensión)
+            solo_originales: True para validación (sin variaciones)
+        """
+        filas = slice(0, 1) if solo_originales else slice(None)
+        X, y = [], []
+        for ruta, etiqueta in zip(rutas, etiquetas):
+            vectores = caracteristicas.get(ruta)
+            if vectores is None:
+                continue
+            X.append(vectores[filas])
+            y.extend([etiqueta] * len(X[-1]))
+        if not X:
+            return np.empty((0, 0), dtype=np.float32), np.empty((0, self.num_clases))
+        return np.concatenate(X), tf.keras.utils.to_categorical(y, num_classes=self.num_clases)
+    
+    def _obtener_caracteristicas(self, rutas):
+        """
+        Vectores del extractor para la imagen original y sus NUM_AUGMENTACIONES
+        variaciones, matriz (1 + NUM_AUGMENTACIONES, 1280) por imagen
+        
+        Se guardan en disco por hash MD5 del archivo y versión del extractor:
+        un reentrenamiento solo pasa por MobileNetV2 las imágenes nuevas.
         
-        # Mezclar datos
-        indices = np.random.permutation(len(X_augmented))
-        X_augmented = np.array(X_augmented)[indices]
-        y_augmented = np.array(y_augmented)[indices]
+        Returns:
+            Lista alineada con rutas (None si la imagen no se pudo leer)
+        """
+        directorio = _directorio_caracteristicas()
+        os.makedirs(directorio, exist_ok=True)
+        
+        caracteristicas = [None] * len(rutas)
+        pendientes = []  # (posición, ruta, hash)
+        for i, ruta in enumerate(rutas):
+            hash_img = calcular_hash_imagen(ruta)
+            if hash_img is None:
+                continue
+            archivo = os.path.join(directorio, f"{hash_img}.npy")
+            if os.path.exists(archivo):
+                try:
+                    caracteristicas[i] = np.load(archivo)
+                    continue
+                except (OSError, ValueError):
+                    logger.warning(f"⚠️ Caché de características dañada, se recalcula: {archivo}")
+            pendientes.append((i, ruta, hash_img))
+        
+        logger.info(f"🧠 Características en caché: {len(rutas) - len(pendientes)}, por calcular: {len(pendientes)}")
+        if not pendientes:
+            return caracteristicas
+        
+        extractor = _obtener_extractor()
+        dataset = self._crear_dataset(
+            [ruta for _, ruta, _ in pendientes],
+            [int(hash_img[:8], 16) for _, _, hash_img in pendientes]
+        )
+        for posiciones, variaciones in dataset:
+            n = variaciones.shape[0]
+            vectores = extractor.predict_on_batch(tf.reshape(variaciones, (-1, *IMG_SIZE, 3)))
+            vectores = np.asarray(vectores, dtype=np.float32).reshape(n, 1 + NUM_AUGMENTACIONES, -1)
+            for posicion, matriz in zip(posiciones.numpy(), vectores):
+                i, _, hash_img = pendientes[posicion]
+                archivo = os.path.join(directorio, f"{hash_img}.npy")
+                # np.save agrega .npy al nombre temporal si no lo tiene
+                temporal = f"{archivo[:-4]}.{os.getpid()}.tmp.npy"
+                np.save(temporal, matriz)
+                os.replace(temporal, archivo)
+                caracteristicas[i] = matriz
+        return caracteristicas
+    
+    def _crear_dataset(self, rutas, semillas):
+        """
+        Pipeline tf.data que lee las imágenes y genera sus variaciones por lotes
         
-        return X_augmented, y_augmented
+        Las imágenes se decodifican al vuelo en paralelo y se precargan los
+        siguientes lotes: la memoria depende de BATCH_SIZE, no del número de
+        imágenes. Cada elemento es (posición en rutas, tensor con la original
+        y NUM_AUGMENTACIONES variaciones); la semilla hace las variaciones
+        reproducibles para la misma imagen.
+        """
+        def cargar(posicion, ruta, semilla):
+            img = tf.io.decode_image(tf.io.read_file(ruta), channels=3, expand_animations=False)
+            img = preprocess_input(tf.image.resize(img, IMG_SIZE))
+            variaciones = tf.numpy_function(self._variaciones_imagen, [img, semilla], tf.float32)
+            variaciones.set_shape((1 + NUM_AUGMENTACIONES, *IMG_SIZE, 3))
+            return posicion, variaciones
+        
+        # BATCH_SIZE imágenes por lote contando las variaciones
+        imagenes_por_lote = max(1, self.BATCH_SIZE // (1 + NUM_AUGMENTACIONES))
+        dataset = tf.data.Dataset.from_tensor_slices((
+            tf.range(len(rutas)), rutas, tf.constant(semillas, dtype=tf.int64)
+        ))
+        return (dataset
+                .map(cargar, num_parallel_calls=tf.data.AUTOTUNE)
+                .ignore_errors(log_warning=True)  # Imagen corrupta: se omite
+                .batch(imagenes_por_lote)
+                .prefetch(tf.data.AUTOTUNE))
+    
+    def _variaciones_imagen(self, img, semilla):
+        """Imagen original seguida de NUM_AUGMENTACIONES variaciones aleatorias"""
+        rng = np.random.default_rng(int(semilla))
+        return np.stack([img] + [self._aumentar_imagen(img, rng) for _ in range(NUM_AUGMENTACIONES)])
+    
+    def _aumentar_imagen(self, img, rng):
+        """
+        Genera una variación aleatoria de una imagen preprocesada ([-1, 1]).
+        Esto mejora significativamente la precisión del modelo.
+        """
+        img_aug = img.copy()
+        
+        # Aplicar transformaciones aleatorias
+        # 1. Flip horizontal (50% probabilidad)
+        if rng.random() > 0.5:
+            img_aug = np.ascontiguousarray(np.fliplr(img_aug))
+        
+        # 2. Rotación pequeña (-15 a +15 grados)
+        if rng.random() > 0.3:
+            angle = rng.uniform(-15, 15)
+            img_aug = self._rotar_imagen(img_aug, angle)
+        
+        # 3. Ajuste de brillo (-20% a +20%)
+        if rng.random() > 0.3:
+            factor = rng.uniform(0.8, 1.2)
+            img_aug = np.clip(img_aug * factor, -1, 1)
+        
+        # 4. Zoom aleatorio (90% a 110%)
+        if rng.random() > 0.5:
+            zoom = rng.uniform(0.9, 1.1)
+            img_aug = self._zoom_imagen(img_aug, zoom)
+        
+        # 5. Ruido gaussiano pequeño
+        if rng.random() > 0.7:
+            noise = rng.normal(0, 0.02, img_aug.shape)
+            img_aug = np.clip(img_aug + noise, -1, 1)
+        
+        return img_aug.astype(np.float32)
     
     def _rotar_imagen(self, img, angle):
         """Rota una imagen por un ángulo dado"""
@@ -507,7 +955,25 @@ class ReconocimientoMobileNet:
         if not os.path.exists(MODELO_PATH):
             raise FileNotFoundError(f"No existe modelo en {MODELO_PATH}")
         
-        self.modelo = load_model(MODELO_PATH)
+        config = {}
+        if os.path.exists(CONFIG_PATH):
+            with open(CONFIG_PATH, 'r') as f:
+                config = json.load(f)
+                self.umbral_confianza = config.get('umbral_confianza', UMBRAL_CONFIANZA)
+        
+        # TFLite cuantizado si el entrenamiento lo aprobó; si no, el .h5
+        self._interprete = None
+        usar_tflite = (BACKEND_INFERENCIA != 'keras'
+                       and (config.get('inferencia') or {}).get('backend') == 'tflite'
+                       and os.path.exists(MODELO_TFLITE_PATH))
+        if usar_tflite:
+            try:
+                self._interprete = self._crear_interprete(ruta=MODELO_TFLITE_PATH)
+                self.modelo = None
+            except Exception as e:
+                logger.warning(f"⚠️ No se pudo cargar el modelo TFLite, se usa Keras: {e}")
+        if self._interprete is None:
+            self.modelo = load_model(MODELO_PATH)
         
         with open(CLASES_PATH, 'r', encoding='utf-8') as f:
             self.clases = json.load(f)
@@ -516,13 +982,18 @@ class ReconocimientoMobileNet:
         self.clases = {int(k): v for k, v in self.clases.items()}
         self.num_clases = len(self.clases)
         
-        if os.path.exists(CONFIG_PATH):
-            with open(CONFIG_PATH, 'r') as f:
-                config = json.load(f)
-                self.umbral_confianza = config.get('umbral_confianza', UMBRAL_CONFIANZA)
-        
         self.modelo_cargado = True
-        logger.info(f"✅ Modelo cargado: {self.num_clases} clases")
+        logger.info(f"✅ Modelo cargado ({self.backend_inferencia}): {self.num_clases} clases")
+    
+    @property
+    def backend_inferencia(self):
+        return 'tflite' if self._interprete is not None else 'keras'
+    
+    def _inferir_lote(self, lote):
+        """Probabilidades por clase para un lote (desde el hilo del despachador)"""
+        if self._interprete is not None:
+            return self._invocar_tflite(self._interprete, lote)
+        return self.modelo.predict_on_batch(lote)
     
     def identificar_equipo(self, imagen_path, top_n=3):
         """
@@ -566,7 +1037,7 @@ class ReconocimientoMobileNet:
             img_array = self._preparar_imagen(imagen)
             
             # Predecir
-            predicciones = self.modelo.predict(img_array, verbose=0)[0]
+            predicciones = self._predecir(img_array)
             
             # Obtener top N
             indices_top = np.argsort(predicciones)[-top_n:][::-1]
@@ -616,6 +1087,42 @@ class ReconocimientoMobileNet:
             logger.error(f"❌ Error en identificación: {e}")
             return [], 0
     
+    def _predecir(self, img_array):
+        """
+        Probabilidades por clase de una imagen preparada
+
+        La predicción pasa por el despachador de lotes: las identificaciones
+        concurrentes comparten una sola llamada al modelo.
+        """
+        if self._despachador is None:
+            with self._lock_despachador:
+                if self._despachador is None:
+                    self._despachador = DespachadorLotes(
+                        self._inferir_lote,
+                        max_lote=LOTE_MAXIMO,
+                        espera_ms=ESPERA_LOTE_MS,
+                        nombre='inferencia-mobilenet'
+                    )
+        return np.asarray(self._despachador.predecir(img_array[0]))
+    
+    def cerrar(self):
+        """Detiene el despachador de lotes (al reemplazar esta instancia)"""
+        if self._despachador is not None:
+            self._despachador.cerrar()
+
+    def calentar(self):
+        """
+        Predicción con una imagen vacía para que la primera identificación
+        real no pague el trazado del grafo ni la asignación de tensores
+
+        Returns:
+            bool: True si había un modelo cargado que calentar
+        """
+        if not self.modelo_cargado:
+            return False
+        self._predecir(np.zeros((1, *IMG_SIZE, 3), dtype=np.float32))
+        return True
+
     def _calcular_similitud_caracteristicas(self, imagen):
         """
         Calcula similitud basada en características de imagen
@@ -635,60 +1142,35 @@ class ReconocimientoMobileNet:
             # Redimensionar para análisis
             img_resized = cv2.resize(img, (224, 224))
             
-            # Cargar características de referencia si existen
-            ref_path = os.path.join(MODELO_DIR, 'caracteristicas_referencia.json')
-            if os.path.exists(ref_path):
-                with open(ref_path, 'r') as f:
-                    ref_data = json.load(f)
+            # Comparar con todos los histogramas de referencia (matriz residente)
+            comparacion = referencias_histograma.comparar(self._calcular_histograma(img_resized))
+            if comparacion is not None:
+                correlacion, chi, interseccion = comparacion
                 
-                # Calcular histograma de color de la imagen actual
-                hist_actual = self._calcular_histograma(img_resized)
+                # Combinar las mejores similitudes de cada método
+                # Correlación (1 = idéntico, -1 = opuesto)
+                mejor_correl = float(np.maximum(correlacion, 0).max())
+                # Chi-cuadrado (0 = idéntico): convertir a similitud
+                mejor_chi = float((1.0 / (1.0 + chi)).max())
+                # Intersección (mayor = más similar)
+                mejor_intersect = float(np.minimum(interseccion, 1.0).max())
                 
-                # Comparar con histogramas de referencia usando múltiples métodos
-                similitudes_correl = []
-                similitudes_chi = []
-                similitudes_intersect = []
+                # Promedio ponderado de las métricas
+                # Correlación es más importante para detectar similitud visual
+                similitud_combinada = (mejor_correl * 0.5 + mejor_chi * 0.3 + mejor_intersect * 0.2)
                 
-                for ref_hist in ref_data.get('histogramas', []):
-                    ref_hist_array = np.array(ref_hist, dtype=np.float32)
-                    hist_actual_f32 = hist_actual.astype(np.float32)
-                    
-                    # Correlación (1 = idéntico, -1 = opuesto)
-                    correl = cv2.compareHist(hist_actual_f32, ref_hist_array, cv2.HISTCMP_CORREL)
-                    similitudes_correl.append(max(0, correl))
-                    
-                    # Chi-cuadrado (0 = idéntico, mayor = diferente)
-                    chi = cv2.compareHist(hist_actual_f32, ref_hist_array, cv2.HISTCMP_CHISQR)
-                    # Convertir a similitud (normalizar inversamente)
-                    chi_sim = 1.0 / (1.0 + chi)
-                    similitudes_chi.append(chi_sim)
-                    
-                    # Intersección (mayor = más similar)
-                    intersect = cv2.compareHist(hist_actual_f32, ref_hist_array, cv2.HISTCMP_INTERSECT)
-                    similitudes_intersect.append(min(1.0, intersect))
+                logger.info(f"📊 Similitud - Correl: {mejor_correl:.3f}, Chi: {mejor_chi:.3f}, Intersect: {mejor_intersect:.3f} -> Combinada: {similitud_combinada:.3f}")
                 
-                if similitudes_correl:
-                    # Combinar las mejores similitudes de cada método
-                    mejor_correl = max(similitudes_correl)
-                    mejor_chi = max(similitudes_chi)
-                    mejor_intersect = max(similitudes_intersect)
-                    
-                    # Promedio ponderado de las métricas
-                    # Correlación es más importante para detectar similitud visual
-                    similitud_combinada = (mejor_correl * 0.5 + mejor_chi * 0.3 + mejor_intersect * 0.2)
-                    
-                    logger.info(f"📊 Similitud - Correl: {mejor_correl:.3f}, Chi: {mejor_chi:.3f}, Intersect: {mejor_intersect:.3f} -> Combinada: {similitud_combinada:.3f}")
-                    
-                    # Aplicar umbral más estricto
-                    # Si la similitud combinada es baja, penalizar fuertemente
-                    if similitud_combinada < 0.3:
-                        return 0.1  # Muy diferente - penalización muy alta
-                    elif similitud_combinada < 0.5:
-                        return 0.3  # Diferente - penalización alta
-                    elif similitud_combinada < 0.7:
-                        return 0.6  # Algo similar - penalización moderada
-                    else:
-                        return min(1.0, similitud_combinada)  # Similar - poca o ninguna penalización
+                # Aplicar umbral más estricto
+                # Si la similitud combinada es baja, penalizar fuertemente
+                if similitud_combinada < 0.3:
+                    return 0.1  # Muy diferente - penalización muy alta
+                elif similitud_combinada < 0.5:
+                    return 0.3  # Diferente - penalización alta
+                elif similitud_combinada < 0.7:
+                    return 0.6  # Algo similar - penalización moderada
+                else:
+                    return min(1.0, similitud_combinada)  # Similar - poca o ninguna penalización
             
             # Si no hay referencia, aplicar penalización alta
             return 0.4
@@ -710,7 +1192,9 @@ class ReconocimientoMobileNet:
             'umbral_confianza': f"{self.umbral_confianza * 100}%",
             'total_identificaciones': self.estadisticas['total_identificaciones'],
             'identificaciones_exitosas': self.estadisticas['identificaciones_exitosas'],
-            'tasa_exito': f"{tasa_exito:.1f}%"
+            'tasa_exito': f"{tasa_exito:.1f}%",
+            'backend_inferencia': self.backend_inferencia,
+            'inferencia_lotes': self._despachador.estadisticas() if self._despachador else None
         }
 
 
@@ -1,6 +1,13 @@
 # Servicios del Sistema GIL
 # Centro Minero SENA
 
-from .nlu_classifier import NLUClassifier
-
 __all__ = ['NLUClassifier']
+
+
+def __getattr__(nombre):
+    # Import diferido: nlu_classifier arrastra scikit-learn y no todos los
+    # servicios (ni todos los workers) lo necesitan
+    if nombre == 'NLUClassifier':
+        from .nlu_classifier import NLUClassifier
+        return NLUClassifier
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
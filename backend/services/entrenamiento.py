@@ -0,0 +1,402 @@
+"""
+Cola de Entrenamiento de Modelos
+Centro Minero de Sogamoso - SENA
+
+POST /api/reconocimiento/entrenar solo encola el trabajo: el entrenamiento
+(varios minutos) corre en un proceso aparte que toma los trabajos de la
+tabla trabajos_entrenamiento y guarda el avance de cada época. Iniciar el
+worker desde la raíz del proyecto con:
+
+    python -m backend.services.entrenamiento
+
+La columna generada modelo_activo (UNIQUE) garantiza en la base de datos
+que un modelo no tenga más de un trabajo en cola o en proceso.
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import socket
+import threading
+import time
+
+from mysql.connector import errors
+
+from ..utils.versiones import incrementar_version
+
+try:
+    from config.config import Config
+except ImportError:
+    Config = None
+
+logger = logging.getLogger(__name__)
+
+MODELO_MOBILENET = 'MobileNetV2'
+
+# Contador de versiones_datos que avisa a los workers web que recarguen el modelo
+VERSION_MODELO_RECONOCIMIENTO = 'modelo_reconocimiento'
+
+INTERVALO_SONDEO = getattr(Config, 'ENTRENAMIENTO_INTERVALO_SEGUNDOS', 5)
+LATIDO_MAXIMO = getattr(Config, 'ENTRENAMIENTO_LATIDO_MAXIMO_SEGUNDOS', 300)
+_INTERVALO_LATIDO = 30
+
+_RAIZ_PROYECTO = os.path.join(os.path.dirname(__file__), '..', '..')
+
+
+def _numero(valor):
+    """Valor de métrica apto para DECIMAL (None si es NaN o infinito)"""
+    try:
+        valor = float(valor)
+    except (TypeError, ValueError):
+        return None
+    return valor if math.isfinite(valor) else None
+
+
+# =====================================================================
+# DATOS DE ENTRENAMIENTO
+# =====================================================================
+
+def consultar_equipos_entrenamiento(db, equipos_ids=None):
+    """
+    Equipos con al menos 5 imágenes de entrenamiento
+
+    Args:
+        db: DatabaseManager
+        equipos_ids: Limitar a estos equipos (vacío = todos los listos)
+    """
+    filtro = ''
+    params = None
+    if equipos_ids:
+        filtro = f"WHERE e.id IN ({','.join(['%s'] * len(equipos_ids))})"
+        params = tuple(equipos_ids)
+    query = f"""
+        SELECT
+            e.id,
+            e.codigo_interno as codigo_equipo,
+            e.nombre as nombre_objeto,
+            c.nombre as categoria,
+            GROUP_CONCAT(ie.ruta_imagen) as rutas_imagenes,
+            COUNT(ie.id) as cantidad_imagenes
+        FROM equipos e
+        LEFT JOIN categorias_equipos c ON e.id_categoria = c.id
+        INNER JOIN imagenes_entrenamiento ie ON e.id = ie.id_equipo
+        {filtro}
+        GROUP BY e.id
+        HAVING COUNT(ie.id) >= 5
+    """
+    return db.ejecutar_query(query, params) or []
+
+
+def preparar_equipos(equipos):
+    """Convierte las filas de equipos al formato de ReconocimientoMobileNet.entrenar_modelo"""
+    equipos_para_entrenar = []
+    for eq in equipos:
+        rutas = eq['rutas_imagenes'].split(',') if eq['rutas_imagenes'] else []
+        # Convertir rutas web a rutas de archivo
+        rutas_archivo = []
+        for ruta in rutas:
+            if ruta.startswith('/uploads/'):
+                ruta_completa = os.path.join(_RAIZ_PROYECTO, ruta.lstrip('/'))
+            else:
+                ruta_completa = ruta
+            if os.path.exists(ruta_completa):
+                rutas_archivo.append(ruta_completa)
+
+        equipos_para_entrenar.append({
+            'id': eq['id'],
+            'codigo_equipo': eq['codigo_equipo'],
+            'nombre_objeto': eq['nombre_objeto'],
+            'categoria_entrenamiento': eq.get('categoria') or 'General',
+            'rutas_imagenes': json.dumps(rutas_archivo)
+        })
+    return equipos_para_entrenar
+
+
+# =====================================================================
+# COLA
+# =====================================================================
+
+def encolar_entrenamiento(db, parametros, solicitado_por=None, modelo=MODELO_MOBILENET):
+    """
+    Crea un trabajo de entrenamiento en cola
+
+    Args:
+        db: DatabaseManager
+        parametros: Diccionario con equipos_ids, epochs y validation_split
+        solicitado_por: Usuario de la sesión
+        modelo: Modelo a entrenar
+
+    Returns:
+        Tupla (id del trabajo creado, None) o (None, id del trabajo activo)
+        si el modelo ya tiene uno en cola o en proceso
+
+    Raises:
+        Error de base de datos distinto del trabajo duplicado
+    """
+    try:
+        with db.transaccion() as tx:
+            trabajo_id = tx.insertar('trabajos_entrenamiento', {
+                'modelo': modelo,
+                'estado': 'en_cola',
+                'parametros': json.dumps(parametros),
+                'total_epocas': int(parametros.get('epochs', 0)),
+                'solicitado_por': solicitado_por
+            })
+        return trabajo_id, None
+    except errors.IntegrityError:
+        activo = db.obtener_uno(
+            "SELECT id FROM trabajos_entrenamiento WHERE modelo_activo = %s", (modelo,))
+        return None, activo['id'] if activo else None
+
+
+def obtener_trabajo(db, trabajo_id):
+    """Trabajo con parámetros, métricas e historial decodificados (None si no existe)"""
+    trabajo = db.obtener_uno("SELECT * FROM trabajos_entrenamiento WHERE id = %s", (trabajo_id,))
+    if not trabajo:
+        return None
+    trabajo.pop('modelo_activo', None)
+    for campo in ('parametros', 'metricas', 'historial'):
+        if trabajo.get(campo):
+            try:
+                trabajo[campo] = json.loads(trabajo[campo])
+            except ValueError:
+                pass
+    for campo in ('perdida', 'precision_entrenamiento', 'perdida_validacion', 'precision_validacion'):
+        if trabajo.get(campo) is not None:
+            trabajo[campo] = float(trabajo[campo])
+    for campo in ('fecha_creacion', 'fecha_inicio', 'fecha_fin', 'ultimo_latido'):
+        if trabajo.get(campo):
+            trabajo[campo] = trabajo[campo].isoformat(sep=' ', timespec='seconds')
+    total = trabajo.get('total_epocas') or 0
+    trabajo['porcentaje'] = round(trabajo['epoca_actual'] / total * 100, 1) if total else 0.0
+    return trabajo
+
+
+def listar_trabajos(db, limite=20):
+    """Trabajos más recientes (sin historial por época)"""
+    # Las fechas se formatean aquí: un DATE_FORMAT con '%s' en la consulta
+    # se tomaría como un parámetro más
+    trabajos = db.ejecutar_query("""
+        SELECT id, modelo, estado, epoca_actual, total_epocas, precision_validacion,
+               mensaje_error, solicitado_por, fecha_creacion, fecha_inicio, fecha_fin
+        FROM trabajos_entrenamiento
+        ORDER BY id DESC
+        LIMIT %s
+    """, (limite,)) or []
+    for trabajo in trabajos:
+        if trabajo.get('precision_validacion') is not None:
+            trabajo['precision_validacion'] = float(trabajo['precision_validacion'])
+        for campo in ('fecha_creacion', 'fecha_inicio', 'fecha_fin'):
+            if trabajo.get(campo):
+                trabajo[campo] = trabajo[campo].isoformat(sep=' ', timespec='seconds')
+    return trabajos
+
+
+def tomar_siguiente(db, worker):
+    """
+    Reserva el trabajo en cola más antiguo para este worker
+
+    La reserva es un UPDATE condicionado a estado = 'en_cola': si dos
+    workers compiten por el mismo trabajo, solo uno lo obtiene.
+
+    Returns:
+        Fila del trabajo reservado o None si la cola está vacía
+    """
+    candidatos = db.ejecutar_query(
+        "SELECT id FROM trabajos_entrenamiento WHERE estado = 'en_cola' ORDER BY id LIMIT 5") or []
+    for candidato in candidatos:
+        with db.transaccion() as tx:
+            reservado = tx.ejecutar("""
+                UPDATE trabajos_entrenamiento
+                SET estado = 'en_proceso', worker = %s, fecha_inicio = NOW(), ultimo_latido = NOW()
+                WHERE id = %s AND estado = 'en_cola'
+            """, (worker, candidato['id']))
+        if reservado:
+            return db.obtener_uno("SELECT * FROM trabajos_entrenamiento WHERE id = %s", (candidato['id'],))
+    return None
+
+
+def recuperar_interrumpidos(db):
+    """Marca como error los trabajos en proceso cuyo worker dejó de reportarse"""
+    db.ejecutar_comando("""
+        UPDATE trabajos_entrenamiento
+        SET estado = 'error', fecha_fin = NOW(),
+            mensaje_error = 'El worker de entrenamiento se detuvo antes de terminar'
+        WHERE estado = 'en_proceso' AND ultimo_latido < NOW() - INTERVAL %s SECOND
+    """, (LATIDO_MAXIMO,))
+
+
+# =====================================================================
+# EJECUCIÓN
+# =====================================================================
+
+def _finalizar(db, trabajo_id, equipos, parametros, metricas):
+    """Registra el resultado del entrenamiento en imagenes_entrenamiento y modelos_ia"""
+    ids = [eq['id'] for eq in equipos]
+    db.ejecutar_comando(
+        f"UPDATE imagenes_entrenamiento SET estado = 'entrenado' "
+        f"WHERE id_equipo IN ({','.join(['%s'] * len(ids))})",
+        tuple(ids)
+    )
+
+    parametros_modelo = json.dumps({
+        'epochs': parametros.get('epochs'),
+        'clases': metricas['num_clases'],
+        'imagenes': metricas['total_imagenes']
+    })
+    modelo_existente = db.obtener_uno(
+        "SELECT id FROM modelos_ia WHERE tipo = 'reconocimiento_imagenes' AND nombre = 'MobileNetV2'"
+    )
+    if modelo_existente:
+        db.ejecutar_comando("""
+            UPDATE modelos_ia
+            SET precision_modelo = %s,
+                fecha_entrenamiento = CURDATE(),
+                estado = 'activo',
+                parametros_modelo = %s
+            WHERE id = %s
+        """, (metricas['val_accuracy'], parametros_modelo, modelo_existente['id']))
+    else:
+        db.ejecutar_comando("""
+            INSERT INTO modelos_ia (nombre, tipo, version, ruta_archivo, precision_modelo,
+                                   fecha_entrenamiento, estado, parametros_modelo)
+            VALUES ('MobileNetV2', 'reconocimiento_imagenes', '2.0', %s, %s, CURDATE(), 'activo', %s)
+        """, ('models/reconocimiento/mobilenet_equipos.h5', metricas['val_accuracy'], parametros_modelo))
+
+    db.ejecutar_comando("""
+        UPDATE trabajos_entrenamiento
+        SET estado = 'completado', fecha_fin = NOW(), metricas = %s
+        WHERE id = %s
+    """, (json.dumps({
+        'precision_entrenamiento': _numero(metricas['train_accuracy']),
+        'precision_validacion': _numero(metricas['val_accuracy']),
+        'clases_entrenadas': metricas['num_clases'],
+        'total_imagenes': metricas['total_imagenes'],
+        'objetivo_mga_alcanzado': bool(metricas['objetivo_alcanzado']),
+        'inferencia': metricas.get('inferencia')
+    }), trabajo_id))
+
+    # Los procesos web recargan el modelo en la siguiente identificación
+    incrementar_version(db, VERSION_MODELO_RECONOCIMIENTO)
+
+
+def ejecutar_trabajo(db, trabajo):
+    """
+    Ejecuta un trabajo reservado con tomar_siguiente
+
+    Cada época actualiza epoca_actual, pérdida y precisión; un hilo aparte
+    renueva ultimo_latido para que un trabajo largo no se tome por abandonado.
+
+    Returns:
+        True si el entrenamiento terminó correctamente
+    """
+    from ..reconocimiento_mobilenet import ReconocimientoMobileNet
+
+    trabajo_id = trabajo['id']
+    parametros = json.loads(trabajo['parametros'] or '{}')
+    historial = []
+
+    def progreso(epoca, logs):
+        historial.append({'epoca': epoca, **{k: _numero(v) for k, v in logs.items()}})
+        db.ejecutar_comando("""
+            UPDATE trabajos_entrenamiento
+            SET epoca_actual = %s, perdida = %s, precision_entrenamiento = %s,
+                perdida_validacion = %s, precision_validacion = %s,
+                historial = %s, ultimo_latido = NOW()
+            WHERE id = %s
+        """, (epoca, _numero(logs.get('loss')), _numero(logs.get('accuracy')),
+              _numero(logs.get('val_loss')), _numero(logs.get('val_accuracy')),
+              json.dumps(historial), trabajo_id))
+
+    detener_latido = threading.Event()
+
+    def latido():
+        while not detener_latido.wait(_INTERVALO_LATIDO):
+            db.ejecutar_comando(
+                "UPDATE trabajos_entrenamiento SET ultimo_latido = NOW() WHERE id = %s", (trabajo_id,))
+
+    hilo_latido = threading.Thread(target=latido, name=f'latido-entrenamiento-{trabajo_id}', daemon=True)
+    hilo_latido.start()
+
+    equipos = []
+    try:
+        equipos = consultar_equipos_entrenamiento(db, parametros.get('equipos_ids'))
+        if not equipos:
+            raise ValueError('No hay equipos con suficientes imágenes (mínimo 5) para entrenamiento')
+
+        logger.info(f"🎓 Trabajo {trabajo_id}: entrenando con {len(equipos)} equipos...")
+        sistema = ReconocimientoMobileNet()
+        sistema.EPOCHS = int(parametros.get('epochs', sistema.EPOCHS))
+        metricas = sistema.entrenar_modelo(
+            preparar_equipos(equipos),
+            parametros.get('validation_split', 0.2),
+            progreso=progreso
+        )
+        _finalizar(db, trabajo_id, equipos, parametros, metricas)
+        logger.info(f"✅ Trabajo {trabajo_id} completado")
+        return True
+
+    except Exception as e:
+        logger.error(f"❌ Trabajo {trabajo_id} falló: {e}")
+        import traceback
+        traceback.print_exc()
+        if equipos:
+            ids = [eq['id'] for eq in equipos]
+            db.ejecutar_comando(
+                f"UPDATE imagenes_entrenamiento SET estado = 'error' "
+                f"WHERE id_equipo IN ({','.join(['%s'] * len(ids))})",
+                tuple(ids)
+            )
+        db.ejecutar_comando("""
+            UPDATE trabajos_entrenamiento
+            SET estado = 'error', fecha_fin = NOW(), mensaje_error = %s
+            WHERE id = %s
+        """, (str(e)[:2000], trabajo_id))
+        return False
+
+    finally:
+        detener_latido.set()
+        hilo_latido.join(timeout=5)
+
+
+def ejecutar_worker(db, una_vez=False, intervalo=INTERVALO_SONDEO):
+    """
+    Bucle del worker: toma trabajos en orden de llegada y los ejecuta
+
+    Un error de la base de datos (deadlock, conexión perdida) no detiene el
+    worker: se registra y se reintenta tras `intervalo` segundos. Con
+    `una_vez` el worker termina en el primer error.
+
+    Args:
+        db: DatabaseManager
+        una_vez: Procesar la cola pendiente y terminar
+        intervalo: Segundos entre consultas a la cola vacía
+    """
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    logger.info(f"👷 Worker de entrenamiento {worker} iniciado")
+    while True:
+        try:
+            recuperar_interrumpidos(db)
+            trabajo = tomar_siguiente(db, worker)
+            if trabajo:
+                ejecutar_trabajo(db, trabajo)
+                continue
+        except Exception as e:
+            logger.error(f"❌ Error en el worker de entrenamiento {worker}: {e}", exc_info=True)
+        if una_vez:
+            return
+        time.sleep(intervalo)
+
+
+if __name__ == '__main__':
+    from ..utils.database import DatabaseManager
+
+    parser = argparse.ArgumentParser(description='Worker de entrenamiento de modelos')
+    parser.add_argument('--una-vez', action='store_true', help='Procesar la cola pendiente y salir')
+    parser.add_argument('--intervalo', type=float, default=INTERVALO_SONDEO,
+                        help='Segundos entre consultas a la cola')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    ejecutar_worker(DatabaseManager(), una_vez=args.una_vez, intervalo=args.intervalo)
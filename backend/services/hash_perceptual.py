@@ -0,0 +1,255 @@
+"""
+Servicio de Hash Perceptual de Imágenes
+Centro Minero de Sogamoso - SENA
+
+El MD5 de imagenes_entrenamiento.hash_imagen y equipos.imagen_hash solo
+reconoce copias byte a byte: la misma foto reenviada por WhatsApp o
+recortada unos píxeles es "otra" imagen. El pHash resume la imagen en 64
+bits (signo de las frecuencias bajas de su DCT) que cambian poco con
+recompresión, escalado, brillo o recortes leves; dos fotos son casi
+duplicadas si sus pHash difieren en pocos bits (distancia de Hamming).
+
+Búsqueda: multi-index hashing. El hash se parte en BLOQUES bloques de 16
+bits y cada bloque indexa una tabla; si dos hashes están a distancia <= r,
+por el principio del palomar al menos un bloque difiere en <= r // BLOQUES
+bits. Basta consultar en cada tabla las variantes del bloque con hasta esa
+cantidad de bits cambiados y verificar la distancia completa de los pocos
+candidatos. (Un árbol BK con r=10 sobre 64 bits recorre casi todo el árbol.)
+
+El índice se mantiene residente en cada worker (indice_hashes) y se
+sincroniza con el contador 'hashes_imagenes' de versiones_datos.
+"""
+import os
+import threading
+from itertools import combinations
+
+import numpy as np
+import cv2
+
+from ..utils.versiones import leer_version, incrementar_version
+
+try:
+    from config.config import Config
+except ImportError:
+    Config = None
+
+# Bits distintos (de 64) hasta los que dos imágenes se consideran la misma
+# foto. Recompresión/escalado/brillo: <= 4; recorte del 3%: <= 12;
+# fotos distintas: >= 20
+DISTANCIA_MAXIMA = getattr(Config, 'AI_IMAGES_HASH_DISTANCIA_MAXIMA', 10)
+
+BLOQUES = 4
+_BITS_BLOQUE = 64 // BLOQUES
+_MASCARA_BLOQUE = (1 << _BITS_BLOQUE) - 1
+
+_RAIZ_PROYECTO = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+
+def calcular_phash(imagen):
+    """
+    pHash de 64 bits de una imagen (BGR o escala de grises)
+
+    Returns:
+        str: 16 caracteres hexadecimales, o None si la imagen está vacía
+    """
+    if imagen is None or imagen.size == 0:
+        return None
+    gris = cv2.cvtColor(imagen, cv2.COLOR_BGR2GRAY) if imagen.ndim == 3 else imagen
+    reducida = cv2.resize(gris, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    bajas = cv2.dct(reducida)[:8, :8].ravel()
+    # La mediana sin la componente continua (brillo medio)
+    bits = bajas > np.median(bajas[1:])
+    return f"{int(np.packbits(bits).view('>u8')[0]):016x}"
+
+
+def phash_desde_bytes(datos):
+    """pHash de una imagen codificada (JPEG, PNG...) o None si no se puede leer"""
+    imagen = cv2.imdecode(np.frombuffer(datos, np.uint8), cv2.IMREAD_GRAYSCALE)
+    return calcular_phash(imagen)
+
+
+def phash_archivo(ruta):
+    """pHash de un archivo de imagen o None si no existe o no se puede leer"""
+    if not ruta or not os.path.exists(ruta):
+        return None
+    return calcular_phash(cv2.imread(ruta, cv2.IMREAD_GRAYSCALE))
+
+
+def ruta_archivo(ruta_web):
+    """Ruta en disco de una URL /uploads/... guardada en la base de datos"""
+    if ruta_web and ruta_web.startswith('/uploads/'):
+        return os.path.join(_RAIZ_PROYECTO, ruta_web.lstrip('/'))
+    return ruta_web
+
+
+def distancia_hamming(a, b):
+    """Bits distintos entre dos pHash (hex)"""
+    return bin(int(a, 16) ^ int(b, 16)).count('1')
+
+
+class IndiceHashes:
+    """
+    Índice en memoria de pHash para buscar por distancia de Hamming
+
+    Cada entrada asocia un pHash con un dict (p. ej. {'origen', 'id_equipo'}).
+    Varias entradas pueden compartir el mismo hash.
+    """
+
+    def __init__(self):
+        self._datos = {}  # hash (int) -> [dato, ...]
+        self._tablas = [{} for _ in range(BLOQUES)]  # bloque -> [hash, ...]
+        self._variantes = {}  # radio por bloque -> máscaras de bits
+
+    def __len__(self):
+        return sum(len(d) for d in self._datos.values())
+
+    def agregar(self, phash, dato):
+        valor = int(phash, 16)
+        existentes = self._datos.setdefault(valor, [])
+        existentes.append(dato)
+        if len(existentes) == 1:
+            for i, tabla in enumerate(self._tablas):
+                tabla.setdefault((valor >> (i * _BITS_BLOQUE)) & _MASCARA_BLOQUE, []).append(valor)
+
+    def _mascaras(self, radio):
+        mascaras = self._variantes.get(radio)
+        if mascaras is None:
+            mascaras = [0] + [
+                sum(1 << b for b in bits)
+                for k in range(1, radio + 1)
+                for bits in combinations(range(_BITS_BLOQUE), k)
+            ]
+            self._variantes[radio] = mascaras
+        return mascaras
+
+    def buscar(self, phash, distancia_maxima=None):
+        """
+        Entradas a distancia <= distancia_maxima, de la más cercana a la más lejana
+
+        Returns:
+            Lista de dicts: el dato de cada entrada más 'distancia'
+        """
+        radio = DISTANCIA_MAXIMA if distancia_maxima is None else distancia_maxima
+        valor = int(phash, 16)
+        vistos, encontrados = set(), []
+        for i, tabla in enumerate(self._tablas):
+            bloque = (valor >> (i * _BITS_BLOQUE)) & _MASCARA_BLOQUE
+            for mascara in self._mascaras(radio // BLOQUES):
+                for candidato in tabla.get(bloque ^ mascara, ()):
+                    if candidato in vistos:
+                        continue
+                    vistos.add(candidato)
+                    distancia = bin(valor ^ candidato).count('1')
+                    if distancia <= radio:
+                        encontrados.extend({**dato, 'distancia': distancia} for dato in self._datos[candidato])
+        encontrados.sort(key=lambda e: e['distancia'])
+        return encontrados
+
+    def copia(self):
+        """Copia independiente (las listas internas no se comparten)"""
+        nuevo = IndiceHashes()
+        nuevo._datos = {k: list(v) for k, v in self._datos.items()}
+        nuevo._tablas = [{k: list(v) for k, v in t.items()} for t in self._tablas]
+        nuevo._variantes = self._variantes
+        return nuevo
+
+
+def cargar_hashes(db):
+    """
+    Lee los pHash de las imágenes de entrenamiento y de las fotos de equipos
+
+    Las imágenes sin pHash (registradas antes de esta columna) se calculan
+    una sola vez desde el archivo y se guardan.
+
+    Returns:
+        IndiceHashes con entradas {'origen': 'entrenamiento'|'equipo',
+        'id', 'id_equipo', 'ruta'}
+    """
+    indice = IndiceHashes()
+    pendientes_imagenes, pendientes_equipos = [], []
+
+    filas = db.ejecutar_query(
+        "SELECT id, id_equipo, ruta_imagen, phash FROM imagenes_entrenamiento") or []
+    for fila in filas:
+        phash = fila.get('phash') or phash_archivo(ruta_archivo(fila['ruta_imagen']))
+        if phash is None:
+            continue
+        if not fila.get('phash'):
+            pendientes_imagenes.append((phash, fila['id']))
+        indice.agregar(phash, {'origen': 'entrenamiento', 'id': fila['id'],
+                               'id_equipo': fila['id_equipo'], 'ruta': fila['ruta_imagen']})
+
+    filas = db.ejecutar_query(
+        "SELECT id, imagen_url, imagen_phash FROM equipos WHERE imagen_url IS NOT NULL") or []
+    for fila in filas:
+        phash = fila.get('imagen_phash') or phash_archivo(ruta_archivo(fila['imagen_url']))
+        if phash is None:
+            continue
+        if not fila.get('imagen_phash'):
+            pendientes_equipos.append((phash, fila['id']))
+        indice.agregar(phash, {'origen': 'equipo', 'id': fila['id'],
+                               'id_equipo': fila['id'], 'ruta': fila['imagen_url']})
+
+    if pendientes_imagenes or pendientes_equipos:
+        print(f"[HASH] Calculando pHash pendientes: {len(pendientes_imagenes)} imágenes de "
+              f"entrenamiento, {len(pendientes_equipos)} fotos de equipos")
+        if pendientes_imagenes:
+            db.ejecutar_muchos("UPDATE imagenes_entrenamiento SET phash = %s WHERE id = %s",
+                               pendientes_imagenes)
+        if pendientes_equipos:
+            db.ejecutar_muchos("UPDATE equipos SET imagen_phash = %s WHERE id = %s",
+                               pendientes_equipos)
+    return indice
+
+
+class IndiceResidente:
+    """
+    Índice de pHash en memoria del worker, sincronizado por versión
+
+    Igual que la galería de rostros: se carga en el primer uso, cada
+    consulta lee el contador de versiones_datos y solo se recarga si otro
+    worker cambió las imágenes. Las imágenes agregadas por este worker se
+    suman a la copia en memoria.
+    """
+
+    NOMBRE_VERSION = 'hashes_imagenes'
+
+    def __init__(self):
+        self._indice = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def obtener(self, db):
+        """Índice vigente (lo carga o recarga si es necesario)"""
+        version = leer_version(db, self.NOMBRE_VERSION)
+        with self._lock:
+            if self._indice is not None and version is not None and version == self._version:
+                return self._indice
+            indice = cargar_hashes(db)
+            self._indice, self._version = indice, version
+            return indice
+
+    def notificar_cambio(self, db, nuevas=None):
+        """
+        Registra que cambiaron las imágenes indexadas
+
+        Debe llamarse después de confirmar la escritura. Con `nuevas`
+        (lista de (phash, dato)) y sin cambios de otros workers, solo se
+        agregan esas entradas; si no, la copia local se recarga en el
+        próximo uso (p. ej. al reemplazar la foto de un equipo).
+        """
+        version = incrementar_version(db, self.NOMBRE_VERSION)
+        with self._lock:
+            if self._indice is None:
+                return
+            if nuevas is None or version is None or self._version is None or version != self._version + 1:
+                self._indice = None
+                return
+            # Copia: las búsquedas en curso siguen usando el índice anterior
+            indice = self._indice.copia()
+            for phash, dato in nuevas:
+                indice.agregar(phash, dato)
+            self._indice, self._version = indice, version
+
+
+indice_hashes = IndiceResidente()
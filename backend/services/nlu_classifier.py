@@ -5,16 +5,14 @@
 import os
 import json
 import re
+import threading
+import importlib.util
 from typing import Dict, List, Tuple, Optional
 
-try:
-    from sklearn.feature_extraction.text import TfidfVectorizer
-    from sklearn.naive_bayes import MultinomialNB
-    from sklearn.pipeline import Pipeline
-    import joblib
-    SKLEARN_AVAILABLE = True
-except ImportError:
-    SKLEARN_AVAILABLE = False
+# scikit-learn (~1 s y ~120 MB) se importa al cargar el modelo en el primer
+# uso del clasificador, no al importar este módulo
+SKLEARN_AVAILABLE = all(importlib.util.find_spec(m) is not None for m in ('sklearn', 'joblib'))
+if not SKLEARN_AVAILABLE:
     print("⚠️ scikit-learn no está instalado. Instalar con: pip install scikit-learn joblib")
 
 
@@ -307,9 +305,17 @@ class NLUClassifier:
             self._initialized = True
             self._pipeline = None
             self._intents = list(self.TRAINING_DATA.keys())
-            
-            if SKLEARN_AVAILABLE:
+            self._model_checked = False
+            self._lock = threading.Lock()
+    
+    def _ensure_model(self):
+        """Carga (o entrena) el modelo en el primer uso"""
+        if self._model_checked or not SKLEARN_AVAILABLE:
+            return
+        with self._lock:
+            if not self._model_checked:
                 self._load_or_train_model()
+                self._model_checked = True
     
     def _preprocess_text(self, text: str) -> str:
         """Preprocesa el texto para mejorar la clasificación"""
@@ -329,6 +335,7 @@ class NLUClassifier:
         # Intentar cargar modelo existente
         if os.path.exists(self.MODEL_PATH):
             try:
+                import joblib
                 self._pipeline = joblib.load(self.MODEL_PATH)
                 print("✅ Modelo NLU cargado desde archivo")
                 return True
@@ -344,6 +351,11 @@ class NLUClassifier:
             return False
         
         try:
+            from sklearn.feature_extraction.text import TfidfVectorizer
+            from sklearn.naive_bayes import MultinomialNB
+            from sklearn.pipeline import Pipeline
+            import joblib
+            
             print("🔄 Entrenando modelo NLU...")
             
             # Preparar datos de entrenamiento
@@ -381,10 +393,12 @@ class NLUClassifier:
     
     def is_available(self) -> bool:
         """Verifica si el clasificador está disponible"""
+        self._ensure_model()
         return SKLEARN_AVAILABLE and self._pipeline is not None
     
     def get_status(self) -> Dict:
         """Retorna el estado del clasificador"""
+        self._ensure_model()
         return {
             'sklearn_installed': SKLEARN_AVAILABLE,
             'model_loaded': self._pipeline is not None,
@@ -497,6 +511,7 @@ class NLUClassifier:
                     self.TRAINING_DATA[intent] = examples
                     self._intents.append(intent)
         
+        self._model_checked = True
         return self._train_model()
 
 
@@ -5,10 +5,6 @@ Utiliza Random Forest para predecir fallas en equipos
 """
 import numpy as np
 import joblib
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split, cross_val_score
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import accuracy_score, classification_report
 from datetime import datetime, timedelta
 import os
 
@@ -22,7 +18,7 @@ class MantenimientoPredictivo:
     def __init__(self, db):
         self.db = db
         self.modelo = None
-        self.scaler = StandardScaler()
+        self.scaler = None  # StandardScaler, creado al entrenar o cargado con el modelo
         self.modelo_path = 'models/mantenimiento/modelo_predictivo.joblib'
         self.scaler_path = 'models/mantenimiento/scaler.joblib'
         self.precision_minima = 0.80  # 80% requerido
@@ -92,30 +88,42 @@ class MantenimientoPredictivo:
                     e.valor_adquisicion, e.estado_fisico
             HAVING total_mantenimientos > 0 OR total_prestamos > 0 OR e.estado_fisico IN ('malo', 'regular')
         """
-        return self.db.ejecutar_query(query) or []
+        # Lectura por bloques: el inventario completo no se materializa en memoria
+        return self.db.iterar_query(query, chunk=500, por_bloques=True)
     
-    def preparar_features(self, datos):
-        """Prepara las características para el modelo"""
-        X = []
-        y = []
+    def preparar_features(self, bloques):
+        """
+        Prepara las características para el modelo
+        
+        Args:
+            bloques: Iterable de listas de filas (ver obtener_datos_entrenamiento)
+        """
+        partes_X = []
+        partes_y = []
         
-        for d in datos:
-            features = [
-                float(d['dias_antiguedad'] or 365),
-                float(d['vida_util_dias'] or 1825),
-                float(d['valor'] or 0),
-                float(d['total_mantenimientos'] or 0),
-                float(d['costo_promedio'] or 0),
-                float(d['inactividad_promedio'] or 0),
-                float(d['dias_sin_mantenimiento'] or 30),
-                float(d['estado_numerico'] or 3),
-                float(d['total_prestamos'] or 0),
-                float(d['id_categoria'] or 1)
-            ]
-            X.append(features)
-            y.append(int(d['tuvo_falla']))
+        for bloque in bloques:
+            X_bloque = np.empty((len(bloque), len(self.feature_names)), dtype=np.float64)
+            y_bloque = np.empty(len(bloque), dtype=np.int64)
+            for i, d in enumerate(bloque):
+                X_bloque[i] = (
+                    float(d['dias_antiguedad'] or 365),
+                    float(d['vida_util_dias'] or 1825),
+                    float(d['valor'] or 0),
+                    float(d['total_mantenimientos'] or 0),
+                    float(d['costo_promedio'] or 0),
+                    float(d['inactividad_promedio'] or 0),
+                    float(d['dias_sin_mantenimiento'] or 30),
+                    float(d['estado_numerico'] or 3),
+                    float(d['total_prestamos'] or 0),
+                    float(d['id_categoria'] or 1)
+                )
+                y_bloque[i] = int(d['tuvo_falla'])
+            partes_X.append(X_bloque)
+            partes_y.append(y_bloque)
         
-        return np.array(X), np.array(y)
+        if not partes_X:
+            return np.empty((0, len(self.feature_names))), np.empty(0, dtype=np.int64)
+        return np.concatenate(partes_X), np.concatenate(partes_y)
     
     def generar_datos_sinteticos(self, X, y, n_samples=50):
         """
@@ -143,18 +151,24 @@ class MantenimientoPredictivo:
         Entrena el modelo de predicción.
         Retorna métricas de precisión.
         """
+        # scikit-learn se importa aquí y no al cargar el blueprint (~1.5 s por worker)
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.model_selection import train_test_split, cross_val_score
+        from sklearn.preprocessing import StandardScaler
+        from sklearn.metrics import accuracy_score
+
         print("🤖 Iniciando entrenamiento del modelo predictivo...")
-        datos = self.obtener_datos_entrenamiento()
+        X, y = self.preparar_features(self.obtener_datos_entrenamiento())
+        total_registros = len(X)
         
-        if len(datos) < 5:
+        if len(X) < 5:
             return {
                 'success': False,
-                'error': f'Datos insuficientes. Necesitas al menos 5 registros con historial, tienes {len(datos)}',
-                'registros_actuales': len(datos),
+                'error': f'Datos insuficientes. Necesitas al menos 5 registros con historial, tienes {len(X)}',
+                'registros_actuales': len(X),
                 'sugerencia': 'Registra más mantenimientos en el sistema para entrenar el modelo'
             }
         
-        X, y = self.preparar_features(datos)
         
         # Si hay pocos datos, generar sintéticos
         if len(X) < 20:
@@ -164,6 +178,7 @@ class MantenimientoPredictivo:
             y = np.concatenate([y, y_sint])
         
         # Normalizar datos
+        self.scaler = StandardScaler()
         X_scaled = self.scaler.fit_transform(X)
         
         # Dividir en entrenamiento y prueba
@@ -212,7 +227,7 @@ class MantenimientoPredictivo:
             'precision_cv': round(float(precision_cv) * 100, 2),
             'cumple_objetivo': bool(precision_cv >= self.precision_minima),
             'objetivo': f'{self.precision_minima * 100}%',
-            'total_registros': int(len(datos)),
+            'total_registros': int(total_registros),
             'registros_usados': int(len(X)),
             'registros_entrenamiento': int(len(X_train)),
             'registros_prueba': int(len(X_test)),
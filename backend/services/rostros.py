@@ -0,0 +1,380 @@
+"""
+Servicio de Embeddings Faciales
+Centro Minero de Sogamoso - SENA
+
+Cada rostro registrado se reduce a un vector float32 de longitud fija
+(EMBEDDING_DIM) normalizado: el login compara la imagen capturada contra
+todos los usuarios con un único producto matriz-vector, sin decodificar
+ninguna imagen almacenada. Un usuario puede tener varias plantillas
+(hasta MAX_PLANTILLAS, una fila de rostros_usuario cada una); cuenta la
+de mayor similitud.
+
+La galería se mantiene residente en cada worker (galeria_rostros) y se
+sincroniza con el contador 'galeria_rostros' de versiones_datos.
+"""
+import threading
+
+import numpy as np
+import cv2
+
+from ..utils.versiones import leer_version, incrementar_version
+
+try:
+    from config.config import Config
+except ImportError:
+    Config = None
+
+# Lado de la cuadrícula a la que se reduce el rostro (24x24 = 576 valores)
+EMBEDDING_LADO = getattr(Config, 'FACIAL_EMBEDDING_LADO', 24)
+EMBEDDING_DIM = EMBEDDING_LADO * EMBEDDING_LADO
+
+# Identifica el descriptor que generó un embedding guardado; si cambia, los
+# embeddings se recalculan desde la plantilla (rostros_usuario.version_modelo)
+VERSION_MODELO = f"correlacion-{EMBEDDING_LADO}x{EMBEDDING_LADO}-v1"
+
+# Similitud coseno mínima para aceptar una coincidencia
+UMBRAL_SIMILITUD = getattr(Config, 'FACIAL_UMBRAL_SIMILITUD', 0.80)
+
+# Plantillas (capturas registradas) que se conservan por usuario
+MAX_PLANTILLAS = getattr(Config, 'FACIAL_MAX_PLANTILLAS', 5)
+
+# Detección: lado mayor al que se reduce la imagen antes de buscar rostros
+# y tamaño mínimo del rostro (en píxeles de la imagen original)
+DETECCION_LADO_MAX = getattr(Config, 'FACIAL_DETECCION_LADO_MAX', 480)
+ROSTRO_MIN = getattr(Config, 'FACIAL_ROSTRO_MIN', 60)
+
+# Ventana base del clasificador Haar frontal: no detecta rostros menores
+_VENTANA_HAAR = 24
+_ARCHIVO_HAAR = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+
+# Un clasificador por hilo: cargar el XML cuesta decenas de milisegundos y
+# CascadeClassifier no debe compartirse entre hilos que detectan a la vez
+_detectores = threading.local()
+
+
+def _detector():
+    detector = getattr(_detectores, 'cascade', None)
+    if detector is None:
+        detector = cv2.CascadeClassifier(_ARCHIVO_HAAR)
+        if detector.empty():
+            raise RuntimeError(f"No se pudo cargar el clasificador {_ARCHIVO_HAAR}")
+        _detectores.cascade = detector
+    return detector
+
+
+def detectar_rostro(imagen, rostro_min=None):
+    """
+    Detecta el rostro principal de una imagen
+
+    La búsqueda se hace sobre una copia en grises reducida a
+    DETECCION_LADO_MAX; las coordenadas se escalan de vuelta y el recorte
+    se toma de la imagen original, sin perder resolución.
+
+    Args:
+        imagen: Imagen BGR
+        rostro_min: Lado mínimo del rostro en píxeles (por defecto ROSTRO_MIN)
+
+    Returns:
+        Rostro más grande recortado y redimensionado a 200x200, o None
+    """
+    try:
+        alto, ancho = imagen.shape[:2]
+        escala = min(1.0, DETECCION_LADO_MAX / max(alto, ancho))
+
+        gris = cv2.cvtColor(imagen, cv2.COLOR_BGR2GRAY)
+        if escala < 1.0:
+            gris = cv2.resize(gris, (round(ancho * escala), round(alto * escala)),
+                              interpolation=cv2.INTER_AREA)
+
+        lado_min = max(_VENTANA_HAAR, round((rostro_min or ROSTRO_MIN) * escala))
+        rostros = _detector().detectMultiScale(
+            gris,
+            scaleFactor=1.1,
+            minNeighbors=5,
+            minSize=(lado_min, lado_min)
+        )
+        if len(rostros) == 0:
+            return None
+
+        # Tomar el rostro más grande y llevarlo a coordenadas originales
+        x, y, w, h = (int(round(v / escala)) for v in max(rostros, key=lambda r: r[2] * r[3]))
+        rostro = imagen[max(y, 0):min(y + h, alto), max(x, 0):min(x + w, ancho)]
+        if rostro.size == 0:
+            return None
+        return cv2.resize(rostro, (200, 200))
+    except Exception as e:
+        print(f"Error detectando rostro: {e}")
+        return None
+
+
+def calcular_embedding(rostro):
+    """
+    Calcula el vector de características de un rostro ya recortado
+
+    El rostro se pasa a grises, se ecualiza, se reduce a una cuadrícula
+    EMBEDDING_LADO x EMBEDDING_LADO y se centra y normaliza (norma L2 = 1).
+    Así el producto punto entre dos vectores es su correlación normalizada,
+    insensible a cambios globales de brillo y contraste.
+
+    Args:
+        rostro: Imagen BGR o en grises del rostro recortado
+
+    Returns:
+        np.ndarray float32 de EMBEDDING_DIM elementos
+    """
+    gris = rostro if rostro.ndim == 2 else cv2.cvtColor(rostro, cv2.COLOR_BGR2GRAY)
+    gris = cv2.equalizeHist(cv2.resize(gris, (200, 200)))
+    reducido = cv2.resize(gris, (EMBEDDING_LADO, EMBEDDING_LADO), interpolation=cv2.INTER_AREA)
+
+    vector = reducido.astype(np.float32).ravel()
+    vector -= vector.mean()
+    norma = np.linalg.norm(vector)
+    if norma > 0:
+        vector /= norma
+    return vector
+
+
+def embedding_a_bytes(vector):
+    """Serializa un embedding para guardarlo en BLOB (float32 little-endian)"""
+    return np.asarray(vector, dtype='<f4').tobytes()
+
+
+def bytes_a_embedding(datos):
+    """
+    Recupera un embedding guardado
+
+    Returns:
+        np.ndarray float32 o None si el tamaño no corresponde a EMBEDDING_DIM
+    """
+    if not datos or len(datos) != EMBEDDING_DIM * 4:
+        return None
+    return np.frombuffer(datos, dtype='<f4')
+
+
+def similitud_plantillas(plantillas, consulta):
+    """Similitud de la mejor plantilla de un usuario con `consulta`"""
+    if plantillas is None or len(plantillas) == 0:
+        return 0.0
+    return float(np.max(plantillas @ consulta))
+
+
+def embedding_desde_jpeg(datos):
+    """Calcula el embedding de una plantilla guardada como JPEG"""
+    imagen = cv2.imdecode(np.frombuffer(datos, np.uint8), cv2.IMREAD_COLOR)
+    if imagen is None:
+        return None
+    return calcular_embedding(imagen)
+
+
+class GaleriaRostros:
+    """
+    Matriz de embeddings (N x EMBEDDING_DIM) con los ids de usuario
+
+    La búsqueda del vecino más cercano es un producto matriz-vector: con
+    vectores normalizados, cada elemento del resultado es la similitud
+    coseno entre la consulta y una plantilla. Un usuario con varias
+    plantillas ocupa varias filas con el mismo id.
+    """
+
+    def __init__(self, ids=None, vectores=None):
+        if ids is None or len(ids) == 0:
+            self.ids = np.empty(0, dtype=np.int64)
+            self.matriz = np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+        else:
+            self.ids = np.asarray(ids, dtype=np.int64)
+            self.matriz = np.ascontiguousarray(np.vstack(vectores), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def buscar(self, consulta):
+        """
+        Vecino más cercano de `consulta`
+
+        Returns:
+            Tupla (id_usuario, similitud) o (None, 0.0) si la galería está vacía
+        """
+        if len(self.ids) == 0:
+            return None, 0.0
+        similitudes = self.matriz @ consulta
+        indice = int(np.argmax(similitudes))
+        return int(self.ids[indice]), float(similitudes[indice])
+
+    def actualizada(self, quitar, ids, vectores):
+        """
+        Copia de la galería con cambios puntuales
+
+        La galería original no se modifica: los logins en curso siguen
+        usando su referencia mientras se publica la nueva.
+
+        Args:
+            quitar: ids de usuario a retirar (los modificados)
+            ids: ids de usuario a (re)insertar
+            vectores: embeddings correspondientes a `ids`
+        """
+        conservar = ~np.isin(self.ids, np.asarray(list(quitar), dtype=np.int64))
+        nueva = GaleriaRostros()
+        if len(ids):
+            nueva.ids = np.concatenate([self.ids[conservar], np.asarray(ids, dtype=np.int64)])
+            nueva.matriz = np.ascontiguousarray(
+                np.vstack([self.matriz[conservar]] + list(vectores)), dtype=np.float32)
+        else:
+            nueva.ids = self.ids[conservar]
+            nueva.matriz = np.ascontiguousarray(self.matriz[conservar])
+        return nueva
+
+
+def cargar_embeddings(db, ids_usuario=None):
+    """
+    Lee los embeddings de los usuarios activos con rostro registrado
+
+    Las plantillas sin embedding o con uno de otro descriptor
+    (version_modelo distinta de VERSION_MODELO) se calculan una sola vez
+    desde el JPEG y se guardan, de modo que las siguientes cargas no
+    decodifican imágenes.
+
+    Args:
+        db: DatabaseManager
+        ids_usuario: Limitar la carga a estos usuarios (None = todos)
+
+    Returns:
+        Tupla (ids, vectores): un id de usuario por plantilla y su vector
+    """
+    query = """
+        SELECT ru.id, ru.id_usuario,
+               IF(ru.version_modelo = %s, ru.embedding, NULL) AS embedding,
+               IF(ru.embedding IS NULL OR ru.version_modelo != %s, ru.plantilla, NULL) AS plantilla
+        FROM rostros_usuario ru
+        JOIN usuarios u ON ru.id_usuario = u.id
+        WHERE u.estado = 'activo'
+    """
+    params = [VERSION_MODELO, VERSION_MODELO]
+    if ids_usuario is not None:
+        if not ids_usuario:
+            return [], []
+        query += f" AND ru.id_usuario IN ({', '.join(['%s'] * len(ids_usuario))})"
+        params.extend(ids_usuario)
+    filas = db.ejecutar_query(query, tuple(params)) or []
+
+    ids, vectores, pendientes = [], [], []
+    for fila in filas:
+        vector = bytes_a_embedding(fila.get('embedding'))
+        if vector is None and fila.get('plantilla'):
+            vector = embedding_desde_jpeg(fila['plantilla'])
+            if vector is not None:
+                pendientes.append((embedding_a_bytes(vector), VERSION_MODELO, fila['id']))
+        if vector is not None:
+            ids.append(fila['id_usuario'])
+            vectores.append(vector)
+
+    if pendientes:
+        print(f"[FACIAL] Calculando embeddings pendientes: {len(pendientes)} plantillas")
+        db.ejecutar_muchos(
+            "UPDATE rostros_usuario SET embedding = %s, version_modelo = %s WHERE id = %s", pendientes)
+
+    return ids, vectores
+
+
+def guardar_plantilla(db, id_usuario, plantilla, vector, reemplazar=True):
+    """
+    Registra una plantilla facial de un usuario
+
+    Args:
+        db: DatabaseManager
+        id_usuario: Usuario dueño del rostro
+        plantilla: Rostro recortado codificado en JPEG
+        vector: Embedding de la plantilla
+        reemplazar: Si True se descartan las plantillas anteriores; si no,
+            se conservan las MAX_PLANTILLAS más recientes
+
+    Returns:
+        Número de plantillas del usuario, o None si hubo error
+    """
+    try:
+        with db.transaccion() as tx:
+            if reemplazar:
+                tx.ejecutar("DELETE FROM rostros_usuario WHERE id_usuario = %s", (id_usuario,))
+            tx.insertar('rostros_usuario', {
+                'id_usuario': id_usuario,
+                'plantilla': plantilla,
+                'embedding': embedding_a_bytes(vector),
+                'version_modelo': VERSION_MODELO
+            })
+            tx.ejecutar("""
+                DELETE FROM rostros_usuario
+                WHERE id_usuario = %s AND id NOT IN (
+                    SELECT id FROM (
+                        SELECT id FROM rostros_usuario WHERE id_usuario = %s
+                        ORDER BY id DESC LIMIT %s
+                    ) recientes
+                )
+            """, (id_usuario, id_usuario, MAX_PLANTILLAS))
+            fila = tx.obtener_uno(
+                "SELECT COUNT(*) AS total FROM rostros_usuario WHERE id_usuario = %s", (id_usuario,))
+        return int(fila['total'])
+    except Exception as e:
+        print(f"Error guardando plantilla facial: {e}")
+        return None
+
+
+class GaleriaResidente:
+    """
+    Galería de rostros en memoria del worker, sincronizada por versión
+
+    Se carga en el primer uso. Cada consulta lee el contador de
+    versiones_datos (una fila por clave primaria) y recarga la galería
+    solo si otro worker la modificó. Los cambios hechos por este worker
+    se aplican sobre la copia en memoria sin recargarla completa.
+    """
+
+    NOMBRE_VERSION = 'galeria_rostros'
+
+    def __init__(self):
+        self._galeria = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def obtener(self, db):
+        """Galería vigente (la carga o recarga si es necesario)"""
+        version = leer_version(db, self.NOMBRE_VERSION)
+        with self._lock:
+            # Sin versión legible (tabla ausente o error) no se confía en la copia
+            if self._galeria is not None and version is not None and version == self._version:
+                return self._galeria
+            # La versión se leyó antes de cargar: un cambio concurrente
+            # deja la copia con la versión anterior y se recarga en la siguiente
+            galeria = GaleriaRostros(*cargar_embeddings(db))
+            self._galeria, self._version = galeria, version
+            return galeria
+
+    def notificar_cambio(self, db, ids_usuario):
+        """
+        Registra que cambió el rostro o el estado de usuarios
+
+        Debe llamarse después de confirmar la escritura. Incrementa la
+        versión compartida y, si ningún otro worker la cambió mientras
+        tanto, actualiza solo esos usuarios en la copia local.
+
+        Args:
+            db: DatabaseManager
+            ids_usuario: ids de los usuarios modificados
+        """
+        ids_usuario = [int(i) for i in ids_usuario]
+        version = incrementar_version(db, self.NOMBRE_VERSION)
+        with self._lock:
+            if self._galeria is None:
+                return
+            if version is None or self._version is None or version != self._version + 1:
+                self._galeria = None
+                return
+            ids, vectores = cargar_embeddings(db, ids_usuario)
+            self._galeria = self._galeria.actualizada(ids_usuario, ids, vectores)
+            self._version = version
+
+    def invalidar(self):
+        """Descarta la copia local (se recarga en el próximo uso)"""
+        with self._lock:
+            self._galeria = None
+
+
+galeria_rostros = GaleriaResidente()
@@ -0,0 +1,353 @@
+"""
+Servicio de Búsqueda de Equipos por Similitud de Imagen
+Centro Minero de Sogamoso - SENA
+
+La foto de cada equipo (equipos.imagen_url) se reduce una sola vez, al
+subirla, a un vector float32 normalizado (VECTOR_DIM): histogramas de
+tono/saturación por cuadrante (color, insensible al brillo) y de
+orientación de gradientes en una cuadrícula 4x4 (forma). Cada parte se
+centra y normaliza, de modo que el producto punto entre dos vectores es
+una similitud coseno: ~1 para la misma foto, <0.5 en general para equipos
+distintos.
+
+POST /api/equipos/reconocer calcula el vector de la captura y pide los k
+más parecidos al índice residente del worker (indice_vectores), que se
+sincroniza con el contador 'vectores_equipos' de versiones_datos.
+
+Índices:
+    IndicePlano: producto matriz-vector exacto; con VECTOR_DIM=240 son
+        ~1 ms por cada 20.000 equipos.
+    IndiceIVF (aproximado): k-means agrupa los vectores en listas y la
+        consulta solo recorre las SONDAS listas de centroides más
+        cercanos. Se usa desde INDICE_APROXIMADO_MINIMO vectores con
+        AI_IMAGES_INDICE=auto.
+"""
+import os
+import threading
+
+import numpy as np
+import cv2
+
+from ..utils.versiones import leer_version, incrementar_version
+from .hash_perceptual import ruta_archivo
+
+try:
+    from config.config import Config
+except ImportError:
+    Config = None
+
+# Descriptor: color H x S (8x3) por cuadrante + gradientes 4x4 celdas x 9 orientaciones
+_LADO = 128
+_BINS_COLOR = (8, 3)
+_CELDAS = 4
+_ORIENTACIONES = 9
+VECTOR_DIM = 4 * _BINS_COLOR[0] * _BINS_COLOR[1] + _CELDAS * _CELDAS * _ORIENTACIONES
+
+# Identifica el descriptor que generó un vector guardado; si cambia, los
+# vectores se recalculan desde la foto (equipos.imagen_vector_version)
+VERSION_DESCRIPTOR = f"hs{_BINS_COLOR[0]}x{_BINS_COLOR[1]}q-grad{_CELDAS}x{_CELDAS}x{_ORIENTACIONES}-v1"
+
+# Similitud mínima para devolver un equipo como coincidencia
+SIMILITUD_MINIMA = getattr(Config, 'AI_IMAGES_SIMILITUD_MINIMA', 0.5)
+
+# Tipo de índice: auto (plano hasta INDICE_APROXIMADO_MINIMO vectores), plano o ivf
+TIPO_INDICE = getattr(Config, 'AI_IMAGES_INDICE', 'auto')
+INDICE_APROXIMADO_MINIMO = getattr(Config, 'AI_IMAGES_INDICE_APROXIMADO_MINIMO', 20000)
+SONDAS = getattr(Config, 'AI_IMAGES_INDICE_SONDAS', 8)  # Listas recorridas por consulta (IVF)
+
+# Celda (0..15) de cada píxel de la imagen reducida, para el histograma de gradientes
+_CELDA_PIXEL = (np.arange(_LADO)[:, None] * _CELDAS // _LADO * _CELDAS
+                + np.arange(_LADO)[None, :] * _CELDAS // _LADO).ravel()
+
+
+def _normalizar(parte):
+    """Raíz (atenúa picos), centrado y norma L2 = 1"""
+    parte = np.sqrt(parte / max(float(parte.sum()), 1e-9))
+    parte = parte - parte.mean()
+    return parte / max(float(np.linalg.norm(parte)), 1e-9)
+
+
+def calcular_vector(imagen):
+    """
+    Vector de características de la foto de un equipo
+
+    Args:
+        imagen: Imagen BGR
+
+    Returns:
+        np.ndarray float32 de VECTOR_DIM elementos (norma L2 = 1), o None
+        si la imagen está vacía
+    """
+    if imagen is None or imagen.size == 0:
+        return None
+    if imagen.ndim == 2:
+        imagen = cv2.cvtColor(imagen, cv2.COLOR_GRAY2BGR)
+    reducida = cv2.resize(imagen, (_LADO, _LADO), interpolation=cv2.INTER_AREA)
+
+    # Color: histograma H x S de cada cuadrante (V se ignora: brillo)
+    hsv = cv2.cvtColor(reducida, cv2.COLOR_BGR2HSV)
+    mitad = _LADO // 2
+    color = np.concatenate([
+        cv2.calcHist([hsv[y:y + mitad, x:x + mitad]], [0, 1], None, list(_BINS_COLOR), [0, 180, 0, 256]).ravel()
+        for y in (0, mitad) for x in (0, mitad)
+    ])
+
+    # Forma: orientación de los gradientes (0-180°) ponderada por magnitud, por celda
+    gris = cv2.cvtColor(reducida, cv2.COLOR_BGR2GRAY).astype(np.float32)
+    magnitud, angulo = cv2.cartToPolar(cv2.Sobel(gris, cv2.CV_32F, 1, 0),
+                                       cv2.Sobel(gris, cv2.CV_32F, 0, 1), angleInDegrees=True)
+    orientacion = (np.mod(angulo, 180) * _ORIENTACIONES / 180).astype(np.int64).ravel() % _ORIENTACIONES
+    gradientes = np.bincount(_CELDA_PIXEL * _ORIENTACIONES + orientacion, weights=magnitud.ravel(),
+                             minlength=_CELDAS * _CELDAS * _ORIENTACIONES)
+
+    vector = np.concatenate([_normalizar(color), _normalizar(gradientes)])
+    return (vector / np.linalg.norm(vector)).astype(np.float32)
+
+
+def vector_desde_bytes(datos):
+    """Vector de una imagen codificada (JPEG, PNG...) o None si no se puede leer"""
+    return calcular_vector(cv2.imdecode(np.frombuffer(datos, np.uint8), cv2.IMREAD_COLOR))
+
+
+def vector_a_bytes(vector):
+    """Serializa un vector para guardarlo en BLOB (float32 little-endian)"""
+    return np.asarray(vector, dtype='<f4').tobytes()
+
+
+def bytes_a_vector(datos):
+    """Vector guardado, o None si el tamaño no corresponde a VECTOR_DIM"""
+    if not datos or len(datos) != VECTOR_DIM * 4:
+        return None
+    return np.frombuffer(datos, dtype='<f4')
+
+
+def _mejores(similitudes, k):
+    """Posiciones de las k similitudes mayores, de mayor a menor"""
+    if len(similitudes) > k:
+        posiciones = np.argpartition(-similitudes, k - 1)[:k]
+    else:
+        posiciones = np.arange(len(similitudes))
+    return posiciones[np.argsort(-similitudes[posiciones])]
+
+
+class IndicePlano:
+    """
+    Matriz de vectores (N x VECTOR_DIM) con los ids de equipo
+
+    La búsqueda es exacta: un producto matriz-vector y selección de los k
+    mayores con argpartition.
+    """
+
+    tipo = 'plano'
+
+    def __init__(self, ids=None, vectores=None):
+        if ids is None or len(ids) == 0:
+            self.ids = np.empty(0, dtype=np.int64)
+            self.matriz = np.empty((0, VECTOR_DIM), dtype=np.float32)
+        else:
+            self.ids = np.asarray(ids, dtype=np.int64)
+            self.matriz = np.ascontiguousarray(np.vstack(vectores), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def buscar(self, consulta, k=5):
+        """
+        Los k equipos más parecidos a `consulta`
+
+        Returns:
+            Lista de (id_equipo, similitud) de mayor a menor similitud
+        """
+        if len(self.ids) == 0:
+            return []
+        similitudes = self.matriz @ consulta
+        return [(int(self.ids[i]), float(similitudes[i])) for i in _mejores(similitudes, k)]
+
+    def actualizada(self, quitar, ids, vectores):
+        """
+        Copia del índice con cambios puntuales (el original no se modifica)
+
+        Args:
+            quitar: ids de equipo a retirar
+            ids: ids de equipo a (re)insertar
+            vectores: vectores correspondientes a `ids`
+        """
+        conservar = ~np.isin(self.ids, np.asarray(list(quitar), dtype=np.int64))
+        return IndicePlano(
+            np.concatenate([self.ids[conservar], np.asarray(ids, dtype=np.int64)]),
+            [self.matriz[conservar]] + [np.asarray(v, dtype=np.float32).reshape(1, -1) for v in vectores]
+        )
+
+
+class IndiceIVF(IndicePlano):
+    """
+    Índice aproximado por listas invertidas (IVF)
+
+    Los vectores se agrupan con k-means en ~sqrt(N) listas. Una consulta
+    compara contra los centroides y calcula la similitud exacta solo con
+    los vectores de las `sondas` listas más cercanas. Más sondas: más
+    exactitud y más tiempo.
+
+    Los cambios puntuales conservan los centroides; se reentrenan cuando el
+    índice crece tanto que las listas quedan muy por debajo de ~sqrt(N)
+    (p. ej. un índice creado con las primeras fotos).
+    """
+
+    tipo = 'ivf'
+
+    def __init__(self, ids=None, vectores=None, centroides=None, sondas=SONDAS):
+        super().__init__(ids, vectores)
+        self.sondas = sondas
+        if centroides is None and len(self.ids):
+            centroides = self._entrenar_centroides(self.matriz)
+        self.centroides = centroides
+        self.listas = []
+        if centroides is not None and len(self.ids):
+            asignacion = np.argmax(self.matriz @ centroides.T, axis=1)
+            orden = np.argsort(asignacion, kind='stable')
+            limites = np.searchsorted(asignacion[orden], np.arange(len(centroides) + 1))
+            self.listas = [orden[limites[i]:limites[i + 1]] for i in range(len(centroides))]
+
+    @staticmethod
+    def _num_listas(n):
+        return max(1, int(np.sqrt(n)))
+
+    @classmethod
+    def _entrenar_centroides(cls, matriz):
+        """Centroides normalizados (num_listas x VECTOR_DIM) por k-means"""
+        num_listas = cls._num_listas(len(matriz))
+        if len(matriz) <= num_listas:
+            # Cada vector es su propia lista (cv2.kmeans con N=1 devuelve
+            # centroides de forma incorrecta)
+            return matriz.copy()
+        # k-means sobre una muestra (~32 vectores por lista): con 100.000
+        # vectores entrenar con todos tarda casi un minuto
+        muestra = matriz
+        if len(muestra) > num_listas * 32:
+            muestra = muestra[np.random.default_rng(0).choice(len(muestra), num_listas * 32, replace=False)]
+        criterio = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 20, 1e-3)
+        _, _, centroides = cv2.kmeans(muestra, num_listas, None, criterio, 1, cv2.KMEANS_PP_CENTERS)
+        centroides = centroides.reshape(num_listas, VECTOR_DIM)
+        return centroides / np.maximum(np.linalg.norm(centroides, axis=1, keepdims=True), 1e-9)
+
+    def buscar(self, consulta, k=5):
+        if len(self.ids) == 0:
+            return []
+        cercanas = _mejores(self.centroides @ consulta, self.sondas)
+        candidatos = np.concatenate([self.listas[i] for i in cercanas])
+        similitudes = self.matriz[candidatos] @ consulta
+        return [(int(self.ids[candidatos[i]]), float(similitudes[i])) for i in _mejores(similitudes, k)]
+
+    def actualizada(self, quitar, ids, vectores):
+        """Copia con cambios puntuales; conserva los centroides salvo que el índice se haya cuadruplicado"""
+        plano = IndicePlano.actualizada(self, quitar, ids, vectores)
+        centroides = self.centroides
+        if centroides is not None and len(centroides) * 2 < self._num_listas(len(plano.ids)):
+            centroides = None
+        return IndiceIVF(plano.ids, [plano.matriz], centroides=centroides, sondas=self.sondas)
+
+
+def crear_indice(ids, vectores, tipo=None):
+    """Índice plano o IVF según AI_IMAGES_INDICE y la cantidad de vectores"""
+    tipo = tipo or TIPO_INDICE
+    if tipo == 'ivf' or (tipo == 'auto' and len(ids) >= INDICE_APROXIMADO_MINIMO):
+        return IndiceIVF(ids, vectores)
+    return IndicePlano(ids, vectores)
+
+
+def cargar_vectores(db, ids_equipo=None):
+    """
+    Lee los vectores de las fotos de los equipos
+
+    Las fotos sin vector o con uno de otro descriptor se calculan una sola
+    vez desde el archivo y se guardan.
+
+    Args:
+        db: DatabaseManager
+        ids_equipo: Limitar la carga a estos equipos (None = todos)
+
+    Returns:
+        Tupla (ids, vectores)
+    """
+    query = """
+        SELECT id, imagen_url,
+               IF(imagen_vector_version = %s, imagen_vector, NULL) AS imagen_vector
+        FROM equipos
+        WHERE imagen_url IS NOT NULL
+    """
+    params = [VERSION_DESCRIPTOR]
+    if ids_equipo is not None:
+        if not ids_equipo:
+            return [], []
+        query += f" AND id IN ({', '.join(['%s'] * len(ids_equipo))})"
+        params.extend(ids_equipo)
+    filas = db.ejecutar_query(query, tuple(params)) or []
+
+    ids, vectores, pendientes = [], [], []
+    for fila in filas:
+        vector = bytes_a_vector(fila.get('imagen_vector'))
+        ruta = ruta_archivo(fila['imagen_url'])
+        if vector is None and ruta and os.path.exists(ruta):
+            vector = calcular_vector(cv2.imread(ruta))
+            if vector is not None:
+                pendientes.append((vector_a_bytes(vector), VERSION_DESCRIPTOR, fila['id']))
+        if vector is not None:
+            ids.append(fila['id'])
+            vectores.append(vector)
+
+    if pendientes:
+        print(f"[VECTORES] Calculando vectores pendientes: {len(pendientes)} fotos de equipos")
+        db.ejecutar_muchos(
+            "UPDATE equipos SET imagen_vector = %s, imagen_vector_version = %s WHERE id = %s", pendientes)
+
+    return ids, vectores
+
+
+class IndiceResidente:
+    """
+    Índice de vectores en memoria del worker, sincronizado por versión
+
+    Igual que la galería de rostros: se carga en el primer uso y solo se
+    recarga si otro worker cambió las fotos; los cambios de este worker se
+    aplican sobre la copia en memoria.
+    """
+
+    NOMBRE_VERSION = 'vectores_equipos'
+
+    def __init__(self):
+        self._indice = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def obtener(self, db):
+        """Índice vigente (lo carga o recarga si es necesario)"""
+        version = leer_version(db, self.NOMBRE_VERSION)
+        with self._lock:
+            if self._indice is not None and version is not None and version == self._version:
+                return self._indice
+            indice = crear_indice(*cargar_vectores(db))
+            self._indice, self._version = indice, version
+            return indice
+
+    def notificar_cambio(self, db, ids_equipo=None):
+        """
+        Registra que cambió la foto de equipos
+
+        Debe llamarse después de confirmar la escritura. Con `ids_equipo` y
+        sin cambios de otros workers, solo esos equipos se releen; si no,
+        la copia local se recarga en el próximo uso.
+        """
+        version = incrementar_version(db, self.NOMBRE_VERSION)
+        with self._lock:
+            if self._indice is None:
+                return
+            if ids_equipo is None or version is None or self._version is None or version != self._version + 1:
+                self._indice = None
+                return
+            ids_equipo = [int(i) for i in ids_equipo]
+            ids, vectores = cargar_vectores(db, ids_equipo)
+            self._indice = self._indice.actualizada(ids_equipo, ids, vectores)
+            self._version = version
+
+
+indice_vectores = IndiceResidente()
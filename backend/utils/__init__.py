@@ -1,11 +1,18 @@
 # Utilidades del Sistema GIL
 # Centro Minero de Sogamoso - SENA
 
-from .database import DatabaseManager
+from .database import DatabaseManager, registrar_sesion_request
+from .metricas_sql import monitor_sql, registrar_metricas_sql
+from .cache import cache_api, cachear_respuesta
 from .auth import AuthManager, require_auth, require_level
 
 __all__ = [
     'DatabaseManager',
+    'registrar_sesion_request',
+    'monitor_sql',
+    'registrar_metricas_sql',
+    'cache_api',
+    'cachear_respuesta',
     'AuthManager',
     'require_auth',
     'require_level'
@@ -0,0 +1,172 @@
+# Arranque de workers: tiempos de inicio y calentamiento de modelos de IA
+# Centro Minero SENA
+#
+# TensorFlow y scikit-learn se importan en el primer uso, así que un worker
+# que solo atiende CRUD arranca sin ellos. En los workers que sí atienden IA,
+# ML_CALENTAR_MODELOS (p. ej. "reconocimiento,nlu") carga cada modelo y hace
+# una predicción de prueba justo después del fork, en un hilo aparte, para
+# que la primera solicitud real no pague ese costo.
+
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    from config.config import Config
+except ImportError:
+    Config = None
+
+logger = logging.getLogger(__name__)
+
+# Módulos pesados que se reportan como cargados o no en el proceso
+MODULOS_ML = ('tensorflow', 'sklearn', 'cv2')
+
+_inicio = time.perf_counter()
+_ultima_marca = _inicio
+_fases: Dict[str, float] = {}
+_calentamiento: Dict[str, Dict[str, Any]] = {}
+_lock = threading.Lock()
+
+
+def marcar_fase(nombre: str):
+    """Registra los segundos transcurridos desde la marca anterior"""
+    global _ultima_marca
+    ahora = time.perf_counter()
+    _fases[nombre] = round(ahora - _ultima_marca, 3)
+    _ultima_marca = ahora
+
+
+def _calentar_reconocimiento():
+    from backend.api.reconocimiento_ia import obtener_sistema
+    sistema = obtener_sistema()
+    if sistema is None:
+        return 'no disponible'
+    return 'ok' if sistema.calentar() else 'sin modelo entrenado'
+
+
+def _calentar_nlu():
+    from backend.services.nlu_classifier import nlu_classifier
+    nlu_classifier.classify('hola')
+    return 'ok' if nlu_classifier.is_available() else 'no disponible'
+
+
+def _calentar_predictivo():
+    from backend.api.mantenimiento_predictivo import servicio
+    return 'ok' if servicio.cargar_modelo() else 'sin modelo entrenado'
+
+
+def _calentar_vectores():
+    from backend.api.equipos import db
+    from backend.services.vectores_equipos import indice_vectores
+    return f"ok ({len(indice_vectores.obtener(db))} equipos)"
+
+
+MODELOS = {
+    'reconocimiento': _calentar_reconocimiento,
+    'nlu': _calentar_nlu,
+    'predictivo': _calentar_predictivo,
+    'vectores': _calentar_vectores,
+}
+
+
+def modelos_configurados() -> List[str]:
+    """Modelos de ML_CALENTAR_MODELOS (vacío = no calentar)"""
+    valor = getattr(Config, 'ML_CALENTAR_MODELOS', '') or ''
+    return [m.strip().lower() for m in valor.split(',') if m.strip()]
+
+
+def calentar_modelos(modelos: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Carga cada modelo y ejecuta una predicción de prueba
+
+    Args:
+        modelos: Nombres de MODELOS; por defecto los de ML_CALENTAR_MODELOS
+
+    Returns:
+        dict: {modelo: {'estado', 'segundos'}} de esta ejecución
+    """
+    resultado = {}
+    for nombre in (modelos if modelos is not None else modelos_configurados()):
+        funcion = MODELOS.get(nombre)
+        if funcion is None:
+            logger.warning(f"⚠️ Modelo desconocido en ML_CALENTAR_MODELOS: {nombre}")
+            continue
+        inicio = time.perf_counter()
+        try:
+            estado = funcion()
+        except Exception as e:
+            logger.error(f"❌ Error calentando modelo {nombre}: {e}")
+            estado = f'error: {e}'
+        resultado[nombre] = {'estado': estado, 'segundos': round(time.perf_counter() - inicio, 3)}
+        logger.info(f"🔥 Modelo {nombre} calentado en {resultado[nombre]['segundos']} s ({estado})")
+    with _lock:
+        _calentamiento.update(resultado)
+    return resultado
+
+
+def calentar_en_segundo_plano(modelos: Optional[List[str]] = None) -> Optional[threading.Thread]:
+    """Calienta en un hilo daemon para no retrasar el arranque del worker"""
+    modelos = modelos if modelos is not None else modelos_configurados()
+    desconocidos = [m for m in modelos if m not in MODELOS]
+    if desconocidos:
+        logger.warning(f"⚠️ Modelos desconocidos en ML_CALENTAR_MODELOS: {', '.join(desconocidos)}")
+    modelos = [m for m in modelos if m in MODELOS]
+    if not modelos:
+        return None
+    with _lock:
+        for nombre in modelos:
+            _calentamiento[nombre] = {'estado': 'en curso', 'segundos': None}
+    hilo = threading.Thread(target=calentar_modelos, args=(modelos,), name='calentamiento-ml', daemon=True)
+    hilo.start()
+    return hilo
+
+
+def programar_calentamiento_tras_fork():
+    """
+    Calienta los modelos configurados en cada proceso hijo creado con fork
+    (workers de gunicorn con --preload): el maestro nunca carga TensorFlow
+    y cada worker calienta su propia copia después del fork.
+
+    Sin --preload cada worker importa la app por su cuenta y no hay fork
+    posterior; en ese caso usar el hook de gunicorn:
+        def post_worker_init(worker):
+            from backend.utils.arranque import calentar_en_segundo_plano
+            calentar_en_segundo_plano()
+    """
+    if modelos_configurados() and hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=calentar_en_segundo_plano)
+
+
+def _memoria_mb() -> Optional[float]:
+    """RSS actual del proceso (pico si /proc no está disponible)"""
+    try:
+        with open('/proc/self/statm') as f:
+            paginas = int(f.read().split()[1])
+        return round(paginas * os.sysconf('SC_PAGE_SIZE') / 2**20, 1)
+    except (OSError, ValueError, AttributeError):
+        if resource is None:
+            return None
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def reporte_arranque() -> Dict[str, Any]:
+    """Tiempos de arranque, módulos de IA cargados y calentamiento del proceso"""
+    with _lock:
+        calentamiento = {nombre: dict(datos) for nombre, datos in _calentamiento.items()}
+    return {
+        'pid': os.getpid(),
+        'fases_segundos': dict(_fases),
+        'arranque_segundos': round(sum(_fases.values()), 3),
+        'modulos_ml': {m: m in sys.modules for m in MODULOS_ML},
+        'calentar_modelos': modelos_configurados(),
+        'calentamiento': calentamiento,
+        'memoria_mb': _memoria_mb(),
+    }
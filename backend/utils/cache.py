@@ -0,0 +1,322 @@
+# Caché de respuestas de la API
+# Centro Minero SENA
+#
+# Implementa la configuración CACHE_* de APIConfig. Cada entrada pertenece a
+# un espacio (p. ej. 'categorias_equipos'); invalidar un espacio incrementa
+# su versión, que forma parte de la clave, de modo que las entradas antiguas
+# dejan de leerse sin tener que recorrerlas y expiran solas por TTL.
+#
+# Invalidación: cada espacio se vincula a las tablas de las que depende
+# (cache_api.vincular_tablas) y DatabaseManager lo invalida al escribir en
+# ellas (invalidar_tablas), venga la escritura del endpoint que venga.
+#
+# Backends:
+# - 'simple': LRU en memoria con TTL, propio de cada proceso. Las versiones
+#             también son locales: con varios workers (gunicorn) los demás
+#             siguen sirviendo la respuesta anterior hasta que vence el TTL.
+# - 'redis':  compartido entre workers (requiere el paquete redis); es el
+#             necesario para que la invalidación llegue a todos los workers.
+#             Si no está disponible se usa el backend en memoria como sustituto
+
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, Optional, Set
+
+try:
+    from flask import request, session, current_app
+except ImportError:
+    request = None
+    session = None
+    current_app = None
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+try:
+    from config.api_config import get_api_config
+    _config = get_api_config()
+except ImportError:
+    _config = None
+
+_SIN_VALOR = object()
+
+
+class CacheLocal:
+    """Caché LRU en memoria con expiración por entrada (thread-safe)"""
+
+    def __init__(self, max_entradas: int = 1000):
+        self.max_entradas = max_entradas
+        self._datos: 'OrderedDict[str, tuple]' = OrderedDict()
+        # Los contadores de versión no se desalojan por LRU: perder uno
+        # haría visibles de nuevo entradas ya invalidadas
+        self._contadores: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def obtener(self, clave: str) -> Any:
+        with self._lock:
+            item = self._datos.get(clave)
+            if item is None:
+                return None
+            valor, expira = item
+            if expira is not None and expira <= time.monotonic():
+                del self._datos[clave]
+                return None
+            self._datos.move_to_end(clave)
+            return valor
+
+    def guardar(self, clave: str, valor: Any, timeout: Optional[float] = None):
+        expira = time.monotonic() + timeout if timeout else None
+        with self._lock:
+            self._datos[clave] = (valor, expira)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def contador(self, clave: str) -> int:
+        with self._lock:
+            return self._contadores.get(clave, 0)
+
+    def incrementar(self, clave: str) -> int:
+        with self._lock:
+            self._contadores[clave] = self._contadores.get(clave, 0) + 1
+            return self._contadores[clave]
+
+    def limpiar(self, prefijo: str = ''):
+        with self._lock:
+            for clave in [c for c in self._datos if c.startswith(prefijo)]:
+                del self._datos[clave]
+
+    def entradas(self) -> int:
+        return len(self._datos)
+
+
+class CacheRedis:
+    """Caché compartida entre workers sobre Redis"""
+
+    def __init__(self, url: str):
+        self._cliente = redis.Redis.from_url(url, socket_timeout=1)
+        self._cliente.ping()
+
+    def obtener(self, clave: str) -> Any:
+        valor = self._cliente.get(clave)
+        return pickle.loads(valor) if valor is not None else None
+
+    def guardar(self, clave: str, valor: Any, timeout: Optional[float] = None):
+        self._cliente.set(clave, pickle.dumps(valor), ex=int(timeout) if timeout else None)
+
+    def contador(self, clave: str) -> int:
+        valor = self._cliente.get(clave)
+        return int(valor) if valor is not None else 0
+
+    def incrementar(self, clave: str) -> int:
+        return self._cliente.incr(clave)
+
+    def limpiar(self, prefijo: str = ''):
+        claves = list(self._cliente.scan_iter(match=f"{prefijo}*", count=500))
+        if claves:
+            self._cliente.delete(*claves)
+
+    def entradas(self) -> Optional[int]:
+        return None
+
+
+class CacheAPI:
+    """
+    Caché por espacios con invalidación explícita
+
+    Los errores del backend nunca interrumpen la petición: una lectura
+    fallida cuenta como fallo de caché y una escritura fallida se ignora.
+    """
+
+    def __init__(self, habilitado: bool = True, tipo: str = 'simple',
+            timeout: float = 300, prefijo: str = 'gil_api_',
+            max_entradas: int = 1000, redis_url: Optional[str] = None):
+        self.habilitado = habilitado
+        self.timeout = timeout
+        self.prefijo = prefijo
+        self.tipo = 'simple'
+        self.aciertos = 0
+        self.fallos = 0
+        self._lock_contadores = threading.Lock()
+        self.backend = CacheLocal(max_entradas)
+        # tabla -> espacios que dependen de ella (ver vincular_tablas)
+        self._espacios_por_tabla: Dict[str, Set[str]] = {}
+
+        if habilitado and tipo == 'redis':
+            if redis is None:
+                print("⚠️ Caché: paquete redis no instalado, usando caché en memoria")
+            else:
+                try:
+                    self.backend = CacheRedis(redis_url)
+                    self.tipo = 'redis'
+                except Exception as e:
+                    print(f"⚠️ Caché: Redis no disponible ({e}), usando caché en memoria")
+
+    def _version(self, espacio: str) -> int:
+        try:
+            return self.backend.contador(f"{self.prefijo}version:{espacio}")
+        except Exception as e:
+            print(f"Error leyendo versión de caché {espacio}: {e}")
+            return -1
+
+    def _clave(self, espacio: str, version: int, subclave: str) -> str:
+        return f"{self.prefijo}{espacio}:v{version}:{subclave}"
+
+    def obtener_o_calcular(self, espacio: str, subclave: str, funcion: Callable[[], Any],
+            timeout: Optional[float] = None) -> Any:
+        """
+        Devuelve el valor en caché o lo calcula y lo guarda
+
+        Args:
+            espacio: Espacio de invalidación
+            subclave: Identifica el valor dentro del espacio
+            funcion: Calcula el valor si no está en caché
+            timeout: Segundos de vida (por defecto CACHE_DEFAULT_TIMEOUT)
+        """
+        if not self.habilitado:
+            return funcion()
+
+        # La versión se lee antes de calcular: si el espacio se invalida
+        # mientras tanto, el valor queda guardado bajo la versión anterior
+        version = self._version(espacio)
+        if version < 0:
+            return funcion()
+        clave = self._clave(espacio, version, subclave)
+
+        valor = _SIN_VALOR
+        try:
+            guardado = self.backend.obtener(clave)
+            if guardado is not None:
+                valor = guardado
+        except Exception as e:
+            print(f"Error leyendo caché {clave}: {e}")
+
+        if valor is not _SIN_VALOR:
+            with self._lock_contadores:
+                self.aciertos += 1
+            return valor
+
+        with self._lock_contadores:
+            self.fallos += 1
+        valor = funcion()
+        if valor is not None:
+            try:
+                self.backend.guardar(clave, valor, timeout or self.timeout)
+            except Exception as e:
+                print(f"Error guardando caché {clave}: {e}")
+        return valor
+
+    def invalidar(self, *espacios: str):
+        """Descarta todas las entradas de los espacios indicados"""
+        for espacio in espacios:
+            try:
+                self.backend.incrementar(f"{self.prefijo}version:{espacio}")
+            except Exception as e:
+                print(f"Error invalidando caché {espacio}: {e}")
+
+    def vincular_tablas(self, espacio: str, *tablas: str):
+        """
+        Invalida `espacio` automáticamente cuando DatabaseManager escribe
+        (INSERT, UPDATE, DELETE) en alguna de las tablas indicadas
+        """
+        for tabla in tablas:
+            self._espacios_por_tabla.setdefault(tabla.lower(), set()).add(espacio)
+
+    def invalidar_tablas(self, tablas: Iterable[str]):
+        """Invalida los espacios vinculados a las tablas modificadas"""
+        if not self._espacios_por_tabla:
+            return
+        espacios = set()
+        for tabla in tablas:
+            espacios.update(self._espacios_por_tabla.get(tabla.lower(), ()))
+        if espacios:
+            self.invalidar(*espacios)
+
+    def limpiar(self):
+        """Descarta todas las entradas de la caché"""
+        try:
+            self.backend.limpiar(self.prefijo)
+        except Exception as e:
+            print(f"Error limpiando caché: {e}")
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock_contadores:
+            aciertos, fallos = self.aciertos, self.fallos
+        total = aciertos + fallos
+        return {
+            'habilitado': self.habilitado,
+            'tipo': self.tipo,
+            'timeout': self.timeout,
+            'entradas': self.backend.entradas(),
+            'aciertos': aciertos,
+            'fallos': fallos,
+            'tasa_aciertos': round(aciertos / total, 3) if total else None
+        }
+
+
+cache_api = CacheAPI(
+    habilitado=getattr(_config, 'CACHE_ENABLED', True),
+    tipo=getattr(_config, 'CACHE_TYPE', 'simple'),
+    timeout=getattr(_config, 'CACHE_DEFAULT_TIMEOUT', 300),
+    prefijo=getattr(_config, 'CACHE_KEY_PREFIX', 'gil_api_'),
+    max_entradas=getattr(_config, 'CACHE_MAX_ENTRIES', 1000),
+    redis_url=getattr(_config, 'CACHE_REDIS_URL', None)
+)
+
+
+def cachear_respuesta(espacio: str, timeout: Optional[float] = None, por_usuario: bool = False):
+    """
+    Decorador para endpoints GET: guarda las respuestas 200 en caché
+
+    La clave incluye la ruta y el query string; con `por_usuario` también
+    el usuario de la sesión. Debe ir después de los decoradores de
+    autenticación para que estos se evalúen en cada petición. Si alguna
+    consulta falló mientras se generaba la respuesta (ejecutar_query la
+    devuelve vacía), la respuesta se entrega pero no se guarda.
+
+    Args:
+        espacio: Espacio vinculado a sus tablas con cache_api.vincular_tablas
+        timeout: Segundos de vida (por defecto CACHE_DEFAULT_TIMEOUT)
+        por_usuario: Separar entradas por usuario
+    """
+    def decorador(f):
+        @wraps(f)
+        def envoltura(*args, **kwargs):
+            if not cache_api.habilitado or request.method != 'GET':
+                return f(*args, **kwargs)
+
+            subclave = request.full_path
+            if por_usuario:
+                subclave = f"u{session.get('user_id')}:{subclave}"
+
+            estado_cache = []
+
+            def calcular():
+                # Import diferido: database importa este módulo
+                from .database import errores_consulta_request
+                estado_cache.append('MISS')
+                errores_previos = errores_consulta_request()
+                respuesta = current_app.make_response(f(*args, **kwargs))
+                if (respuesta.status_code != 200 or respuesta.direct_passthrough
+                        or errores_consulta_request() > errores_previos):
+                    estado_cache.append(respuesta)
+                    return None
+                return (respuesta.get_data(), respuesta.mimetype)
+
+            guardado = cache_api.obtener_o_calcular(espacio, subclave, calcular, timeout)
+            if guardado is None:
+                # No cacheable: se devuelve la respuesta original
+                return estado_cache[-1]
+
+            cuerpo, mimetype = guardado
+            respuesta = current_app.response_class(cuerpo, status=200, mimetype=mimetype)
+            respuesta.headers['X-Cache'] = estado_cache[0] if estado_cache else 'HIT'
+            return respuesta
+        return envoltura
+    return decorador
+
@@ -3,12 +3,29 @@
 # Integrado con configuración centralizada
 
 import mysql.connector
-from mysql.connector import Error, pooling
-from typing import List, Dict, Optional, Any
+from mysql.connector import Error, errors
+from typing import List, Dict, Optional, Any, Iterator
 from contextlib import contextmanager
+from queue import Queue, Empty
+import itertools
+import re
+import threading
+import time
 import sys
 import os
 
+from .metricas_sql import monitor_sql
+from .cache import cache_api
+
+try:
+    from flask import g, has_request_context
+except ImportError:
+    # Permite usar DatabaseManager en scripts sin Flask
+    g = None
+    
+    def has_request_context():
+        return False
+
 # Agregar path para importar config
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
@@ -25,12 +42,424 @@ except ImportError:
         DB_CHARSET = os.getenv('DB_CHARSET', 'utf8mb4')
         DB_POOL_NAME = 'gil_pool'
         DB_POOL_SIZE = 5
+        DB_POOL_TIMEOUT = 10
+        DB_POOL_MAX_LIFETIME = 1800
+        DB_POOL_PING_INTERVAL = 30
+
+
+class _ConexionPool:
+    """Conexión del pool con sus marcas de tiempo"""
+    
+    __slots__ = ('conn', 'creada', 'ultimo_uso')
+    
+    def __init__(self, conn):
+        self.conn = conn
+        self.creada = time.monotonic()
+        self.ultimo_uso = self.creada
+
+
+class PoolConexiones:
+    """
+    Pool de conexiones MySQL compartido y thread-safe.
+    
+    Las conexiones se crean bajo demanda hasta `tamano`, se reciclan al
+    superar `vida_maxima` segundos y se verifican con ping solo cuando
+    llevan más de `intervalo_ping` segundos inactivas.
+    """
+    
+    def __init__(self, config: Dict, tamano: int, timeout: float = 10,
+            vida_maxima: int = 1800, intervalo_ping: int = 30):
+        self.config = config
+        self.tamano = max(1, int(tamano))
+        self.timeout = timeout
+        self.vida_maxima = vida_maxima
+        self.intervalo_ping = intervalo_ping
+        
+        self._libres = Queue()
+        self._en_uso = {}
+        self._total = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            'creadas': 0,
+            'recicladas': 0,
+            'descartadas': 0,
+            'pings': 0,
+            'solicitudes': 0,
+            'timeouts': 0,
+            'espera_total_ms': 0.0,
+            'espera_max_ms': 0.0
+        }
+    
+    def _crear(self) -> _ConexionPool:
+        """Abre una conexión nueva en modo autocommit"""
+        conn = mysql.connector.connect(**self.config)
+        # autocommit: cada SELECT ve los cambios más recientes de otros workers
+        conn.autocommit = True
+        with self._lock:
+            self._stats['creadas'] += 1
+        return _ConexionPool(conn)
+    
+    def _cerrar(self, item: _ConexionPool):
+        """Cierra una conexión sin propagar errores"""
+        try:
+            item.conn.close()
+        except Exception:
+            pass
+    
+    def _es_valida(self, item: _ConexionPool) -> bool:
+        """Verifica vida máxima y salud de una conexión libre"""
+        ahora = time.monotonic()
+        if self.vida_maxima and ahora - item.creada > self.vida_maxima:
+            with self._lock:
+                self._stats['recicladas'] += 1
+            return False
+        if ahora - item.ultimo_uso > self.intervalo_ping:
+            with self._lock:
+                self._stats['pings'] += 1
+            try:
+                item.conn.ping(reconnect=False)
+            except Error:
+                with self._lock:
+                    self._stats['descartadas'] += 1
+                return False
+        return True
+    
+    def obtener(self, timeout: Optional[float] = None):
+        """
+        Obtiene una conexión del pool
+        
+        Args:
+            timeout: Segundos máximos de espera si el pool está agotado
+            
+        Returns:
+            Conexión MySQL lista para usar
+            
+        Raises:
+            PoolError: Si no hay conexión disponible dentro del timeout
+        """
+        timeout = self.timeout if timeout is None else timeout
+        inicio = time.monotonic()
+        limite = inicio + timeout
+        
+        while True:
+            nueva = False
+            try:
+                item = self._libres.get_nowait()
+            except Empty:
+                crear = False
+                with self._lock:
+                    if self._total < self.tamano:
+                        self._total += 1
+                        crear = True
+                if crear:
+                    try:
+                        item = self._crear()
+                        nueva = True
+                    except Exception:
+                        with self._lock:
+                            self._total -= 1
+                        raise
+                else:
+                    restante = limite - time.monotonic()
+                    try:
+                        if restante <= 0:
+                            raise Empty
+                        item = self._libres.get(timeout=restante)
+                    except Empty:
+                        with self._lock:
+                            self._stats['timeouts'] += 1
+                        raise errors.PoolError(
+                            f"Pool agotado: sin conexiones libres tras {timeout}s "
+                            f"({self.tamano} en uso)"
+                        )
+            
+            if not nueva and not self._es_valida(item):
+                self._cerrar(item)
+                with self._lock:
+                    self._total -= 1
+                continue
+            
+            espera_ms = (time.monotonic() - inicio) * 1000
+            with self._lock:
+                self._en_uso[id(item.conn)] = item
+                self._stats['solicitudes'] += 1
+                self._stats['espera_total_ms'] += espera_ms
+                self._stats['espera_max_ms'] = max(self._stats['espera_max_ms'], espera_ms)
+            return item.conn
+    
+    def devolver(self, conn, descartar: bool = False):
+        """
+        Devuelve una conexión al pool
+        
+        Args:
+            conn: Conexión obtenida con obtener()
+            descartar: Si True, la conexión se cierra en lugar de reutilizarse
+        """
+        with self._lock:
+            item = self._en_uso.pop(id(conn), None)
+        if item is None:
+            return
+        
+        if not descartar:
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+                if not conn.autocommit:
+                    conn.autocommit = True
+            except Error:
+                descartar = True
+        
+        if descartar:
+            self._cerrar(item)
+            with self._lock:
+                self._total -= 1
+                self._stats['descartadas'] += 1
+            return
+        
+        item.ultimo_uso = time.monotonic()
+        self._libres.put(item)
+    
+    @contextmanager
+    def conexion(self, timeout: Optional[float] = None):
+        """Context manager que obtiene y devuelve una conexión"""
+        conn = self.obtener(timeout)
+        descartar = False
+        try:
+            yield conn
+        except (errors.OperationalError, errors.InterfaceError):
+            # La conexión quedó en estado desconocido: no reutilizarla
+            descartar = True
+            raise
+        finally:
+            self.devolver(conn, descartar=descartar)
+    
+    def estadisticas(self) -> Dict[str, Any]:
+        """Retorna métricas del pool para monitoreo"""
+        with self._lock:
+            stats = dict(self._stats)
+            en_uso = len(self._en_uso)
+            total = self._total
+        solicitudes = stats['solicitudes']
+        stats['espera_promedio_ms'] = round(stats['espera_total_ms'] / solicitudes, 3) if solicitudes else 0.0
+        stats['espera_total_ms'] = round(stats['espera_total_ms'], 3)
+        stats['espera_max_ms'] = round(stats['espera_max_ms'], 3)
+        stats.update({
+            'tamano': self.tamano,
+            'abiertas': total,
+            'en_uso': en_uso,
+            'libres': total - en_uso
+        })
+        return stats
+    
+    def cerrar(self):
+        """Cierra todas las conexiones libres del pool"""
+        while True:
+            try:
+                item = self._libres.get_nowait()
+            except Empty:
+                break
+            self._cerrar(item)
+            with self._lock:
+                self._total -= 1
+
+
+# Nombres únicos para savepoints anidados
+_contador_savepoints = itertools.count(1)
+
+# Conexión de la transacción abierta en cada hilo (uso fuera de requests Flask)
+_transacciones_hilo = threading.local()
+
+
+def _sentencias_insercion(tabla: str, filas: List[Dict], chunk: int = 500,
+        on_duplicate: Any = None) -> Iterator[tuple]:
+    """
+    Genera sentencias INSERT multi-fila (una por bloque de `chunk` filas)
+    
+    Todas las filas deben tener las mismas columnas que la primera.
+    on_duplicate admite una lista de columnas (col = VALUES(col)) o un
+    diccionario {columna: expresión SQL} para ON DUPLICATE KEY UPDATE.
+    
+    Yields:
+        Tuplas (query, params, número de filas del bloque)
+    """
+    if not filas:
+        return
+    columnas = list(filas[0].keys())
+    fila_placeholders = '(' + ', '.join(['%s'] * len(columnas)) + ')'
+    
+    sufijo = ''
+    if on_duplicate:
+        if isinstance(on_duplicate, dict):
+            asignaciones = [f"{col} = {expr}" for col, expr in on_duplicate.items()]
+        else:
+            asignaciones = [f"{col} = VALUES({col})" for col in on_duplicate]
+        sufijo = ' ON DUPLICATE KEY UPDATE ' + ', '.join(asignaciones)
+    
+    chunk = max(1, int(chunk))
+    for inicio in range(0, len(filas), chunk):
+        bloque = filas[inicio:inicio + chunk]
+        params = []
+        for fila in bloque:
+            if len(fila) != len(columnas) or any(col not in fila for col in columnas):
+                raise ValueError(f"Todas las filas para {tabla} deben tener las columnas {columnas}")
+            params.extend(fila[col] for col in columnas)
+        query = (f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES "
+                 + ', '.join([fila_placeholders] * len(bloque)) + sufijo)
+        yield query, tuple(params), len(bloque)
+
+
+_RE_TABLA_ESCRITURA = re.compile(
+    r'^\s*(?:INSERT(?:\s+IGNORE)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+IGNORE)?|DELETE\s+FROM)\s+`?(\w+)`?',
+    re.IGNORECASE
+)
+
+
+def tabla_modificada(query: str) -> Optional[str]:
+    """Tabla destino de un INSERT, REPLACE, UPDATE o DELETE (None si no lo es)"""
+    coincidencia = _RE_TABLA_ESCRITURA.match(query)
+    return coincidencia.group(1) if coincidencia else None
+
+
+class Transaccion:
+    """
+    Unidad de trabajo sobre una única conexión.
+    
+    Se obtiene con DatabaseManager.transaccion(); todas las sentencias
+    comparten conexión (lastrowid incluido) y se confirman con un solo
+    COMMIT al salir del bloque. A diferencia de DatabaseManager, los errores
+    se propagan para que el bloque completo se revierta.
+    """
+    
+    def __init__(self, conn):
+        self.conn = conn
+        self.lastrowid = None
+        self.rowcount = 0
+        # Se notifican a la caché al confirmar, no antes: otro request podría
+        # volver a cachear los datos previos al COMMIT
+        self.tablas_modificadas = set()
+    
+    def _registrar_escritura(self, query: str):
+        tabla = tabla_modificada(query)
+        if tabla:
+            self.tablas_modificadas.add(tabla)
+    
+    def ejecutar(self, query: str, params: Optional[tuple] = None) -> int:
+        """
+        Ejecuta un comando INSERT, UPDATE o DELETE
+        
+        Returns:
+            Número de filas afectadas (lastrowid queda en self.lastrowid)
+        """
+        cursor = self.conn.cursor()
+        inicio = time.perf_counter()
+        try:
+            cursor.execute(query, params or None)
+            self.lastrowid = cursor.lastrowid
+            self.rowcount = cursor.rowcount
+        finally:
+            cursor.close()
+        monitor_sql.registrar(query, time.perf_counter() - inicio, self.rowcount)
+        self._registrar_escritura(query)
+        return self.rowcount
+    
+    def ejecutar_muchos(self, query: str, params_list: List[tuple]) -> int:
+        """
+        Ejecuta un comando con múltiples juegos de parámetros (executemany)
+        
+        Returns:
+            Número de filas afectadas
+        """
+        if not params_list:
+            return 0
+        cursor = self.conn.cursor()
+        inicio = time.perf_counter()
+        try:
+            cursor.executemany(query, params_list)
+            self.lastrowid = cursor.lastrowid
+            self.rowcount = cursor.rowcount
+        finally:
+            cursor.close()
+        monitor_sql.registrar(query, time.perf_counter() - inicio, self.rowcount)
+        self._registrar_escritura(query)
+        return self.rowcount
+    
+    def consultar(self, query: str, params: Optional[tuple] = None,
+            dictionary: bool = True) -> List[Dict]:
+        """Ejecuta una consulta SELECT dentro de la transacción"""
+        cursor = self.conn.cursor(dictionary=dictionary)
+        inicio = time.perf_counter()
+        try:
+            cursor.execute(query, params or None)
+            resultados = cursor.fetchall() if cursor.with_rows else []
+        finally:
+            cursor.close()
+        monitor_sql.registrar(query, time.perf_counter() - inicio, len(resultados))
+        return resultados
+    
+    def obtener_uno(self, query: str, params: Optional[tuple] = None) -> Optional[Dict]:
+        """Ejecuta una consulta y retorna un solo resultado"""
+        resultados = self.consultar(query, params)
+        return resultados[0] if resultados else None
+    
+    def insertar(self, tabla: str, datos: Dict) -> Optional[int]:
+        """
+        Inserta un registro y retorna su ID (misma conexión, sin LAST_INSERT_ID aparte)
+        """
+        columnas = ', '.join(datos.keys())
+        placeholders = ', '.join(['%s'] * len(datos))
+        self.ejecutar(f"INSERT INTO {tabla} ({columnas}) VALUES ({placeholders})",
+                      tuple(datos.values()))
+        return self.lastrowid
+    
+    def insertar_muchos(self, tabla: str, filas: List[Dict], chunk: int = 500,
+            on_duplicate: Any = None) -> List[int]:
+        """
+        Inserta varias filas con INSERT multi-fila por bloques
+        
+        Returns:
+            IDs generados (vacío si se usa on_duplicate)
+        """
+        ids = []
+        for query, params, n in _sentencias_insercion(tabla, filas, chunk, on_duplicate):
+            self.ejecutar(query, params)
+            if not on_duplicate and self.lastrowid:
+                ids.extend(range(self.lastrowid, self.lastrowid + n))
+        return ids
+    
+    def actualizar(self, tabla: str, datos: Dict, condicion: str,
+            params_condicion: Optional[tuple] = None) -> int:
+        """Actualiza registros y retorna el número de filas afectadas"""
+        set_clause = ', '.join([f"{k} = %s" for k in datos.keys()])
+        params = list(datos.values())
+        if params_condicion:
+            params.extend(params_condicion)
+        return self.ejecutar(f"UPDATE {tabla} SET {set_clause} WHERE {condicion}", tuple(params))
+    
+    @contextmanager
+    def savepoint(self, nombre: Optional[str] = None):
+        """
+        Punto de guardado: si el bloque falla se revierte solo su trabajo
+        y la excepción se propaga; el resto de la transacción continúa.
+        """
+        nombre = nombre or f"sp_{next(_contador_savepoints)}"
+        if not nombre.replace('_', '').isalnum():
+            raise ValueError(f"Nombre de savepoint inválido: {nombre}")
+        self.ejecutar(f"SAVEPOINT {nombre}")
+        try:
+            yield self
+        except Exception:
+            self.ejecutar(f"ROLLBACK TO SAVEPOINT {nombre}")
+            raise
+        else:
+            self.ejecutar(f"RELEASE SAVEPOINT {nombre}")
 
 
 class DatabaseManager:
     """Gestor de conexiones y operaciones de base de datos"""
     
-    _pool = None  # Pool de conexiones compartido
+    _pool = None  # Pool de conexiones compartido (configuración por defecto)
+    _pools = {}  # Pools adicionales por configuración personalizada
+    _pool_lock = threading.Lock()
     
     def __init__(self, config: Optional[Dict] = None):
         """
@@ -39,6 +468,7 @@ class DatabaseManager:
         Args:
             config: Diccionario con configuración de conexión (opcional, usa Config por defecto)
         """
+        self.usa_config_defecto = config is None
         if config is None:
             config = {
                 'host': Config.DB_HOST,
@@ -55,41 +485,135 @@ class DatabaseManager:
         self.connection = None
         self.use_pool = True
     
+    @classmethod
+    def _crear_pool(cls, config: Dict) -> PoolConexiones:
+        """Crea un pool con los parámetros de Config"""
+        return PoolConexiones(
+            config,
+            tamano=getattr(Config, 'DB_POOL_SIZE', 5),
+            timeout=getattr(Config, 'DB_POOL_TIMEOUT', 10),
+            vida_maxima=getattr(Config, 'DB_POOL_MAX_LIFETIME', 1800),
+            intervalo_ping=getattr(Config, 'DB_POOL_PING_INTERVAL', 30)
+        )
+    
+    def obtener_pool(self) -> PoolConexiones:
+        """
+        Obtiene (o crea) el pool compartido para la configuración de esta instancia
+        
+        Returns:
+            PoolConexiones compartido entre todas las instancias equivalentes
+        """
+        if self.usa_config_defecto:
+            if DatabaseManager._pool is None:
+                with DatabaseManager._pool_lock:
+                    if DatabaseManager._pool is None:
+                        DatabaseManager._pool = self._crear_pool(self.config)
+            return DatabaseManager._pool
+        
+        clave = tuple(sorted((k, str(v)) for k, v in self.config.items()))
+        pool = DatabaseManager._pools.get(clave)
+        if pool is None:
+            with DatabaseManager._pool_lock:
+                pool = DatabaseManager._pools.get(clave)
+                if pool is None:
+                    pool = self._crear_pool(self.config)
+                    DatabaseManager._pools[clave] = pool
+        return pool
+    
+    @classmethod
+    def estadisticas_pool(cls) -> Dict[str, Any]:
+        """
+        Retorna las métricas del pool compartido para monitoreo
+        
+        Returns:
+            Diccionario con conexiones abiertas, en uso, esperas, reciclajes, etc.
+        """
+        if cls._pool is None:
+            return {'activo': False}
+        stats = cls._pool.estadisticas()
+        stats['activo'] = True
+        stats['nombre'] = getattr(Config, 'DB_POOL_NAME', 'gil_pool')
+        return stats
+    
+    @contextmanager
+    def _conexion(self):
+        """
+        Conexión para una operación.
+        
+        Prioridad: transacción manual activa, conexión del request Flask
+        actual (compartida por todas las consultas del request) y, fuera de
+        un request, una conexión del pool devuelta al terminar.
+        """
+        if self.connection is not None:
+            yield self.connection
+            return
+        
+        pool = self.obtener_pool()
+        if not has_request_context():
+            # Dentro de transaccion() fuera de Flask: reutilizar la conexión del hilo
+            conn = getattr(_transacciones_hilo, 'conexiones', {}).get(id(pool))
+            if conn is not None:
+                yield conn
+                return
+            with pool.conexion() as conn:
+                yield conn
+            return
+        
+        conn = self._conexion_request(pool)
+        try:
+            yield conn
+        except (errors.OperationalError, errors.InterfaceError):
+            # Conexión rota: descartarla para que el resto del request use otra
+            self._descartar_conexion_request(pool, conn)
+            raise
+    
+    @staticmethod
+    def _conexion_request(pool):
+        """Conexión del request Flask actual (la toma del pool en el primer uso)"""
+        conexiones = g.setdefault('_gil_db_conexiones', {})
+        conn = conexiones.get(id(pool), (None, None))[1]
+        if conn is None:
+            conn = pool.obtener()
+            conexiones[id(pool)] = (pool, conn)
+        return conn
+    
+    @staticmethod
+    def _descartar_conexion_request(pool, conn):
+        """Cierra la conexión del request; la siguiente consulta toma otra del pool"""
+        g.get('_gil_db_conexiones', {}).pop(id(pool), None)
+        pool.devolver(conn, descartar=True)
+    
     def conectar(self) -> bool:
         """
-        Establece conexión con la base de datos
+        Verifica que se pueda obtener una conexión del pool
         
         Returns:
             True si la conexión fue exitosa
         """
         try:
-            self.connection = mysql.connector.connect(**self.config)
-            if self.connection.is_connected():
-                return True
-            return False
+            with self.obtener_pool().conexion() as conn:
+                return conn.is_connected()
         except Error as e:
             print(f"Error conectando a la base de datos: {e}")
             return False
     
     def desconectar(self):
-        """Cierra la conexión a la base de datos"""
-        if self.connection and self.connection.is_connected():
-            self.connection.close()
+        """Devuelve al pool la conexión reservada por iniciar_transaccion/get_connection"""
+        if self.connection is not None:
+            self.obtener_pool().devolver(self.connection)
+            self.connection = None
     
     def get_connection(self):
         """
-        Obtiene una conexión a la base de datos
+        Reserva una conexión del pool para uso manual (transacciones)
+        
+        La conexión queda asociada a la instancia hasta llamar a desconectar().
         
         Returns:
             Objeto de conexión MySQL
         """
-        if not self.connection or not self.connection.is_connected():
-            self.conectar()
-        # Refrescar conexión para evitar caché de datos
-        try:
-            self.connection.ping(reconnect=True, attempts=3, delay=1)
-        except:
-            self.conectar()
+        if self.connection is None:
+            self.connection = self.obtener_pool().obtener()
         return self.connection
     
     def ejecutar_query(self, query: str, params: Optional[tuple] = None, 
@@ -106,26 +630,93 @@ class DatabaseManager:
             Lista de resultados
         """
         try:
-            # Crear nueva conexión para cada query para evitar caché
-            conn = mysql.connector.connect(**self.config)
-            conn.autocommit = True  # Asegurar que vea los cambios más recientes
-            cursor = conn.cursor(dictionary=dictionary)
-            
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-            
-            resultados = cursor.fetchall()
-            cursor.close()
-            conn.close()  # Cerrar conexión después de cada query
+            with self._conexion() as conn:
+                cursor = conn.cursor(dictionary=dictionary)
+                inicio = time.perf_counter()
+                try:
+                    if params:
+                        cursor.execute(query, params)
+                    else:
+                        cursor.execute(query)
+                    
+                    resultados = cursor.fetchall() if cursor.with_rows else []
+                finally:
+                    cursor.close()
             
+            monitor_sql.registrar(query, time.perf_counter() - inicio, len(resultados))
             return resultados
             
         except Error as e:
             print(f"Error ejecutando query: {e}")
+            _registrar_error_consulta()
             return []
     
+    def iterar_query(self, query: str, params: Optional[tuple] = None, chunk: int = 1000,
+            dictionary: bool = True, por_bloques: bool = False) -> Iterator:
+        """
+        Recorre el resultado de un SELECT sin materializarlo en memoria
+        
+        Usa un cursor sin buffer (el servidor envía las filas a medida que se
+        leen). Dentro de un request Flask usa la conexión del request, de modo
+        que varias exportaciones simultáneas no agotan el pool; mientras el
+        generador no se agote, esa conexión no admite otras consultas, así
+        que no se debe consultar la base de datos dentro del recorrido. En
+        otro caso usa una conexión dedicada del pool que se libera al agotar
+        o cerrar el generador. A diferencia de ejecutar_query, los errores se
+        propagan para no entregar exportaciones truncadas en silencio.
+        
+        Args:
+            query: Consulta SQL
+            params: Parámetros de la consulta
+            chunk: Filas leídas por cada viaje al servidor
+            dictionary: Si True, retorna diccionarios en lugar de tuplas
+            por_bloques: Si True, produce listas de hasta `chunk` filas
+            
+        Yields:
+            Filas individuales o bloques de filas
+        """
+        pool = self.obtener_pool()
+        del_request = self.connection is None and has_request_context()
+        conn = self._conexion_request(pool) if del_request else pool.obtener()
+        agotado = False
+        descartar = False
+        cursor = None
+        # Solo cuenta el tiempo de servidor/red, no el del consumidor
+        duracion = 0.0
+        total_filas = 0
+        try:
+            cursor = conn.cursor(dictionary=dictionary, buffered=False)
+            inicio = time.perf_counter()
+            cursor.execute(query, params or None)
+            while True:
+                filas = cursor.fetchmany(chunk)
+                duracion += time.perf_counter() - inicio
+                if not filas:
+                    agotado = True
+                    break
+                total_filas += len(filas)
+                if por_bloques:
+                    yield filas
+                else:
+                    yield from filas
+                inicio = time.perf_counter()
+        except Error as e:
+            print(f"Error iterando query: {e}")
+            descartar = True
+            raise
+        finally:
+            if not agotado:
+                # Cerrar con filas pendientes obligaría a leer el resto del
+                # resultado: es más barato descartar la conexión
+                descartar = True
+            elif cursor is not None:
+                cursor.close()
+            if not del_request:
+                pool.devolver(conn, descartar=descartar)
+            elif descartar:
+                self._descartar_conexion_request(pool, conn)
+            monitor_sql.registrar(query, duracion, total_filas)
+    
     def ejecutar_comando(self, query: str, params: Optional[tuple] = None) -> bool:
         """
         Ejecuta un comando INSERT, UPDATE o DELETE
@@ -138,26 +729,24 @@ class DatabaseManager:
             True si el comando fue exitoso
         """
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-            
-            conn.commit()
-            cursor.close()
-            
-            # Forzar refresco de la conexión para ver cambios inmediatamente
-            conn.commit()
+            with self._conexion() as conn:
+                cursor = conn.cursor()
+                inicio = time.perf_counter()
+                try:
+                    if params:
+                        cursor.execute(query, params)
+                    else:
+                        cursor.execute(query)
+                    filas = cursor.rowcount
+                finally:
+                    cursor.close()
             
+            monitor_sql.registrar(query, time.perf_counter() - inicio, filas)
+            cache_api.invalidar_tablas([tabla_modificada(query) or ''])
             return True
             
         except Error as e:
             print(f"Error ejecutando comando: {e}")
-            if self.connection:
-                self.connection.rollback()
             return False
     
     def ejecutar_muchos(self, query: str, params_list: List[tuple]) -> bool:
@@ -172,19 +761,29 @@ class DatabaseManager:
             True si todos los comandos fueron exitosos
         """
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.executemany(query, params_list)
-            conn.commit()
-            cursor.close()
+            with self._conexion() as conn:
+                en_transaccion_manual = conn.in_transaction
+                if not en_transaccion_manual:
+                    conn.start_transaction()
+                cursor = conn.cursor()
+                inicio = time.perf_counter()
+                try:
+                    cursor.executemany(query, params_list)
+                    if not en_transaccion_manual:
+                        conn.commit()
+                    monitor_sql.registrar(query, time.perf_counter() - inicio, cursor.rowcount)
+                except Error:
+                    if not en_transaccion_manual:
+                        conn.rollback()
+                    raise
+                finally:
+                    cursor.close()
             
+            cache_api.invalidar_tablas([tabla_modificada(query) or ''])
             return True
             
         except Error as e:
             print(f"Error ejecutando múltiples comandos: {e}")
-            if self.connection:
-                self.connection.rollback()
             return False
     
     def obtener_uno(self, query: str, params: Optional[tuple] = None) -> Optional[Dict]:
@@ -201,6 +800,65 @@ class DatabaseManager:
         resultados = self.ejecutar_query(query, params)
         return resultados[0] if resultados else None
     
+    def ejecutar_lote(self, consultas: List[Any], dictionary: bool = True) -> List[List[Dict]]:
+        """
+        Ejecuta varias consultas SELECT independientes en un solo viaje al servidor
+        
+        Las sentencias se envían juntas como multi-statement y se leen los
+        conjuntos de resultados en orden. Si el envío conjunto falla, cada
+        consulta se ejecuta por separado sobre la misma conexión del request.
+        
+        Args:
+            consultas: Lista de consultas SQL o tuplas (consulta, params)
+            dictionary: Si True, retorna diccionarios en lugar de tuplas
+            
+        Returns:
+            Lista con los resultados de cada consulta, en el mismo orden
+        """
+        normalizadas = []
+        for consulta in consultas:
+            if isinstance(consulta, str):
+                normalizadas.append((consulta, None))
+            else:
+                normalizadas.append((consulta[0], consulta[1] if len(consulta) > 1 else None))
+        
+        if not normalizadas:
+            return []
+        
+        sentencias = []
+        params = []
+        for query, query_params in normalizadas:
+            sentencias.append(query.strip().rstrip(';'))
+            if query_params:
+                params.extend(query_params)
+        sql = ';\n'.join(sentencias)
+        
+        # Un literal '%s' en una consulta sin parámetros desalinearía la sustitución
+        if sql.count('%s') == len(params):
+            try:
+                with self._conexion() as conn:
+                    cursor = conn.cursor(dictionary=dictionary)
+                    inicio = time.perf_counter()
+                    try:
+                        cursor.execute(sql, tuple(params) if params else None)
+                        resultados = []
+                        while True:
+                            resultados.append(cursor.fetchall() if cursor.with_rows else [])
+                            if not cursor.nextset():
+                                break
+                    finally:
+                        cursor.close()
+                
+                monitor_sql.registrar(sql, time.perf_counter() - inicio,
+                                      sum(len(r) for r in resultados))
+                if len(resultados) == len(normalizadas):
+                    return resultados
+            except Error as e:
+                print(f"Error ejecutando lote de consultas, se ejecutarán por separado: {e}")
+        
+        return [self.ejecutar_query(query, query_params, dictionary)
+                for query, query_params in normalizadas]
+    
     def existe(self, tabla: str, condicion: str, params: Optional[tuple] = None) -> bool:
         """
         Verifica si existe un registro en una tabla
@@ -253,21 +911,76 @@ class DatabaseManager:
         query = f"INSERT INTO {tabla} ({columnas}) VALUES ({placeholders})"
         
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute(query, tuple(datos.values()))
-            conn.commit()
-            
-            last_id = cursor.lastrowid
-            cursor.close()
+            with self._conexion() as conn:
+                cursor = conn.cursor()
+                inicio = time.perf_counter()
+                try:
+                    cursor.execute(query, tuple(datos.values()))
+                    last_id = cursor.lastrowid
+                finally:
+                    cursor.close()
             
+            monitor_sql.registrar(query, time.perf_counter() - inicio, 1)
+            cache_api.invalidar_tablas([tabla])
             return last_id
             
         except Error as e:
             print(f"Error insertando en {tabla}: {e}")
-            if self.connection:
-                self.connection.rollback()
+            return None
+    
+    def insertar_muchos(self, tabla: str, filas: List[Dict], chunk: int = 500,
+            on_duplicate: Any = None) -> Optional[List[int]]:
+        """
+        Inserta varias filas en una tabla con INSERT multi-fila
+        
+        Las filas se envían en bloques de `chunk` dentro de una misma
+        transacción: o se insertan todas o ninguna. MySQL asigna IDs
+        consecutivos a cada sentencia multi-fila, por lo que el ID de cada
+        fila se obtiene a partir del lastrowid de su bloque.
+        
+        Args:
+            tabla: Nombre de la tabla
+            filas: Lista de diccionarios con las mismas columnas
+            chunk: Filas por sentencia INSERT
+            on_duplicate: Columnas (lista) o {columna: expresión} para
+                ON DUPLICATE KEY UPDATE
+            
+        Returns:
+            Lista de IDs generados en el orden de `filas` (vacía con
+            on_duplicate, donde MySQL no garantiza IDs por fila) o None si
+            hubo error
+        """
+        if not filas:
+            return []
+        
+        try:
+            with self._conexion() as conn:
+                en_transaccion_manual = conn.in_transaction
+                if not en_transaccion_manual:
+                    conn.start_transaction()
+                cursor = conn.cursor()
+                ids = []
+                try:
+                    for query, params, n in _sentencias_insercion(tabla, filas, chunk, on_duplicate):
+                        inicio = time.perf_counter()
+                        cursor.execute(query, params)
+                        monitor_sql.registrar(query, time.perf_counter() - inicio, cursor.rowcount)
+                        if not on_duplicate and cursor.lastrowid:
+                            ids.extend(range(cursor.lastrowid, cursor.lastrowid + n))
+                    if not en_transaccion_manual:
+                        conn.commit()
+                except Exception:
+                    if not en_transaccion_manual:
+                        conn.rollback()
+                    raise
+                finally:
+                    cursor.close()
+            
+            cache_api.invalidar_tablas([tabla])
+            return ids
+            
+        except (Error, ValueError) as e:
+            print(f"Error insertando en lote en {tabla}: {e}")
             return None
     
     def actualizar(self, tabla: str, datos: Dict, condicion: str, 
@@ -308,20 +1021,65 @@ class DatabaseManager:
         query = f"DELETE FROM {tabla} WHERE {condicion}"
         return self.ejecutar_comando(query, params)
     
+    @contextmanager
+    def transaccion(self):
+        """
+        Unidad de trabajo: todas las sentencias del bloque usan la misma
+        conexión y se confirman con un único COMMIT
+        
+        Uso:
+            with db.transaccion() as tx:
+                prestamo_id = tx.insertar('prestamos', datos)
+                tx.ejecutar("UPDATE equipos SET estado = 'prestado' WHERE id = %s", (id_equipo,))
+        
+        Si ya hay una transacción abierta en la conexión (bloques anidados),
+        el bloque interno se ejecuta como SAVEPOINT.
+        
+        Yields:
+            Transaccion
+        """
+        with self._conexion() as conn:
+            if conn.in_transaction:
+                tx = Transaccion(conn)
+                with tx.savepoint():
+                    yield tx
+                cache_api.invalidar_tablas(tx.tablas_modificadas)
+                return
+            
+            conn.start_transaction()
+            tx = Transaccion(conn)
+            conexiones_hilo = None
+            if not has_request_context():
+                conexiones_hilo = _transacciones_hilo.__dict__.setdefault('conexiones', {})
+                conexiones_hilo[id(self.obtener_pool())] = conn
+            try:
+                yield tx
+            except BaseException:
+                conn.rollback()
+                raise
+            else:
+                conn.commit()
+                cache_api.invalidar_tablas(tx.tablas_modificadas)
+            finally:
+                if conexiones_hilo is not None:
+                    conexiones_hilo.pop(id(self.obtener_pool()), None)
+    
     def iniciar_transaccion(self):
-        """Inicia una transacción"""
+        """Inicia una transacción sobre una conexión reservada del pool"""
         conn = self.get_connection()
         conn.start_transaction()
     
     def commit(self):
-        """Confirma la transacción actual"""
+        """Confirma la transacción actual y libera la conexión"""
         if self.connection:
             self.connection.commit()
+            self.desconectar()
     
     def rollback(self):
-        """Revierte la transacción actual"""
+        """Revierte la transacción actual y libera la conexión"""
         if self.connection:
             self.connection.rollback()
+            self.desconectar()
     
     def __enter__(self):
         """Soporte para context manager"""
@@ -329,5 +1087,44 @@ class DatabaseManager:
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
-        """Cierra la conexión al salir del context manager"""
+        """Libera la conexión reservada al salir del context manager"""
         self.desconectar()
+
+
+def _registrar_error_consulta():
+    """Cuenta en el request actual una consulta fallida que se devolvió vacía"""
+    if has_request_context():
+        g._gil_db_errores = g.get('_gil_db_errores', 0) + 1
+
+
+def errores_consulta_request() -> int:
+    """
+    Consultas fallidas en el request actual
+
+    ejecutar_query devuelve [] ante un error, igual que una tabla vacía;
+    quien guarda la respuesta (p. ej. la caché de la API) compara este
+    contador antes y después para no conservar un resultado incompleto.
+    """
+    return g.get('_gil_db_errores', 0) if has_request_context() else 0
+
+
+def liberar_conexiones_request(exc=None):
+    """Devuelve al pool las conexiones usadas durante el request actual"""
+    if g is None:
+        return
+    conexiones = g.pop('_gil_db_conexiones', None)
+    if not conexiones:
+        return
+    for pool, conn in conexiones.values():
+        pool.devolver(conn)
+
+
+def registrar_sesion_request(app):
+    """
+    Habilita la conexión por request: todas las consultas de un mismo request
+    Flask comparten una conexión del pool, liberada al finalizar el request
+    
+    Args:
+        app: Aplicación Flask
+    """
+    app.teardown_request(liberar_conexiones_request)
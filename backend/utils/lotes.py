@@ -0,0 +1,139 @@
+# Agrupación de inferencias concurrentes en lotes
+# Centro Minero SENA
+#
+# Cada llamada a un modelo (Keras) tiene un costo fijo alto frente al costo
+# por imagen. Con varias tabletas escaneando a la vez, DespachadorLotes junta
+# las solicitudes que llegan dentro de unos milisegundos y hace una sola
+# llamada con todas; cada solicitud recibe su fila del resultado. El modelo
+# queda además en un único hilo, sin llamadas concurrentes desde Flask.
+
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+_CERRAR = object()
+
+
+class _Solicitud:
+    __slots__ = ('entrada', 'resultado', 'error', 'lista')
+
+    def __init__(self, entrada):
+        self.entrada = entrada
+        self.resultado = None
+        self.error = None
+        self.lista = threading.Event()
+
+
+class DespachadorLotes:
+    """
+    Ejecuta funcion_lote sobre lotes de solicitudes concurrentes
+
+    Un hilo toma la primera solicitud en espera, reúne las que lleguen
+    durante espera_ms (hasta max_lote) y llama funcion_lote con todas
+    apiladas. Mientras se ejecuta un lote, las nuevas solicitudes se
+    acumulan para el siguiente.
+
+    Uso:
+        despachador = DespachadorLotes(modelo.predict_on_batch, max_lote=16, espera_ms=5)
+        prediccion = despachador.predecir(imagen)  # fila de salida de esa imagen
+    """
+
+    def __init__(self, funcion_lote: Callable[[np.ndarray], Any], max_lote: int = 16,
+            espera_ms: float = 5, nombre: str = 'despachador-lotes'):
+        self.funcion_lote = funcion_lote
+        self.max_lote = max(1, int(max_lote))
+        self.espera = max(0.0, espera_ms / 1000)
+        self._cola = queue.Queue()
+        self._lock = threading.Lock()
+        # funcion_lote no se llama nunca en paralelo (un intérprete TFLite no
+        # es thread-safe): ni dos llamadas directas tras cerrar(), ni una
+        # directa con el último lote que el hilo aún está atendiendo
+        self._lock_funcion = threading.Lock()
+        self._cerrado = False
+        self._lotes = 0
+        self._solicitudes = 0
+        self._lote_mayor = 0
+        self._hilo = threading.Thread(target=self._bucle, name=nombre, daemon=True)
+        self._hilo.start()
+
+    def predecir(self, entrada: np.ndarray, timeout: Optional[float] = 30) -> Any:
+        """
+        Encola una entrada (sin dimensión de lote) y espera su resultado
+
+        Raises:
+            TimeoutError: si el lote no se ejecutó a tiempo
+            La excepción de funcion_lote si el lote falló
+        """
+        solicitud = _Solicitud(entrada)
+        with self._lock:
+            cerrado = self._cerrado
+            if not cerrado:
+                self._cola.put(solicitud)
+        if cerrado:
+            # Despachador reemplazado (p. ej. modelo recargado): llamada directa
+            with self._lock_funcion:
+                return self.funcion_lote(np.expand_dims(entrada, 0))[0]
+        if not solicitud.lista.wait(timeout):
+            raise TimeoutError("La inferencia no se completó a tiempo")
+        if solicitud.error is not None:
+            raise solicitud.error
+        return solicitud.resultado
+
+    def cerrar(self):
+        """Atiende las solicitudes ya encoladas y detiene el hilo"""
+        with self._lock:
+            if self._cerrado:
+                return
+            self._cerrado = True
+            self._cola.put(_CERRAR)
+
+    def estadisticas(self) -> Dict[str, Any]:
+        return {
+            'lotes': self._lotes,
+            'solicitudes': self._solicitudes,
+            'tamano_promedio_lote': round(self._solicitudes / self._lotes, 2) if self._lotes else 0.0,
+            'lote_mayor': self._lote_mayor,
+            'max_lote': self.max_lote,
+            'espera_ms': self.espera * 1000
+        }
+
+    def _bucle(self):
+        while True:
+            primera = self._cola.get()
+            if primera is _CERRAR:
+                return
+            lote = [primera]
+            cerrar = False
+            limite = time.monotonic() + self.espera
+            while len(lote) < self.max_lote:
+                restante = limite - time.monotonic()
+                try:
+                    solicitud = self._cola.get(timeout=restante) if restante > 0 else self._cola.get_nowait()
+                except queue.Empty:
+                    break
+                if solicitud is _CERRAR:
+                    cerrar = True
+                    break
+                lote.append(solicitud)
+            self._ejecutar(lote)
+            if cerrar:
+                return
+
+    def _ejecutar(self, lote):
+        try:
+            with self._lock_funcion:
+                salidas = self.funcion_lote(np.stack([s.entrada for s in lote]))
+            for solicitud, salida in zip(lote, salidas):
+                solicitud.resultado = salida
+        except Exception as e:
+            for solicitud in lote:
+                solicitud.error = e
+        finally:
+            self._lotes += 1
+            self._solicitudes += len(lote)
+            self._lote_mayor = max(self._lote_mayor, len(lote))
+            for solicitud in lote:
+                solicitud.lista.set()
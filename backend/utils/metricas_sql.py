@@ -0,0 +1,284 @@
+# Instrumentación de consultas SQL
+# Centro Minero SENA
+#
+# DatabaseManager registra aquí cada sentencia (tiempo, filas y huella
+# normalizada). Por request se acumula en flask.g; al terminar se detectan
+# patrones N+1 y se agrega a las estadísticas globales del proceso.
+
+import logging
+import re
+import threading
+from collections import deque
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Any, Optional
+
+try:
+    from flask import g, request, has_request_context, current_app
+except ImportError:
+    g = None
+    request = None
+    current_app = None
+
+    def has_request_context():
+        return False
+
+try:
+    from config.config import Config
+except ImportError:
+    Config = None
+
+logger = logging.getLogger('gil.sql')
+
+_RE_COMENTARIOS = re.compile(r'/\*.*?\*/|--[^\n]*', re.S)
+_RE_CADENAS = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_RE_NUMEROS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_RE_PARAMETROS = re.compile(r'%s|%\([^)]*\)s')
+_RE_LISTAS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_RE_VALUES = re.compile(r'values\s*\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))*')
+_RE_ESPACIOS = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=2048)
+def huella_sql(query: str) -> str:
+    """
+    Normaliza una sentencia SQL para agrupar ejecuciones equivalentes
+
+    Elimina comentarios y literales, y colapsa listas IN (...) y bloques
+    VALUES multi-fila, de modo que la misma consulta con distintos
+    parámetros (o distinto número de elementos) produce la misma huella.
+
+    Args:
+        query: Sentencia SQL
+
+    Returns:
+        Huella normalizada en minúsculas
+    """
+    texto = _RE_COMENTARIOS.sub(' ', query)
+    texto = _RE_CADENAS.sub('?', texto)
+    texto = _RE_PARAMETROS.sub('?', texto)
+    texto = _RE_NUMEROS.sub('?', texto)
+    texto = _RE_ESPACIOS.sub(' ', texto).strip().lower()
+    texto = _RE_LISTAS.sub('(...)', texto)
+    texto = _RE_VALUES.sub('values (...)', texto)
+    return texto.rstrip(';')
+
+
+class MonitorSQL:
+    """
+    Acumula métricas de las sentencias ejecutadas por DatabaseManager
+
+    - Por request: número de sentencias, tiempo total y detalle por huella
+    - Global: agregado por huella y por endpoint, consultas lentas y
+      detecciones N+1 recientes
+    """
+
+    MAX_HUELLAS = 500
+    MAX_EVENTOS = 50
+
+    def __init__(self, habilitado: bool = True, umbral_lenta_ms: float = 200,
+            umbral_n1: int = 10):
+        self.habilitado = habilitado
+        self.umbral_lenta_ms = umbral_lenta_ms
+        self.umbral_n1 = umbral_n1
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Descarta las estadísticas globales acumuladas"""
+        with self._lock:
+            self._huellas: Dict[str, Dict[str, Any]] = {}
+            self._endpoints: Dict[str, Dict[str, Any]] = {}
+            self._lentas = deque(maxlen=self.MAX_EVENTOS)
+            self._n1 = deque(maxlen=self.MAX_EVENTOS)
+            self._desde = datetime.now()
+
+    def _endpoint_actual(self) -> str:
+        if has_request_context():
+            return f"{request.method} {request.endpoint or request.path}"
+        return '<fuera de request>'
+
+    def registrar(self, query: str, segundos: float, filas: Optional[int] = None):
+        """
+        Registra la ejecución de una sentencia
+
+        Args:
+            query: Sentencia SQL ejecutada
+            segundos: Duración medida
+            filas: Filas devueltas o afectadas (None si se desconoce)
+        """
+        if not self.habilitado:
+            return
+
+        huella = huella_sql(query)
+        ms = segundos * 1000
+        filas = filas if filas and filas > 0 else 0
+
+        if has_request_context():
+            datos = g.get('_gil_sql')
+            if datos is None:
+                datos = {'consultas': 0, 'tiempo_ms': 0.0, 'filas': 0, 'huellas': {}}
+                g._gil_sql = datos
+            datos['consultas'] += 1
+            datos['tiempo_ms'] += ms
+            datos['filas'] += filas
+            item = datos['huellas'].setdefault(huella, {'conteo': 0, 'tiempo_ms': 0.0, 'filas': 0})
+            item['conteo'] += 1
+            item['tiempo_ms'] += ms
+            item['filas'] += filas
+
+        with self._lock:
+            item = self._huellas.get(huella)
+            if item is None:
+                if len(self._huellas) >= self.MAX_HUELLAS:
+                    huella_global = '<otras>'
+                    item = self._huellas.setdefault(huella_global, {
+                        'conteo': 0, 'tiempo_ms': 0.0, 'max_ms': 0.0, 'filas': 0})
+                else:
+                    item = self._huellas[huella] = {
+                        'conteo': 0, 'tiempo_ms': 0.0, 'max_ms': 0.0, 'filas': 0}
+            item['conteo'] += 1
+            item['tiempo_ms'] += ms
+            item['max_ms'] = max(item['max_ms'], ms)
+            item['filas'] += filas
+
+        if ms >= self.umbral_lenta_ms:
+            endpoint = self._endpoint_actual()
+            logger.warning(f"🐢 Consulta lenta ({ms:.1f} ms, {filas} filas) en {endpoint}: {huella[:300]}")
+            with self._lock:
+                self._lentas.append({
+                    'fecha': datetime.now().isoformat(timespec='seconds'),
+                    'endpoint': endpoint,
+                    'huella': huella,
+                    'tiempo_ms': round(ms, 2),
+                    'filas': filas
+                })
+
+    def resumen_request(self) -> Optional[Dict[str, Any]]:
+        """
+        Métricas SQL del request actual
+
+        Returns:
+            Diccionario con consultas, tiempo, filas y huellas N+1, o None
+            si el request no ejecutó sentencias
+        """
+        if not has_request_context():
+            return None
+        datos = g.get('_gil_sql')
+        if not datos:
+            return None
+        n1 = {h: d['conteo'] for h, d in datos['huellas'].items() if d['conteo'] > self.umbral_n1}
+        return {
+            'consultas': datos['consultas'],
+            'tiempo_ms': round(datos['tiempo_ms'], 2),
+            'filas': datos['filas'],
+            'huellas_distintas': len(datos['huellas']),
+            'n_mas_1': n1
+        }
+
+    def cerrar_request(self, exc=None):
+        """Agrega las métricas del request al endpoint y reporta patrones N+1"""
+        if not self.habilitado or g is None:
+            return
+        resumen = self.resumen_request()
+        g.pop('_gil_sql', None)
+        if not resumen:
+            return
+
+        endpoint = self._endpoint_actual()
+        with self._lock:
+            item = self._endpoints.setdefault(endpoint, {
+                'requests': 0, 'consultas': 0, 'tiempo_ms': 0.0, 'max_consultas': 0, 'n_mas_1': 0})
+            item['requests'] += 1
+            item['consultas'] += resumen['consultas']
+            item['tiempo_ms'] += resumen['tiempo_ms']
+            item['max_consultas'] = max(item['max_consultas'], resumen['consultas'])
+            if resumen['n_mas_1']:
+                item['n_mas_1'] += 1
+
+        for huella, conteo in resumen['n_mas_1'].items():
+            logger.warning(f"🔁 Posible N+1 en {endpoint}: {conteo} ejecuciones de {huella[:300]}")
+            with self._lock:
+                self._n1.append({
+                    'fecha': datetime.now().isoformat(timespec='seconds'),
+                    'endpoint': endpoint,
+                    'huella': huella,
+                    'conteo': conteo
+                })
+
+    def estadisticas(self, limite: int = 20) -> Dict[str, Any]:
+        """
+        Agregado global desde el último reinicio
+
+        Args:
+            limite: Número de huellas y endpoints a incluir (los más costosos)
+        """
+        with self._lock:
+            huellas = [
+                {'huella': h, 'conteo': d['conteo'], 'tiempo_ms': round(d['tiempo_ms'], 2),
+                 'promedio_ms': round(d['tiempo_ms'] / d['conteo'], 2),
+                 'max_ms': round(d['max_ms'], 2), 'filas': d['filas']}
+                for h, d in self._huellas.items()
+            ]
+            endpoints = [
+                {'endpoint': e, 'requests': d['requests'], 'consultas': d['consultas'],
+                 'consultas_promedio': round(d['consultas'] / d['requests'], 1),
+                 'max_consultas': d['max_consultas'],
+                 'tiempo_ms': round(d['tiempo_ms'], 2),
+                 'tiempo_promedio_ms': round(d['tiempo_ms'] / d['requests'], 2),
+                 'requests_con_n_mas_1': d['n_mas_1']}
+                for e, d in self._endpoints.items()
+            ]
+            lentas = list(self._lentas)
+            n1 = list(self._n1)
+            desde = self._desde
+
+        huellas.sort(key=lambda x: x['tiempo_ms'], reverse=True)
+        endpoints.sort(key=lambda x: x['tiempo_ms'], reverse=True)
+        return {
+            'habilitado': self.habilitado,
+            'desde': desde.isoformat(timespec='seconds'),
+            'umbral_lenta_ms': self.umbral_lenta_ms,
+            'umbral_n_mas_1': self.umbral_n1,
+            'consultas': sum(h['conteo'] for h in huellas),
+            'tiempo_ms': round(sum(h['tiempo_ms'] for h in huellas), 2),
+            'huellas': huellas[:limite],
+            'endpoints': endpoints[:limite],
+            'consultas_lentas': lentas[::-1],
+            'n_mas_1': n1[::-1]
+        }
+
+
+monitor_sql = MonitorSQL(
+    habilitado=getattr(Config, 'DB_METRICAS_HABILITADAS', True),
+    umbral_lenta_ms=getattr(Config, 'DB_SLOW_QUERY_MS', 200),
+    umbral_n1=getattr(Config, 'DB_N1_UMBRAL', 10)
+)
+
+
+def agregar_cabeceras_sql(response):
+    """Expone las métricas SQL del request en cabeceras X-SQL-* (modo debug)"""
+    if not current_app.debug:
+        return response
+    resumen = monitor_sql.resumen_request()
+    if resumen:
+        response.headers['X-SQL-Count'] = str(resumen['consultas'])
+        response.headers['X-SQL-Time-Ms'] = f"{resumen['tiempo_ms']:.2f}"
+        response.headers['X-SQL-Rows'] = str(resumen['filas'])
+        if resumen['n_mas_1']:
+            response.headers['X-SQL-N1'] = str(max(resumen['n_mas_1'].values()))
+    return response
+
+
+def registrar_metricas_sql(app):
+    """
+    Activa la instrumentación SQL por request en la aplicación Flask
+
+    En modo debug cada respuesta incluye además las cabeceras
+    X-SQL-Count, X-SQL-Time-Ms, X-SQL-Rows y X-SQL-N1.
+
+    Args:
+        app: Aplicación Flask
+    """
+    app.after_request(agregar_cabeceras_sql)
+    app.teardown_request(monitor_sql.cerrar_request)
@@ -0,0 +1,205 @@
+# Paginación por cursor (keyset)
+# Centro Minero SENA
+#
+# En lugar de OFFSET, cada página continúa desde los valores de orden de la
+# última fila entregada: el costo de una página no crece con la tabla y las
+# inserciones concurrentes no desplazan ni duplican filas entre páginas.
+
+import base64
+import json
+import re
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from flask import request
+except ImportError:
+    request = None
+
+try:
+    from config.api_config import APIConfig
+    TAMANO_PAGINA = APIConfig.DEFAULT_PAGE_SIZE
+    TAMANO_PAGINA_MAX = APIConfig.MAX_PAGE_SIZE
+except ImportError:
+    TAMANO_PAGINA = 20
+    TAMANO_PAGINA_MAX = 100
+
+
+class CursorInvalido(ValueError):
+    """El cursor recibido no corresponde a este listado o está corrupto"""
+
+
+def _valor_cursor(valor: Any) -> Any:
+    if isinstance(valor, datetime):
+        return valor.strftime('%Y-%m-%d %H:%M:%S.%f')
+    if isinstance(valor, date):
+        return valor.isoformat()
+    if isinstance(valor, timedelta):
+        return str(valor)
+    if isinstance(valor, Decimal):
+        return str(valor)
+    return valor
+
+
+def codificar_cursor(valores: List[Any]) -> str:
+    """Serializa los valores de orden de una fila como cursor opaco (base64 url-safe)"""
+    datos = json.dumps([_valor_cursor(v) for v in valores], separators=(',', ':'))
+    return base64.urlsafe_b64encode(datos.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor: str, columnas: int) -> List[Any]:
+    """
+    Recupera los valores de orden de un cursor
+
+    Raises:
+        CursorInvalido: si el cursor no es válido para `columnas` claves de orden
+    """
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + relleno).decode('utf-8'))
+    except (ValueError, TypeError) as e:
+        raise CursorInvalido('Cursor de paginación inválido') from e
+    if not isinstance(valores, list) or len(valores) != columnas:
+        raise CursorInvalido('Cursor de paginación inválido')
+    return valores
+
+
+def solicitud_paginada() -> bool:
+    """True si el cliente pidió paginación (parámetros limite o cursor)"""
+    return request is not None and ('limite' in request.args or 'cursor' in request.args)
+
+
+def parametros_paginacion() -> Tuple[int, Optional[str], bool]:
+    """
+    Lee limite, cursor e incluir_total del query string
+
+    Returns:
+        Tupla (limite acotado a TAMANO_PAGINA_MAX, cursor o None, incluir_total)
+    """
+    limite = request.args.get('limite', TAMANO_PAGINA, type=int) or TAMANO_PAGINA
+    limite = max(1, min(limite, TAMANO_PAGINA_MAX))
+    cursor = request.args.get('cursor') or None
+    incluir_total = request.args.get('incluir_total', '').lower() in ('1', 'true', 'si')
+    return limite, cursor, incluir_total
+
+
+def _consulta_conteo(query: str) -> str:
+    """Reemplaza la lista de columnas del SELECT por COUNT(*) (FROM de nivel superior)"""
+    profundidad = 0
+    comilla = None
+    for i, caracter in enumerate(query):
+        if comilla:
+            if caracter == comilla:
+                comilla = None
+        elif caracter in ("'", '"'):
+            comilla = caracter
+        elif caracter == '(':
+            profundidad += 1
+        elif caracter == ')':
+            profundidad -= 1
+        elif profundidad == 0 and re.match(r'FROM\b', query[i:i + 5], re.I) and not query[i - 1].isalnum():
+            return "SELECT COUNT(*) AS total " + query[i:]
+    raise ValueError("La consulta paginada debe tener un FROM")
+
+
+def _orden_sql(orden: List[Tuple[str, str]]) -> str:
+    return ' ORDER BY ' + ', '.join(f"{expresion} {direccion}" for expresion, direccion in orden)
+
+
+def _condicion_keyset(orden: List[Tuple[str, str]], valores: List[Any]) -> Tuple[str, List[Any]]:
+    """
+    Condición "fila posterior al cursor" para un ORDER BY con direcciones mixtas
+
+    (a > x) OR (a = x AND b < y) OR (a = x AND b = y AND c > z) ...
+    """
+    alternativas = []
+    params = []
+    for i, (expresion, direccion) in enumerate(orden):
+        partes = [f"{orden[j][0]} = %s" for j in range(i)]
+        params.extend(valores[:i])
+        operador = '<' if direccion.upper() == 'DESC' else '>'
+        partes.append(f"{expresion} {operador} %s")
+        params.append(valores[i])
+        alternativas.append('(' + ' AND '.join(partes) + ')')
+    return '(' + ' OR '.join(alternativas) + ')', params
+
+
+def consultar_pagina(db, query: str, params: List[Any], orden: List[Tuple[str, str]],
+        limite_sin_paginar: Optional[int] = None) -> Tuple[List[Dict], Optional[Dict]]:
+    """
+    Ejecuta un listado aplicando paginación por cursor si el cliente la pidió
+
+    `query` debe ser un SELECT cuyo WHERE ya incluya los filtros (se le
+    agrega `AND <condición del cursor>`), sin ORDER BY y sin parámetros
+    en la lista de columnas. `orden` son las
+    columnas del ORDER BY con su dirección; la última debe ser única (id)
+    para que el orden sea total. Los valores de orden de cada fila se leen
+    con columnas auxiliares que no se devuelven al cliente.
+
+    Sin los parámetros limite/cursor se devuelve el listado completo (o
+    hasta `limite_sin_paginar` filas) como antes, para los selectores de
+    formularios que necesitan todas las opciones.
+
+    Args:
+        db: DatabaseManager
+        query: SELECT ... WHERE ... (sin ORDER BY ni LIMIT)
+        params: Parámetros de query
+        orden: Lista de (expresión SQL, 'ASC' | 'DESC')
+        limite_sin_paginar: LIMIT opcional cuando no se pagina
+
+    Returns:
+        Tupla (filas, paginacion); paginacion es None si no se paginó y si
+        no un diccionario con limite, siguiente_cursor, hay_mas y total
+        (solo con incluir_total, None en caso contrario)
+
+    Raises:
+        CursorInvalido: si el cursor recibido no es válido
+    """
+    params = list(params or [])
+
+    if not solicitud_paginada():
+        sql = query + _orden_sql(orden)
+        if limite_sin_paginar:
+            sql += " LIMIT %s"
+            params.append(limite_sin_paginar)
+        return db.ejecutar_query(sql, tuple(params) if params else None) or [], None
+
+    limite, cursor, incluir_total = parametros_paginacion()
+
+    total = None
+    if incluir_total:
+        conteo = db.obtener_uno(_consulta_conteo(query), tuple(params) if params else None)
+        total = conteo['total'] if conteo else 0
+
+    claves = [f"_orden_{i}" for i in range(len(orden))]
+    columnas_orden = ', '.join(f"{expresion} AS {clave}" for (expresion, _), clave in zip(orden, claves))
+    inicio_select = query.upper().index('SELECT') + len('SELECT')
+    sql = f"{query[:inicio_select]} {columnas_orden},{query[inicio_select:]}"
+
+    if cursor:
+        condicion, params_cursor = _condicion_keyset(orden, decodificar_cursor(cursor, len(orden)))
+        sql += f" AND {condicion}"
+        params.extend(params_cursor)
+
+    # Una fila extra indica si hay página siguiente sin contar el total
+    sql += _orden_sql(orden) + " LIMIT %s"
+    params.append(limite + 1)
+
+    filas = db.ejecutar_query(sql, tuple(params)) or []
+    hay_mas = len(filas) > limite
+    filas = filas[:limite]
+
+    siguiente = None
+    if hay_mas and filas:
+        siguiente = codificar_cursor([filas[-1][clave] for clave in claves])
+    for fila in filas:
+        for clave in claves:
+            fila.pop(clave, None)
+
+    return filas, {
+        'limite': limite,
+        'siguiente_cursor': siguiente,
+        'hay_mas': hay_mas,
+        'total': total
+    }
@@ -0,0 +1,133 @@
+# Resúmenes diarios para reportes
+# Centro Minero SENA
+#
+# Las tablas resumen_diario_* (schema.sql) guardan conteos por día x
+# laboratorio x categoría x estado y se mantienen con triggers
+# (triggers.sql). Los reportes y exportaciones suman estas filas: cualquier
+# rango de fechas se responde con unos cientos de filas, sin importar el
+# tamaño de prestamos, historial_mantenimiento o practicas_laboratorio.
+
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional, Union
+
+Fecha = Union[date, datetime, str]
+
+# tabla resumen -> INSERT ... SELECT que la recalcula desde la tabla origen;
+# recibe el rango [desde, hasta + 1 día) como parámetros
+RESUMENES = {
+    'resumen_diario_prestamos': """
+        INSERT INTO resumen_diario_prestamos (fecha, id_laboratorio, id_categoria, estado, total)
+        SELECT DATE(p.fecha), COALESCE(e.id_laboratorio, 0), COALESCE(e.id_categoria, 0),
+               p.estado, COUNT(*)
+        FROM prestamos p
+        JOIN equipos e ON p.id_equipo = e.id
+        WHERE p.fecha >= %s AND p.fecha < %s
+        GROUP BY DATE(p.fecha), COALESCE(e.id_laboratorio, 0), COALESCE(e.id_categoria, 0), p.estado
+    """,
+    'resumen_diario_mantenimientos': """
+        INSERT INTO resumen_diario_mantenimientos
+            (fecha, id_laboratorio, id_categoria, id_tipo_mantenimiento, estado, total, costo_total)
+        SELECT DATE(hm.fecha_inicio), COALESCE(e.id_laboratorio, 0), COALESCE(e.id_categoria, 0),
+               hm.id_tipo_mantenimiento, COALESCE(hm.estado, ''), COUNT(*),
+               COALESCE(SUM(hm.costo_mantenimiento), 0)
+        FROM historial_mantenimiento hm
+        JOIN equipos e ON hm.id_equipo = e.id
+        WHERE hm.fecha_inicio >= %s AND hm.fecha_inicio < %s
+        GROUP BY DATE(hm.fecha_inicio), COALESCE(e.id_laboratorio, 0), COALESCE(e.id_categoria, 0),
+                 hm.id_tipo_mantenimiento, COALESCE(hm.estado, '')
+    """,
+    'resumen_diario_practicas': """
+        INSERT INTO resumen_diario_practicas (fecha, id_laboratorio, estado, total, horas, estudiantes)
+        SELECT DATE(pl.fecha), pl.id_laboratorio, COALESCE(pl.estado, ''), COUNT(*),
+               COALESCE(SUM(pl.duracion_horas), 0), COALESCE(SUM(pl.numero_estudiantes), 0)
+        FROM practicas_laboratorio pl
+        WHERE pl.fecha >= %s AND pl.fecha < %s
+        GROUP BY DATE(pl.fecha), pl.id_laboratorio, COALESCE(pl.estado, '')
+    """,
+}
+
+# Límites cuando no se indica rango: abarcan cualquier fecha válida
+_FECHA_MINIMA = date(1000, 1, 1)
+_FECHA_MAXIMA = date(9999, 12, 30)
+
+
+def _a_fecha(valor: Optional[Fecha], defecto: date) -> date:
+    if valor is None or valor == '':
+        return defecto
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return datetime.strptime(str(valor)[:10], '%Y-%m-%d').date()
+
+
+def reconstruir_resumenes(db, desde: Optional[Fecha] = None,
+        hasta: Optional[Fecha] = None) -> Optional[Dict[str, int]]:
+    """
+    Recalcula los resúmenes diarios de un rango desde las tablas origen
+
+    Sirve para la carga inicial y para corregir desviaciones (por ejemplo,
+    tras mover equipos de laboratorio). Todo el rango se reemplaza en una
+    transacción: los reportes nunca ven el rango vacío.
+
+    Args:
+        db: DatabaseManager
+        desde: Primer día (incluido); None = desde el inicio
+        hasta: Último día (incluido); None = hasta el final
+
+    Returns:
+        Filas generadas por tabla resumen, o None si hubo error
+    """
+    inicio = _a_fecha(desde, _FECHA_MINIMA)
+    fin = _a_fecha(hasta, _FECHA_MAXIMA)
+    fin_exclusivo = fin + timedelta(days=1)
+
+    try:
+        filas = {}
+        with db.transaccion() as tx:
+            for tabla, insercion in RESUMENES.items():
+                tx.ejecutar(f"DELETE FROM {tabla} WHERE fecha BETWEEN %s AND %s", (inicio, fin))
+                filas[tabla] = tx.ejecutar(insercion, (inicio, fin_exclusivo))
+        return filas
+    except Exception as e:
+        print(f"Error reconstruyendo resúmenes diarios: {e}")
+        return None
+
+
+def resumen_periodo(db, desde: Fecha, hasta: Fecha) -> Dict[str, Any]:
+    """
+    Totales de un período sumando los resúmenes diarios
+
+    Args:
+        db: DatabaseManager
+        desde: Primer día (incluido)
+        hasta: Último día (incluido)
+
+    Returns:
+        Diccionario con prestamos, mantenimientos, costo_mantenimientos,
+        practicas, horas_laboratorio y estudiantes (ceros si falla)
+    """
+    inicio = _a_fecha(desde, _FECHA_MINIMA)
+    fin = _a_fecha(hasta, _FECHA_MAXIMA)
+    rango = (inicio, fin)
+
+    res_prestamos, res_mantenimientos, res_practicas = db.ejecutar_lote([
+        ("SELECT COALESCE(SUM(total), 0) as total FROM resumen_diario_prestamos "
+         "WHERE fecha BETWEEN %s AND %s", rango),
+        ("SELECT COALESCE(SUM(total), 0) as total, COALESCE(SUM(costo_total), 0) as costo "
+         "FROM resumen_diario_mantenimientos WHERE fecha BETWEEN %s AND %s", rango),
+        ("SELECT COALESCE(SUM(total), 0) as total, COALESCE(SUM(horas), 0) as horas, "
+         "COALESCE(SUM(estudiantes), 0) as estudiantes "
+         "FROM resumen_diario_practicas WHERE fecha BETWEEN %s AND %s", rango),
+    ])
+
+    mantenimientos = res_mantenimientos[0] if res_mantenimientos else {}
+    practicas = res_practicas[0] if res_practicas else {}
+    return {
+        'prestamos': int(res_prestamos[0]['total']) if res_prestamos else 0,
+        'mantenimientos': int(mantenimientos.get('total') or 0),
+        'costo_mantenimientos': float(mantenimientos.get('costo') or 0),
+        'practicas': int(practicas.get('total') or 0),
+        'horas_laboratorio': float(practicas.get('horas') or 0),
+        'estudiantes': int(practicas.get('estudiantes') or 0)
+    }
@@ -0,0 +1,44 @@
+# Contadores de versión compartidos entre workers
+# Centro Minero SENA
+#
+# Cada proceso puede mantener en memoria datos derivados de la base de datos
+# (p. ej. la galería de rostros). La tabla versiones_datos guarda un contador
+# por conjunto de datos: quien modifica los datos lo incrementa y cada
+# worker compara el valor con el de su copia para saber si debe recargarla.
+
+from typing import Optional
+
+_SQL_INCREMENTAR = """
+    INSERT INTO versiones_datos (nombre, version) VALUES (%s, LAST_INSERT_ID(1))
+    ON DUPLICATE KEY UPDATE version = LAST_INSERT_ID(version + 1)
+"""
+
+
+def leer_version(db, nombre: str) -> Optional[int]:
+    """
+    Versión actual de un conjunto de datos
+
+    Returns:
+        Contador (0 si nunca se ha modificado) o None si no se pudo leer
+    """
+    fila = db.obtener_uno(
+        "SELECT COALESCE(MAX(version), 0) AS version FROM versiones_datos WHERE nombre = %s",
+        (nombre,))
+    return int(fila['version']) if fila else None
+
+
+def incrementar_version(db, nombre: str) -> Optional[int]:
+    """
+    Incrementa el contador de un conjunto de datos (lo crea si no existe)
+
+    Returns:
+        Nueva versión, o None si hubo error
+    """
+    try:
+        with db.transaccion() as tx:
+            tx.ejecutar(_SQL_INCREMENTAR, (nombre,))
+            fila = tx.obtener_uno("SELECT LAST_INSERT_ID() AS version")
+        return int(fila['version'])
+    except Exception as e:
+        print(f"Error incrementando versión de {nombre}: {e}")
+        return None
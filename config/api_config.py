@@ -102,6 +102,9 @@ class APIConfig:
     CACHE_TYPE = os.getenv('CACHE_TYPE', 'simple')
     CACHE_DEFAULT_TIMEOUT = 300  # 5 minutos
     CACHE_KEY_PREFIX = 'gil_api_'
+    CACHE_DASHBOARD_TIMEOUT = 30  # Instantánea de estadísticas del dashboard
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 1000))  # Solo backend en memoria
+    CACHE_REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
     
     # =========================================================
     # CORS
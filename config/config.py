@@ -44,6 +44,14 @@ class Config:
     DB_POOL_NAME = os.getenv('DB_POOL_NAME', 'gil_pool')
     DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
     DB_POOL_RESET_SESSION = os.getenv('DB_POOL_RESET_SESSION', 'true').lower() == 'true'
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))  # Espera máxima para obtener conexión (s)
+    DB_POOL_MAX_LIFETIME = int(os.getenv('DB_POOL_MAX_LIFETIME', 1800))  # Reciclar conexiones tras N segundos
+    DB_POOL_PING_INTERVAL = int(os.getenv('DB_POOL_PING_INTERVAL', 30))  # Verificar salud si estuvo inactiva N segundos
+    
+    # Instrumentación de consultas
+    DB_METRICAS_HABILITADAS = os.getenv('DB_METRICAS_HABILITADAS', 'true').lower() == 'true'
+    DB_SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', 200))  # Registrar consultas más lentas que N ms
+    DB_N1_UMBRAL = int(os.getenv('DB_N1_UMBRAL', 10))  # Misma consulta más de N veces por request = posible N+1
     
     # =========================================================
     # FLASK
@@ -97,6 +105,28 @@ class Config:
     AI_IMAGES_CONFIDENCE_THRESHOLD = float(os.getenv('AI_IMAGES_CONFIDENCE_THRESHOLD', 0.85))
     AI_IMAGES_MAX_SIZE = int(os.getenv('AI_IMAGES_MAX_SIZE', 1024))
     AI_IMAGES_SUPPORTED_FORMATS = os.getenv('AI_IMAGES_SUPPORTED_FORMATS', 'jpg,jpeg,png,bmp').split(',')
+    AI_IMAGES_LOTE_MAXIMO = int(os.getenv('AI_IMAGES_LOTE_MAXIMO', 16))  # Imágenes por llamada al modelo
+    AI_IMAGES_ESPERA_LOTE_MS = float(os.getenv('AI_IMAGES_ESPERA_LOTE_MS', 5))  # Espera para agrupar solicitudes
+    AI_IMAGES_BACKEND = os.getenv('AI_IMAGES_BACKEND', 'auto')  # auto (TFLite si pasó paridad) o keras
+    AI_IMAGES_CUANTIZACION = os.getenv('AI_IMAGES_CUANTIZACION', 'int8')  # int8, float16 o ninguna
+    AI_IMAGES_TOLERANCIA_PARIDAD = float(os.getenv('AI_IMAGES_TOLERANCIA_PARIDAD', 0.02))
+    AI_IMAGES_HASH_DISTANCIA_MAXIMA = int(os.getenv('AI_IMAGES_HASH_DISTANCIA_MAXIMA', 10))  # Bits de pHash para casi duplicadas
+    AI_IMAGES_SIMILITUD_MINIMA = float(os.getenv('AI_IMAGES_SIMILITUD_MINIMA', 0.5))  # /api/equipos/reconocer
+    AI_IMAGES_INDICE = os.getenv('AI_IMAGES_INDICE', 'auto')  # auto, plano (exacto) o ivf (aproximado)
+    AI_IMAGES_INDICE_APROXIMADO_MINIMO = int(os.getenv('AI_IMAGES_INDICE_APROXIMADO_MINIMO', 20000))  # Vectores para usar ivf en auto
+    AI_IMAGES_INDICE_SONDAS = int(os.getenv('AI_IMAGES_INDICE_SONDAS', 8))  # Listas recorridas por consulta en ivf
+    ENTRENAMIENTO_INTERVALO_SEGUNDOS = float(os.getenv('ENTRENAMIENTO_INTERVALO_SEGUNDOS', 5))  # Sondeo de la cola
+    ENTRENAMIENTO_LATIDO_MAXIMO_SEGUNDOS = int(os.getenv('ENTRENAMIENTO_LATIDO_MAXIMO_SEGUNDOS', 300))  # Worker caído
+    ML_CALENTAR_MODELOS = os.getenv('ML_CALENTAR_MODELOS', '')  # reconocimiento,nlu,predictivo,vectores (vacío = carga perezosa)
+    
+    # =========================================================
+    # RECONOCIMIENTO FACIAL
+    # =========================================================
+    FACIAL_EMBEDDING_LADO = int(os.getenv('FACIAL_EMBEDDING_LADO', 24))  # Vector de LADO x LADO
+    FACIAL_UMBRAL_SIMILITUD = float(os.getenv('FACIAL_UMBRAL_SIMILITUD', 0.80))
+    FACIAL_MAX_PLANTILLAS = int(os.getenv('FACIAL_MAX_PLANTILLAS', 5))  # Capturas por usuario
+    FACIAL_DETECCION_LADO_MAX = int(os.getenv('FACIAL_DETECCION_LADO_MAX', 480))  # px
+    FACIAL_ROSTRO_MIN = int(os.getenv('FACIAL_ROSTRO_MIN', 60))  # px en la imagen original
     
     # =========================================================
     # EMAIL
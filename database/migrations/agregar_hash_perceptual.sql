@@ -0,0 +1,20 @@
+-- =========================================================
+-- MIGRACIÓN: Hash perceptual de imágenes
+-- Fecha: 2026-10-18
+-- Descripción: phash / imagen_phash guardan el pHash (64 bits en
+-- hexadecimal, ver backend/services/hash_perceptual.py) de cada imagen de
+-- entrenamiento y de la foto de cada equipo. Permite rechazar fotos casi
+-- duplicadas al subirlas y buscar un equipo por foto aunque haya sido
+-- recomprimida o recortada. Las imágenes existentes se completan desde el
+-- archivo la primera vez que un worker carga el índice.
+-- =========================================================
+
+USE gil_laboratorios;
+
+ALTER TABLE imagenes_entrenamiento
+ADD COLUMN IF NOT EXISTS phash CHAR(16) NULL AFTER hash_imagen;
+
+ALTER TABLE equipos
+ADD COLUMN IF NOT EXISTS imagen_phash CHAR(16) NULL AFTER imagen_hash;
+
+INSERT IGNORE INTO versiones_datos (nombre, version) VALUES ('hashes_imagenes', 0);
@@ -0,0 +1,14 @@
+-- =========================================================
+-- MIGRACIÓN: Embeddings faciales precalculados
+-- Fecha: 2026-10-18
+-- Descripción: rostro_embedding guarda el vector del rostro registrado
+-- (float32, ver backend/services/rostros.py) para que el login facial
+-- compare contra todos los usuarios sin decodificar imágenes.
+-- Los usuarios existentes se completan desde rostro_data en el primer login.
+-- =========================================================
+
+USE gil_laboratorios;
+
+ALTER TABLE usuarios
+ADD COLUMN IF NOT EXISTS rostro_data LONGBLOB NULL,
+ADD COLUMN IF NOT EXISTS rostro_embedding BLOB NULL AFTER rostro_data;
@@ -0,0 +1,19 @@
+-- =========================================================
+-- MIGRACIÓN: Vectores de la foto de cada equipo
+-- Fecha: 2026-10-18
+-- Descripción: imagen_vector guarda el vector de características de la
+-- foto del equipo (float32, ver backend/services/vectores_equipos.py),
+-- calculado al subirla. POST /api/equipos/reconocer busca los equipos más
+-- parecidos en un índice en memoria sin decodificar las fotos guardadas.
+-- imagen_vector_version identifica el descriptor; si cambia, el vector se
+-- recalcula desde el archivo. Los equipos existentes se completan la
+-- primera vez que un worker carga el índice.
+-- =========================================================
+
+USE gil_laboratorios;
+
+ALTER TABLE equipos
+ADD COLUMN IF NOT EXISTS imagen_vector BLOB NULL AFTER imagen_phash,
+ADD COLUMN IF NOT EXISTS imagen_vector_version VARCHAR(40) NULL AFTER imagen_vector;
+
+INSERT IGNORE INTO versiones_datos (nombre, version) VALUES ('vectores_equipos', 0);
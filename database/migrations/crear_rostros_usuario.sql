@@ -0,0 +1,51 @@
+-- =========================================================
+-- MIGRACIÓN: Rostros fuera de la tabla usuarios
+-- Fecha: 2026-10-18
+-- Descripción: Las plantillas faciales pasan de usuarios.rostro_data /
+-- rostro_embedding a rostros_usuario (una fila por plantilla). Así las
+-- consultas sobre usuarios no leen páginas de BLOBs.
+-- Los embeddings se marcan como 'pendiente' y la aplicación los recalcula
+-- desde la plantilla en la primera carga de la galería.
+-- =========================================================
+
+USE gil_laboratorios;
+
+CREATE TABLE IF NOT EXISTS rostros_usuario (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    id_usuario INT NOT NULL,
+    plantilla MEDIUMBLOB NOT NULL,
+    embedding BLOB NULL,
+    version_modelo VARCHAR(50) NOT NULL,
+    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (id_usuario) REFERENCES usuarios(id) ON DELETE CASCADE,
+    INDEX idx_rostro_usuario (id_usuario, id)
+);
+
+-- Copiar los rostros existentes (solo si las columnas antiguas existen)
+SET @column_exists = (
+    SELECT COUNT(*)
+    FROM INFORMATION_SCHEMA.COLUMNS
+    WHERE TABLE_SCHEMA = DATABASE()
+    AND TABLE_NAME = 'usuarios'
+    AND COLUMN_NAME = 'rostro_data'
+);
+
+SET @sql = IF(@column_exists > 0,
+    'INSERT INTO rostros_usuario (id_usuario, plantilla, embedding, version_modelo)
+     SELECT u.id, u.rostro_data, NULL, ''pendiente''
+     FROM usuarios u
+     WHERE u.rostro_data IS NOT NULL
+     AND NOT EXISTS (SELECT 1 FROM rostros_usuario ru WHERE ru.id_usuario = u.id)',
+    'SELECT ''rostro_data no existe, nada que copiar'' AS mensaje');
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- Retirar los BLOBs de usuarios
+ALTER TABLE usuarios
+DROP COLUMN IF EXISTS rostro_embedding,
+DROP COLUMN IF EXISTS rostro_data;
+
+-- Las demás instancias recargan su galería de rostros
+INSERT INTO versiones_datos (nombre, version) VALUES ('galeria_rostros', 1)
+ON DUPLICATE KEY UPDATE version = version + 1;
@@ -0,0 +1,41 @@
+-- =========================================================
+-- MIGRACIÓN: Cola de entrenamiento de modelos
+-- Fecha: 2026-10-18
+-- Descripción: POST /api/reconocimiento/entrenar deja de entrenar dentro
+-- del request: crea un trabajo en trabajos_entrenamiento y responde 202.
+-- El worker (python -m backend.services.entrenamiento) ejecuta los
+-- trabajos y guarda época, pérdida y precisión a medida que avanza.
+-- =========================================================
+
+USE gil_laboratorios;
+
+-- Tabla de Trabajos de Entrenamiento
+-- POST /api/reconocimiento/entrenar encola aquí; backend/services/entrenamiento.py
+-- ejecuta los trabajos y guarda el avance por época. modelo_activo (UNIQUE)
+-- permite un solo trabajo en cola o en proceso por modelo.
+CREATE TABLE IF NOT EXISTS trabajos_entrenamiento (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    modelo VARCHAR(50) NOT NULL,
+    estado ENUM('en_cola', 'en_proceso', 'completado', 'error') NOT NULL DEFAULT 'en_cola',
+    parametros TEXT,
+    epoca_actual INT NOT NULL DEFAULT 0,
+    total_epocas INT NOT NULL DEFAULT 0,
+    perdida DECIMAL(12,6),
+    precision_entrenamiento DECIMAL(7,6),
+    perdida_validacion DECIMAL(12,6),
+    precision_validacion DECIMAL(7,6),
+    historial TEXT,
+    metricas TEXT,
+    mensaje_error TEXT,
+    solicitado_por VARCHAR(50),
+    worker VARCHAR(100),
+    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    fecha_inicio DATETIME NULL,
+    fecha_fin DATETIME NULL,
+    ultimo_latido DATETIME NULL,
+    modelo_activo VARCHAR(50) AS (IF(estado IN ('en_cola', 'en_proceso'), modelo, NULL)) STORED,
+    UNIQUE KEY uk_modelo_activo (modelo_activo),
+    INDEX idx_estado (estado, id)
+);
+
+INSERT IGNORE INTO versiones_datos (nombre, version) VALUES ('modelo_reconocimiento', 0);
@@ -0,0 +1,18 @@
+-- =========================================================
+-- MIGRACIÓN: Contadores de versión de datos en memoria
+-- Fecha: 2026-10-18
+-- Descripción: versiones_datos guarda un contador por conjunto de datos
+-- que los workers mantienen en memoria (galería de rostros del login
+-- facial). Quien modifica los datos incrementa el contador y cada worker
+-- recarga su copia al ver un valor distinto.
+-- =========================================================
+
+USE gil_laboratorios;
+
+CREATE TABLE IF NOT EXISTS versiones_datos (
+    nombre VARCHAR(50) PRIMARY KEY,
+    version BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+INSERT IGNORE INTO versiones_datos (nombre, version) VALUES ('galeria_rostros', 0);
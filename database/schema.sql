@@ -43,6 +43,20 @@ CREATE TABLE IF NOT EXISTS usuarios (
     FOREIGN KEY (id_rol) REFERENCES roles(id)
 );
 
+-- Tabla de Rostros Registrados (reconocimiento facial)
+-- Una fila por plantilla; fuera de usuarios para no arrastrar BLOBs en
+-- las consultas de usuarios
+CREATE TABLE IF NOT EXISTS rostros_usuario (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    id_usuario INT NOT NULL,
+    plantilla MEDIUMBLOB NOT NULL,           -- Rostro recortado (JPEG 200x200)
+    embedding BLOB NULL,                     -- Vector float32 (backend/services/rostros.py)
+    version_modelo VARCHAR(50) NOT NULL,     -- Descriptor que generó el embedding
+    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (id_usuario) REFERENCES usuarios(id) ON DELETE CASCADE,
+    INDEX idx_rostro_usuario (id_usuario, id)
+);
+
 -- =========================================================
 -- MÓDULO 2: GESTIÓN DE LABORATORIOS Y ESPACIOS
 -- =========================================================
@@ -95,6 +109,9 @@ CREATE TABLE IF NOT EXISTS equipos (
     vida_util_anos INT DEFAULT 5,
     imagen_url VARCHAR(500),
     imagen_hash VARCHAR(64),
+    imagen_phash CHAR(16),
+    imagen_vector BLOB,
+    imagen_vector_version VARCHAR(40),
     estado ENUM('disponible', 'prestado', 'mantenimiento', 'reparacion', 'dado_baja') DEFAULT 'disponible',
     estado_fisico ENUM('excelente', 'bueno', 'regular', 'malo') DEFAULT 'bueno',
     ubicacion_especifica VARCHAR(200),
@@ -359,6 +376,7 @@ CREATE TABLE IF NOT EXISTS imagenes_entrenamiento (
     formato VARCHAR(10) DEFAULT 'jpg',
     tamano_bytes INT,
     hash_imagen VARCHAR(64),
+    phash CHAR(16),
     calidad_imagen DECIMAL(3,2),
     estado ENUM('pendiente', 'entrenado', 'error') DEFAULT 'pendiente',
     fecha_captura TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -367,6 +385,35 @@ CREATE TABLE IF NOT EXISTS imagenes_entrenamiento (
     INDEX idx_estado (estado)
 );
 
+-- Tabla de Trabajos de Entrenamiento
+-- POST /api/reconocimiento/entrenar encola aquí; backend/services/entrenamiento.py
+-- ejecuta los trabajos y guarda el avance por época. modelo_activo (UNIQUE)
+-- permite un solo trabajo en cola o en proceso por modelo.
+CREATE TABLE IF NOT EXISTS trabajos_entrenamiento (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    modelo VARCHAR(50) NOT NULL,
+    estado ENUM('en_cola', 'en_proceso', 'completado', 'error') NOT NULL DEFAULT 'en_cola',
+    parametros TEXT,
+    epoca_actual INT NOT NULL DEFAULT 0,
+    total_epocas INT NOT NULL DEFAULT 0,
+    perdida DECIMAL(12,6),
+    precision_entrenamiento DECIMAL(7,6),
+    perdida_validacion DECIMAL(12,6),
+    precision_validacion DECIMAL(7,6),
+    historial TEXT,
+    metricas TEXT,
+    mensaje_error TEXT,
+    solicitado_por VARCHAR(50),
+    worker VARCHAR(100),
+    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    fecha_inicio DATETIME NULL,
+    fecha_fin DATETIME NULL,
+    ultimo_latido DATETIME NULL,
+    modelo_activo VARCHAR(50) AS (IF(estado IN ('en_cola', 'en_proceso'), modelo, NULL)) STORED,
+    UNIQUE KEY uk_modelo_activo (modelo_activo),
+    INDEX idx_estado (estado, id)
+);
+
 -- =========================================================
 -- MÓDULO 9: CONFIGURACIÓN Y LOGS
 -- =========================================================
@@ -412,6 +459,14 @@ CREATE TABLE IF NOT EXISTS logs_cambios (
     FOREIGN KEY (id_usuario) REFERENCES usuarios(id)
 );
 
+-- Contadores de versión de datos que cada worker mantiene en memoria
+-- (p. ej. 'galeria_rostros'); ver backend/utils/versiones.py
+CREATE TABLE IF NOT EXISTS versiones_datos (
+    nombre VARCHAR(50) PRIMARY KEY,
+    version BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
 -- =========================================================
 -- MÓDULO 10: RECUPERACIÓN DE CONTRASEÑAS
 -- =========================================================
@@ -432,6 +487,46 @@ CREATE TABLE IF NOT EXISTS password_reset_tokens (
     INDEX idx_usuario (id_usuario)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- =========================================================
+-- MÓDULO 11: RESÚMENES DIARIOS PARA REPORTES
+-- =========================================================
+-- Conteos por día x laboratorio x categoría x estado, mantenidos por los
+-- triggers tr_resumen_* (triggers.sql). Los reportes suman estas filas en
+-- lugar de agregar las tablas transaccionales. 0 = sin laboratorio/categoría.
+
+-- Resumen diario de préstamos (por fecha del préstamo)
+CREATE TABLE IF NOT EXISTS resumen_diario_prestamos (
+    fecha DATE NOT NULL,
+    id_laboratorio INT NOT NULL DEFAULT 0,
+    id_categoria INT NOT NULL DEFAULT 0,
+    estado VARCHAR(20) NOT NULL,
+    total INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (fecha, id_laboratorio, id_categoria, estado)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Resumen diario de mantenimientos (por fecha de inicio)
+CREATE TABLE IF NOT EXISTS resumen_diario_mantenimientos (
+    fecha DATE NOT NULL,
+    id_laboratorio INT NOT NULL DEFAULT 0,
+    id_categoria INT NOT NULL DEFAULT 0,
+    id_tipo_mantenimiento INT NOT NULL,
+    estado VARCHAR(20) NOT NULL,
+    total INT NOT NULL DEFAULT 0,
+    costo_total DECIMAL(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (fecha, id_laboratorio, id_categoria, id_tipo_mantenimiento, estado)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Resumen diario de prácticas de laboratorio
+CREATE TABLE IF NOT EXISTS resumen_diario_practicas (
+    fecha DATE NOT NULL,
+    id_laboratorio INT NOT NULL,
+    estado VARCHAR(20) NOT NULL,
+    total INT NOT NULL DEFAULT 0,
+    horas DECIMAL(10,1) NOT NULL DEFAULT 0,
+    estudiantes INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (fecha, id_laboratorio, estado)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 -- =========================================================
 -- VISTAS DEL SISTEMA
 -- =========================================================
@@ -96,6 +96,167 @@ BEGIN
     END IF;
 END//
 
+-- =========================================================
+-- RESÚMENES DIARIOS: mantenimiento incremental
+-- =========================================================
+-- Cada cambio suma (+1) en la celda nueva y resta (-1) en la anterior. La
+-- celda se ubica con el laboratorio y la categoría actuales del equipo; si
+-- un equipo cambia de laboratorio, recalcular el rango afectado con
+-- POST /api/v1/admin/resumenes/reconstruir.
+
+DROP PROCEDURE IF EXISTS sp_resumen_prestamo//
+CREATE PROCEDURE sp_resumen_prestamo(
+    IN p_fecha DATETIME,
+    IN p_id_equipo INT,
+    IN p_estado VARCHAR(20),
+    IN p_delta INT
+)
+BEGIN
+    IF p_fecha IS NOT NULL THEN
+        INSERT INTO resumen_diario_prestamos (fecha, id_laboratorio, id_categoria, estado, total)
+        SELECT DATE(p_fecha), COALESCE(e.id_laboratorio, 0), COALESCE(e.id_categoria, 0), p_estado, p_delta
+        FROM equipos e WHERE e.id = p_id_equipo
+        ON DUPLICATE KEY UPDATE total = total + p_delta;
+    END IF;
+END//
+
+DROP PROCEDURE IF EXISTS sp_resumen_mantenimiento//
+CREATE PROCEDURE sp_resumen_mantenimiento(
+    IN p_fecha DATETIME,
+    IN p_id_equipo INT,
+    IN p_id_tipo INT,
+    IN p_estado VARCHAR(20),
+    IN p_costo DECIMAL(10,2),
+    IN p_delta INT
+)
+BEGIN
+    IF p_fecha IS NOT NULL THEN
+        INSERT INTO resumen_diario_mantenimientos
+            (fecha, id_laboratorio, id_categoria, id_tipo_mantenimiento, estado, total, costo_total)
+        SELECT DATE(p_fecha), COALESCE(e.id_laboratorio, 0), COALESCE(e.id_categoria, 0),
+               p_id_tipo, COALESCE(p_estado, ''), p_delta, p_delta * COALESCE(p_costo, 0)
+        FROM equipos e WHERE e.id = p_id_equipo
+        ON DUPLICATE KEY UPDATE total = total + p_delta,
+                                costo_total = costo_total + p_delta * COALESCE(p_costo, 0);
+    END IF;
+END//
+
+DROP PROCEDURE IF EXISTS sp_resumen_practica//
+CREATE PROCEDURE sp_resumen_practica(
+    IN p_fecha DATETIME,
+    IN p_id_laboratorio INT,
+    IN p_estado VARCHAR(20),
+    IN p_horas DECIMAL(3,1),
+    IN p_estudiantes INT,
+    IN p_delta INT
+)
+BEGIN
+    IF p_fecha IS NOT NULL THEN
+        INSERT INTO resumen_diario_practicas (fecha, id_laboratorio, estado, total, horas, estudiantes)
+        VALUES (DATE(p_fecha), p_id_laboratorio, COALESCE(p_estado, ''), p_delta,
+                p_delta * COALESCE(p_horas, 0), p_delta * COALESCE(p_estudiantes, 0))
+        ON DUPLICATE KEY UPDATE total = total + p_delta,
+                                horas = horas + p_delta * COALESCE(p_horas, 0),
+                                estudiantes = estudiantes + p_delta * COALESCE(p_estudiantes, 0);
+    END IF;
+END//
+
+DROP TRIGGER IF EXISTS tr_resumen_prestamo_insertar//
+CREATE TRIGGER tr_resumen_prestamo_insertar
+AFTER INSERT ON prestamos
+FOR EACH ROW
+BEGIN
+    CALL sp_resumen_prestamo(NEW.fecha, NEW.id_equipo, NEW.estado, 1);
+END//
+
+DROP TRIGGER IF EXISTS tr_resumen_prestamo_actualizar//
+CREATE TRIGGER tr_resumen_prestamo_actualizar
+AFTER UPDATE ON prestamos
+FOR EACH ROW
+BEGIN
+    IF NOT (DATE(OLD.fecha) <=> DATE(NEW.fecha)) OR NOT (OLD.estado <=> NEW.estado)
+            OR OLD.id_equipo != NEW.id_equipo THEN
+        CALL sp_resumen_prestamo(OLD.fecha, OLD.id_equipo, OLD.estado, -1);
+        CALL sp_resumen_prestamo(NEW.fecha, NEW.id_equipo, NEW.estado, 1);
+    END IF;
+END//
+
+DROP TRIGGER IF EXISTS tr_resumen_prestamo_eliminar//
+CREATE TRIGGER tr_resumen_prestamo_eliminar
+AFTER DELETE ON prestamos
+FOR EACH ROW
+BEGIN
+    CALL sp_resumen_prestamo(OLD.fecha, OLD.id_equipo, OLD.estado, -1);
+END//
+
+DROP TRIGGER IF EXISTS tr_resumen_mantenimiento_insertar//
+CREATE TRIGGER tr_resumen_mantenimiento_insertar
+AFTER INSERT ON historial_mantenimiento
+FOR EACH ROW
+BEGIN
+    CALL sp_resumen_mantenimiento(NEW.fecha_inicio, NEW.id_equipo, NEW.id_tipo_mantenimiento,
+                                  NEW.estado, NEW.costo_mantenimiento, 1);
+END//
+
+DROP TRIGGER IF EXISTS tr_resumen_mantenimiento_actualizar//
+CREATE TRIGGER tr_resumen_mantenimiento_actualizar
+AFTER UPDATE ON historial_mantenimiento
+FOR EACH ROW
+BEGIN
+    IF NOT (DATE(OLD.fecha_inicio) <=> DATE(NEW.fecha_inicio)) OR NOT (OLD.estado <=> NEW.estado)
+            OR OLD.id_equipo != NEW.id_equipo
+            OR OLD.id_tipo_mantenimiento != NEW.id_tipo_mantenimiento
+            OR NOT (OLD.costo_mantenimiento <=> NEW.costo_mantenimiento) THEN
+        CALL sp_resumen_mantenimiento(OLD.fecha_inicio, OLD.id_equipo, OLD.id_tipo_mantenimiento,
+                                      OLD.estado, OLD.costo_mantenimiento, -1);
+        CALL sp_resumen_mantenimiento(NEW.fecha_inicio, NEW.id_equipo, NEW.id_tipo_mantenimiento,
+                                      NEW.estado, NEW.costo_mantenimiento, 1);
+    END IF;
+END//
+
+DROP TRIGGER IF EXISTS tr_resumen_mantenimiento_eliminar//
+CREATE TRIGGER tr_resumen_mantenimiento_eliminar
+AFTER DELETE ON historial_mantenimiento
+FOR EACH ROW
+BEGIN
+    CALL sp_resumen_mantenimiento(OLD.fecha_inicio, OLD.id_equipo, OLD.id_tipo_mantenimiento,
+                                  OLD.estado, OLD.costo_mantenimiento, -1);
+END//
+
+DROP TRIGGER IF EXISTS tr_resumen_practica_insertar//
+CREATE TRIGGER tr_resumen_practica_insertar
+AFTER INSERT ON practicas_laboratorio
+FOR EACH ROW
+BEGIN
+    CALL sp_resumen_practica(NEW.fecha, NEW.id_laboratorio, NEW.estado,
+                             NEW.duracion_horas, NEW.numero_estudiantes, 1);
+END//
+
+DROP TRIGGER IF EXISTS tr_resumen_practica_actualizar//
+CREATE TRIGGER tr_resumen_practica_actualizar
+AFTER UPDATE ON practicas_laboratorio
+FOR EACH ROW
+BEGIN
+    IF NOT (DATE(OLD.fecha) <=> DATE(NEW.fecha)) OR NOT (OLD.estado <=> NEW.estado)
+            OR OLD.id_laboratorio != NEW.id_laboratorio
+            OR NOT (OLD.duracion_horas <=> NEW.duracion_horas)
+            OR NOT (OLD.numero_estudiantes <=> NEW.numero_estudiantes) THEN
+        CALL sp_resumen_practica(OLD.fecha, OLD.id_laboratorio, OLD.estado,
+                                 OLD.duracion_horas, OLD.numero_estudiantes, -1);
+        CALL sp_resumen_practica(NEW.fecha, NEW.id_laboratorio, NEW.estado,
+                                 NEW.duracion_horas, NEW.numero_estudiantes, 1);
+    END IF;
+END//
+
+DROP TRIGGER IF EXISTS tr_resumen_practica_eliminar//
+CREATE TRIGGER tr_resumen_practica_eliminar
+AFTER DELETE ON practicas_laboratorio
+FOR EACH ROW
+BEGIN
+    CALL sp_resumen_practica(OLD.fecha, OLD.id_laboratorio, OLD.estado,
+                             OLD.duracion_horas, OLD.numero_estudiantes, -1);
+END//
+
 -- =========================================================
 -- PROCEDIMIENTO: Obtener estadísticas del dashboard
 -- =========================================================
@@ -0,0 +1,215 @@
+"""
+Benchmark del reconocimiento facial a escala
+
+Sintetiza N plantillas (por defecto 1k, 10k y 50k), ejecuta el mismo
+camino que /api/facial/login (embedding de la captura, galería residente
+con control de versión, búsqueda y lectura del usuario) contra una base de
+datos local en memoria y reporta latencias p50/p95/p99, memoria de la
+galería y logins por segundo por núcleo.
+
+Uso (desde la raíz del proyecto):
+    python scripts/benchmark_facial.py
+    python scripts/benchmark_facial.py --tamanos 1000 10000 --consultas 500
+    python scripts/benchmark_facial.py --max-p95-ms 20 --json resultados.json
+
+Con --max-p95-ms el script termina con código 1 si algún tamaño supera el
+umbral, para usarlo como control antes de desplegar.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+_RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _RAIZ)
+sys.path.insert(0, os.path.join(_RAIZ, 'test'))
+
+import numpy as np
+import cv2
+
+from backend.services.rostros import (
+    EMBEDDING_DIM, UMBRAL_SIMILITUD, VERSION_MODELO, GaleriaResidente,
+    calcular_embedding, embedding_a_bytes
+)
+from auxiliares_pruebas import BaseDatosMemoria
+
+
+class BaseDatosLocal(BaseDatosMemoria):
+    """
+    Sustituto en memoria de DatabaseManager para las consultas del login
+    facial (rostros_usuario, versiones_datos y usuarios por id)
+
+    No mide el costo de red ni del driver: aísla el costo de la aplicación.
+    """
+
+    def __init__(self, filas_rostros, usuarios):
+        super().__init__()
+        self.filas_rostros = filas_rostros
+        self.usuarios = usuarios
+
+    def ejecutar_query(self, query, params=None):
+        if 'FROM rostros_usuario' in query:
+            if 'IN (' in query:
+                ids = set(params[2:])
+                return [dict(f) for f in self.filas_rostros if f['id_usuario'] in ids]
+            return [dict(f) for f in self.filas_rostros]
+        raise ValueError(f"Consulta no soportada por el benchmark: {query[:80]}")
+
+    def obtener_uno(self, query, params=None):
+        if 'FROM usuarios' in query:
+            return self.usuarios.get(params[0])
+        return super().obtener_uno(query, params)
+
+
+def rostro_sintetico(rng):
+    """Imagen 200x200 con estructura espacial (ruido suavizado)"""
+    base = rng.integers(0, 255, (200, 200, 3), dtype=np.uint8)
+    return cv2.GaussianBlur(base, (15, 15), 0)
+
+
+def variacion(rostro, rng):
+    """Otra captura del mismo rostro: cambio de brillo/contraste y ruido"""
+    alterado = rostro.astype(np.float32) * rng.uniform(0.8, 1.2) + rng.uniform(-20, 20)
+    alterado += rng.normal(0, 4, rostro.shape)
+    return np.clip(alterado, 0, 255).astype(np.uint8)
+
+
+def construir_base(n, sondas, rng):
+    """
+    N plantillas con embedding ya calculado; las primeras `sondas` provienen
+    de imágenes reales para que el login encuentre a su dueño
+    """
+    imagenes = [rostro_sintetico(rng) for _ in range(sondas)]
+    vectores = np.empty((n, EMBEDDING_DIM), dtype=np.float32)
+    for i, imagen in enumerate(imagenes):
+        vectores[i] = calcular_embedding(imagen)
+    # Resto de la galería: vectores aleatorios normalizados (mismo tamaño y
+    # distribución de similitudes cercana a cero, como rostros distintos)
+    aleatorios = rng.standard_normal((n - sondas, EMBEDDING_DIM)).astype(np.float32)
+    aleatorios -= aleatorios.mean(axis=1, keepdims=True)
+    aleatorios /= np.linalg.norm(aleatorios, axis=1, keepdims=True)
+    vectores[sondas:] = aleatorios
+
+    filas = [
+        {'id': i + 1, 'id_usuario': i + 1, 'embedding': embedding_a_bytes(v), 'plantilla': None}
+        for i, v in enumerate(vectores)
+    ]
+    usuarios = {
+        i + 1: {'id': i + 1, 'documento': str(1000000 + i), 'nombres': 'Usuario',
+                'apellidos': str(i + 1), 'email': None, 'id_rol': 4, 'nombre_rol': 'Aprendiz'}
+        for i in range(sondas)
+    }
+    return BaseDatosLocal(filas, usuarios), imagenes
+
+
+def login_equivalente(galeria_residente, db, rostro):
+    """Mismo camino que login_facial después de detectar el rostro"""
+    consulta = calcular_embedding(rostro)
+    galeria = galeria_residente.obtener(db)
+    id_usuario, similitud = galeria.buscar(consulta)
+    usuario = None
+    if similitud >= UMBRAL_SIMILITUD:
+        usuario = db.obtener_uno("SELECT ... FROM usuarios u WHERE u.id = %s", (id_usuario,))
+    return usuario, similitud
+
+
+def percentiles(tiempos_ms):
+    return {
+        'p50_ms': round(float(np.percentile(tiempos_ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(tiempos_ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(tiempos_ms, 99)), 3),
+        'max_ms': round(float(np.max(tiempos_ms)), 3),
+    }
+
+
+def medir(n, consultas, sondas, hilos, semilla):
+    rng = np.random.default_rng(semilla)
+    db, imagenes = construir_base(n, sondas, rng)
+    capturas = [(i % sondas + 1, variacion(imagenes[i % sondas], rng)) for i in range(consultas)]
+
+    # Carga en frío: lectura y armado de la matriz residente
+    galeria_residente = GaleriaResidente()
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    galeria = galeria_residente.obtener(db)
+    carga_ms = (time.perf_counter() - inicio) * 1000
+    _, pico_carga = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Calentamiento (caches de CPU, BLAS)
+    for _, captura in capturas[:10]:
+        login_equivalente(galeria_residente, db, captura)
+
+    tiempos, aciertos = [], 0
+    for esperado, captura in capturas:
+        inicio = time.perf_counter()
+        usuario, _ = login_equivalente(galeria_residente, db, captura)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        aciertos += bool(usuario and usuario['id'] == esperado)
+
+    tiempos = np.array(tiempos)
+    resultado = {
+        'plantillas': n,
+        'consultas': consultas,
+        **percentiles(tiempos),
+        'logins_por_segundo_nucleo': round(1000 / tiempos.mean(), 1),
+        'galeria_mb': round((galeria.matriz.nbytes + galeria.ids.nbytes) / 2**20, 2),
+        'pico_carga_mb': round(pico_carga / 2**20, 2),
+        'carga_fria_ms': round(carga_ms, 1),
+        'aciertos': round(aciertos / consultas, 4),
+    }
+
+    if hilos > 1:
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=hilos) as pool:
+            list(pool.map(lambda c: login_equivalente(galeria_residente, db, c[1]), capturas))
+        resultado[f'logins_por_segundo_{hilos}_hilos'] = round(
+            consultas / (time.perf_counter() - inicio), 1)
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del login facial')
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[1000, 10000, 50000],
+                        help='Plantillas en la galería (default: 1000 10000 50000)')
+    parser.add_argument('--consultas', type=int, default=300, help='Logins medidos por tamaño')
+    parser.add_argument('--sondas', type=int, default=50,
+                        help='Usuarios con imagen real entre las plantillas')
+    parser.add_argument('--hilos', type=int, default=os.cpu_count() or 1,
+                        help='Hilos para medir el throughput concurrente (1 = omitir)')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--json', help='Guardar resultados en este archivo')
+    parser.add_argument('--max-p95-ms', type=float,
+                        help='Falla (código 1) si el p95 de algún tamaño supera este valor')
+    args = parser.parse_args()
+
+    print(f"🔬 Benchmark login facial: embedding {EMBEDDING_DIM} dims, {VERSION_MODELO}")
+    resultados = []
+    for n in args.tamanos:
+        sondas = min(args.sondas, n)
+        r = medir(n, args.consultas, sondas, args.hilos, args.semilla)
+        resultados.append(r)
+        extra = f"  {r[f'logins_por_segundo_{args.hilos}_hilos']}/s con {args.hilos} hilos" if args.hilos > 1 else ''
+        print(f"  N={n:>6}  p50={r['p50_ms']:.2f} ms  p95={r['p95_ms']:.2f} ms  p99={r['p99_ms']:.2f} ms  "
+              f"{r['logins_por_segundo_nucleo']}/s/núcleo{extra}  galería={r['galeria_mb']} MB  "
+              f"carga={r['carga_fria_ms']} ms  aciertos={r['aciertos']:.0%}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+        print(f"📄 Resultados guardados en {args.json}")
+
+    if args.max_p95_ms is not None:
+        excedidos = [r for r in resultados if r['p95_ms'] > args.max_p95_ms]
+        if excedidos:
+            for r in excedidos:
+                print(f"❌ N={r['plantillas']}: p95 {r['p95_ms']} ms > {args.max_p95_ms} ms")
+            sys.exit(1)
+        print(f"✅ p95 dentro del umbral ({args.max_p95_ms} ms)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Utilidades compartidas por las pruebas sin base de datos
+
+- BaseDatosMemoria: sustituto en memoria de DatabaseManager con los
+  contadores de versiones_datos (leer_version / incrementar_version) y
+  transacciones. Cada prueba hereda de ella y define solo las consultas
+  de sus tablas (ejecutar_query).
+- ejecutar_pruebas: corre las funciones test_* de un módulo sin pytest.
+
+Uso desde un módulo de pruebas (test/ está en sys.path con pytest y al
+ejecutar el archivo directamente):
+    from auxiliares_pruebas import BaseDatosMemoria, ejecutar_pruebas
+
+    if __name__ == "__main__":
+        sys.exit(ejecutar_pruebas(globals()))
+"""
+
+import inspect
+from contextlib import contextmanager
+
+
+class _TransaccionMemoria:
+    """Lo que incrementar_version usa de Transaccion"""
+
+    def __init__(self, db):
+        self._db = db
+        self._ultima_version = None
+
+    def ejecutar(self, query, params=None):
+        if 'versiones_datos' not in query:
+            raise ValueError(f"Escritura no soportada en memoria: {query[:80]}")
+        self._ultima_version = self._db.cambio_externo(params[0])
+        return 1
+
+    def obtener_uno(self, query, params=None):
+        if 'LAST_INSERT_ID' in query:
+            return {'version': self._ultima_version}
+        return self._db.obtener_uno(query, params)
+
+
+class BaseDatosMemoria:
+    """
+    Sustituto en memoria de DatabaseManager
+
+    Implementa los contadores de versiones_datos; las subclases agregan las
+    consultas de sus tablas sobreescribiendo ejecutar_query (y obtener_uno
+    si lo necesitan, delegando en esta clase para versiones_datos).
+    """
+
+    def __init__(self):
+        self.versiones = {}  # nombre -> versión
+
+    def version(self, nombre):
+        return self.versiones.get(nombre, 0)
+
+    def cambio_externo(self, nombre):
+        """Incrementa una versión (como lo haría otro worker) y la retorna"""
+        self.versiones[nombre] = self.version(nombre) + 1
+        return self.versiones[nombre]
+
+    def obtener_uno(self, query, params=None):
+        if 'versiones_datos' in query:
+            return {'version': self.version(params[0])}
+        raise ValueError(f"Consulta no soportada en memoria: {query[:80]}")
+
+    @contextmanager
+    def transaccion(self):
+        yield _TransaccionMemoria(self)
+
+    def ejecutar_query(self, query, params=None):
+        raise NotImplementedError
+
+    def ejecutar_muchos(self, query, params_list):
+        return len(params_list)
+
+
+def ejecutar_pruebas(espacio):
+    """
+    Ejecuta las funciones test_* de un módulo en orden de definición
+
+    Args:
+        espacio: globals() del módulo de pruebas
+
+    Returns:
+        Código de salida: 0 si todas pasan, 1 si alguna falla
+    """
+    pruebas = sorted(
+        (f for nombre, f in espacio.items() if nombre.startswith('test_') and inspect.isfunction(f)),
+        key=lambda f: f.__code__.co_firstlineno
+    )
+    fallidas = 0
+    for prueba in pruebas:
+        try:
+            prueba()
+            print(f"✅ {prueba.__name__}")
+        except AssertionError as e:
+            fallidas += 1
+            print(f"❌ {prueba.__name__}: {e}")
+    print(f"📈 {len(pruebas) - fallidas}/{len(pruebas)} pruebas correctas")
+    return 0 if fallidas == 0 else 1
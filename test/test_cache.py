@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la caché de la API (backend/utils/cache.py)
+
+No requieren base de datos: las consultas fallidas se simulan con un
+DatabaseManager cuya conexión lanza el error de mysql.connector.
+
+Uso:
+    python -m pytest test/test_cache.py
+    python test/test_cache.py
+"""
+
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+from flask import Flask, jsonify
+from mysql.connector import errors
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.utils import cache as C
+from backend.utils.database import DatabaseManager, errores_consulta_request
+from auxiliares_pruebas import ejecutar_pruebas
+
+
+def test_lru_desaloja_la_menos_usada():
+    cache = C.CacheLocal(max_entradas=3)
+    for clave in ('a', 'b', 'c'):
+        cache.guardar(clave, clave.upper(), 60)
+    assert cache.obtener('a') == 'A'  # 'a' pasa a ser la más reciente
+    cache.guardar('d', 'D', 60)
+    assert cache.obtener('b') is None
+    assert [cache.obtener(c) for c in ('a', 'c', 'd')] == ['A', 'C', 'D']
+    assert cache.entradas() == 3
+
+
+def test_ttl_vence_por_entrada():
+    cache = C.CacheLocal()
+    cache.guardar('corta', 1, 0.05)
+    cache.guardar('larga', 2, 60)
+    time.sleep(0.1)
+    assert cache.obtener('corta') is None
+    assert cache.obtener('larga') == 2
+
+
+def test_contadores_no_se_desalojan():
+    cache = C.CacheLocal(max_entradas=2)
+    cache.incrementar('version:x')
+    for i in range(5):
+        cache.guardar(f'k{i}', i, 60)
+    assert cache.contador('version:x') == 1
+
+
+def test_invalidar_cambia_la_version():
+    api = C.CacheAPI(max_entradas=10)
+    calculos = []
+
+    def calcular():
+        calculos.append(1)
+        return len(calculos)
+
+    assert api.obtener_o_calcular('labs', '/x', calcular) == 1
+    assert api.obtener_o_calcular('labs', '/x', calcular) == 1
+    api.invalidar('otro')
+    assert api.obtener_o_calcular('labs', '/x', calcular) == 1
+    api.invalidar('labs')
+    assert api.obtener_o_calcular('labs', '/x', calcular) == 2
+    assert api.estadisticas()['aciertos'] == 2 and api.estadisticas()['fallos'] == 2
+
+
+def test_invalidar_tablas_vinculadas():
+    api = C.CacheAPI(max_entradas=10)
+    api.vincular_tablas('categorias', 'categorias_equipos')
+    api.vincular_tablas('labs', 'laboratorios', 'Equipos')
+    api.obtener_o_calcular('categorias', '/c', lambda: 'c1')
+    api.obtener_o_calcular('labs', '/l', lambda: 'l1')
+
+    api.invalidar_tablas(['equipos'])
+    assert api.obtener_o_calcular('categorias', '/c', lambda: 'c2') == 'c1'
+    assert api.obtener_o_calcular('labs', '/l', lambda: 'l2') == 'l2'
+    api.invalidar_tablas(['usuarios'])
+    assert api.obtener_o_calcular('labs', '/l', lambda: 'l3') == 'l2'
+
+
+class DatabaseManagerCaido(DatabaseManager):
+    """DatabaseManager sin servidor: toda consulta falla"""
+
+    def __init__(self):
+        super().__init__({})
+        self.disponible = False
+
+    @contextmanager
+    def _conexion(self):
+        if not self.disponible:
+            raise errors.InterfaceError("Can't connect to MySQL server")
+        yield None
+
+
+def _app_con_endpoint(db, espacio):
+    app = Flask(__name__)
+
+    @app.route('/lista')
+    @C.cachear_respuesta(espacio)
+    def lista():
+        if db.disponible:
+            return jsonify({'datos': [1, 2]})
+        return jsonify({'datos': db.ejecutar_query("SELECT 1") or []})
+
+    return app
+
+
+def test_no_cachea_respuesta_con_consulta_fallida():
+    """Una caída de la BD no deja una lista vacía en caché hasta el TTL"""
+    anterior = C.cache_api
+    C.cache_api = C.CacheAPI(max_entradas=10)
+    try:
+        db = DatabaseManagerCaido()
+        cliente = _app_con_endpoint(db, 'lista_prueba').test_client()
+
+        respuesta = cliente.get('/lista')
+        assert respuesta.status_code == 200 and respuesta.get_json() == {'datos': []}
+        assert 'X-Cache' not in respuesta.headers
+        assert C.cache_api.backend.entradas() == 0
+
+        # La BD vuelve: la siguiente petición calcula y guarda
+        db.disponible = True
+        respuesta = cliente.get('/lista')
+        assert respuesta.get_json() == {'datos': [1, 2]} and respuesta.headers['X-Cache'] == 'MISS'
+        respuesta = cliente.get('/lista')
+        assert respuesta.get_json() == {'datos': [1, 2]} and respuesta.headers['X-Cache'] == 'HIT'
+    finally:
+        C.cache_api = anterior
+
+
+def test_errores_consulta_por_request():
+    db = DatabaseManagerCaido()
+    assert db.ejecutar_query("SELECT 1") == [] and errores_consulta_request() == 0
+    with Flask(__name__).test_request_context('/'):
+        assert errores_consulta_request() == 0
+        db.ejecutar_query("SELECT 1")
+        assert db.obtener_uno("SELECT 1") is None
+        assert errores_consulta_request() == 2
+    with Flask(__name__).test_request_context('/'):
+        assert errores_consulta_request() == 0
+
+
+if __name__ == "__main__":
+    sys.exit(ejecutar_pruebas(globals()))
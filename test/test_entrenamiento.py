@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Pruebas del worker de entrenamiento (backend/services/entrenamiento.py)
+
+No requieren base de datos: las operaciones de la cola se reemplazan por
+funciones de prueba.
+
+Uso:
+    python -m pytest test/test_entrenamiento.py
+    python test/test_entrenamiento.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mysql.connector import errors
+
+from backend.services import entrenamiento as E
+from auxiliares_pruebas import ejecutar_pruebas
+
+
+class _Detener(BaseException):
+    """Termina el bucle infinito del worker desde la prueba"""
+
+
+def _con_cola(tomar, ejecutar):
+    """Ejecuta el worker con tomar_siguiente/ejecutar_trabajo de prueba"""
+    originales = E.recuperar_interrumpidos, E.tomar_siguiente, E.ejecutar_trabajo
+    E.recuperar_interrumpidos = lambda db: None
+    E.tomar_siguiente = tomar
+    E.ejecutar_trabajo = ejecutar
+    try:
+        E.ejecutar_worker(None, intervalo=0)
+    except _Detener:
+        pass
+    finally:
+        E.recuperar_interrumpidos, E.tomar_siguiente, E.ejecutar_trabajo = originales
+
+
+def test_worker_sobrevive_errores_de_base_de_datos():
+    respuestas = [
+        errors.DatabaseError("Deadlock found when trying to get lock"),
+        errors.OperationalError("Lost connection to MySQL server"),
+        {'id': 7},
+        None,
+    ]
+    ejecutados = []
+
+    def tomar(db, worker):
+        if not respuestas:
+            raise _Detener()
+        respuesta = respuestas.pop(0)
+        if isinstance(respuesta, Exception):
+            raise respuesta
+        return respuesta
+
+    _con_cola(tomar, lambda db, trabajo: ejecutados.append(trabajo['id']))
+    # Tras dos errores transitorios el worker siguió y ejecutó el trabajo
+    assert ejecutados == [7]
+    assert respuestas == []
+
+
+if __name__ == "__main__":
+    sys.exit(ejecutar_pruebas(globals()))
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Pruebas del índice de hash perceptual (backend/services/hash_perceptual.py)
+
+No requieren base de datos: el índice residente se prueba con una base
+de datos en memoria (BaseDatosMemoria).
+
+Uso:
+    python -m pytest test/test_hash_perceptual.py
+    python test/test_hash_perceptual.py
+"""
+
+import os
+import sys
+
+import numpy as np
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.services import hash_perceptual as H
+from auxiliares_pruebas import BaseDatosMemoria, ejecutar_pruebas
+
+
+def _hash_aleatorio(rng):
+    return f"{int(rng.integers(0, 2 ** 63)) | (int(rng.integers(0, 2)) << 63):016x}"
+
+
+def _con_bits_cambiados(phash, bits, rng):
+    valor = int(phash, 16)
+    for bit in rng.choice(64, bits, replace=False):
+        valor ^= 1 << int(bit)
+    return f"{valor:016x}"
+
+
+def _fuerza_bruta(entradas, phash, radio):
+    return sorted(
+        (dato['id'], H.distancia_hamming(phash, h))
+        for h, dato in entradas if H.distancia_hamming(phash, h) <= radio
+    )
+
+
+def test_busqueda_igual_a_fuerza_bruta():
+    """El multi-index hashing encuentra lo mismo que comparar contra todos"""
+    rng = np.random.default_rng(0)
+    indice, entradas = H.IndiceHashes(), []
+    consultas = [_hash_aleatorio(rng) for _ in range(20)]
+    # Vecinos plantados a distancias 0..14 de cada consulta, más ruido
+    for consulta in consultas:
+        for bits in range(15):
+            entradas.append((_con_bits_cambiados(consulta, bits, rng), {'id': len(entradas)}))
+    entradas += [(_hash_aleatorio(rng), {'id': len(entradas) + i}) for i in range(3000)]
+    # Hash repetido con dos entradas
+    entradas.append((entradas[0][0], {'id': len(entradas)}))
+    for phash, dato in entradas:
+        indice.agregar(phash, dato)
+
+    assert len(indice) == len(entradas)
+    for radio in (0, 3, 7, H.DISTANCIA_MAXIMA, 13):
+        for consulta in consultas:
+            encontrados = indice.buscar(consulta, radio)
+            assert sorted((e['id'], e['distancia']) for e in encontrados) == _fuerza_bruta(entradas, consulta, radio)
+            assert [e['distancia'] for e in encontrados] == sorted(e['distancia'] for e in encontrados)
+
+
+def test_copia_independiente():
+    indice = H.IndiceHashes()
+    indice.agregar('0000000000000000', {'id': 1})
+    copia = indice.copia()
+    copia.agregar('0000000000000001', {'id': 2})
+    copia.agregar('0000000000000000', {'id': 3})
+    assert [e['id'] for e in indice.buscar('0000000000000000')] == [1]
+    assert sorted(e['id'] for e in copia.buscar('0000000000000000')) == [1, 2, 3]
+
+
+def test_phash_tolera_recompresion_y_brillo():
+    rng = np.random.default_rng(1)
+    imagen = cv2.GaussianBlur(rng.integers(0, 255, (240, 320, 3), dtype=np.uint8), (31, 31), 0)
+    imagen = cv2.normalize(imagen, None, 0, 255, cv2.NORM_MINMAX)
+    otra = cv2.GaussianBlur(rng.integers(0, 255, (240, 320, 3), dtype=np.uint8), (31, 31), 0)
+    otra = cv2.normalize(otra, None, 0, 255, cv2.NORM_MINMAX)
+    base = H.calcular_phash(imagen)
+
+    _, jpeg = cv2.imencode('.jpg', cv2.resize(imagen, (160, 120)), [cv2.IMWRITE_JPEG_QUALITY, 50])
+    assert H.distancia_hamming(base, H.phash_desde_bytes(jpeg.tobytes())) <= 4
+    assert H.distancia_hamming(base, H.calcular_phash(cv2.convertScaleAbs(imagen, alpha=1.1, beta=10))) <= 4
+    assert H.distancia_hamming(base, H.calcular_phash(otra)) > H.DISTANCIA_MAXIMA
+    assert H.calcular_phash(np.empty((0, 0), dtype=np.uint8)) is None
+    assert H.phash_desde_bytes(b'no es una imagen') is None
+
+
+class BaseDatosImagenes(BaseDatosMemoria):
+    """imagenes_entrenamiento y fotos de equipos en memoria"""
+
+    def __init__(self):
+        super().__init__()
+        self.imagenes = []  # imagenes_entrenamiento
+        self.equipos = []
+        self.cargas = 0
+
+    def ejecutar_query(self, query, params=None):
+        if 'imagenes_entrenamiento' in query:
+            self.cargas += 1
+            return [dict(i) for i in self.imagenes]
+        return [dict(e) for e in self.equipos]
+
+
+def test_indice_residente_sincronizado_por_version():
+    db = BaseDatosImagenes()
+    db.imagenes.append({'id': 1, 'id_equipo': 10, 'ruta_imagen': '/x.jpg', 'phash': 'ffff000000000000'})
+    residente = H.IndiceResidente()
+
+    assert len(residente.obtener(db)) == 1
+    assert len(residente.obtener(db)) == 1
+    assert db.cargas == 1
+
+    # Imagen agregada por este worker: se suma sin recargar
+    db.imagenes.append({'id': 2, 'id_equipo': 11, 'ruta_imagen': '/y.jpg', 'phash': '0000ffff00000000'})
+    anterior = residente.obtener(db)
+    residente.notificar_cambio(db, [('0000ffff00000000', {'origen': 'entrenamiento', 'id': 2, 'id_equipo': 11})])
+    indice = residente.obtener(db)
+    assert db.cargas == 1
+    assert len(indice) == 2 and len(anterior) == 1
+    assert indice.buscar('0000ffff00000001')[0]['id_equipo'] == 11
+
+    # Cambio de otro worker: la versión salta y se recarga
+    db.cambio_externo(H.IndiceResidente.NOMBRE_VERSION)
+    db.imagenes.pop(0)
+    assert len(residente.obtener(db)) == 1
+    assert db.cargas == 2
+
+    # Cambio sin detalle (p. ej. reemplazo de foto): se recarga en el próximo uso
+    residente.notificar_cambio(db)
+    residente.obtener(db)
+    assert db.cargas == 3
+
+
+if __name__ == "__main__":
+    sys.exit(ejecutar_pruebas(globals()))
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Pruebas del despachador de lotes (backend/utils/lotes.py)
+
+Las solicitudes concurrentes se controlan con una función de lote que se
+bloquea en la primera llamada: mientras tanto las demás quedan en cola y
+forman el siguiente lote, sin depender de tiempos.
+
+Uso:
+    python -m pytest test/test_lotes.py
+    python test/test_lotes.py
+"""
+
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.utils.lotes import DespachadorLotes
+from auxiliares_pruebas import ejecutar_pruebas
+
+
+class FuncionLote:
+    """Duplica las entradas; registra los lotes y las llamadas simultáneas"""
+
+    def __init__(self, error=None):
+        self.lotes = []
+        self.error = error
+        self.bloqueo = threading.Event()
+        self.bloqueo.set()
+        self.en_curso = 0
+        self.max_en_curso = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, lote):
+        with self._lock:
+            self.en_curso += 1
+            self.max_en_curso = max(self.max_en_curso, self.en_curso)
+        try:
+            self.bloqueo.wait(5)
+            time.sleep(0.005)
+            self.lotes.append(len(lote))
+            if self.error is not None:
+                raise self.error
+            return lote * 2
+        finally:
+            with self._lock:
+                self.en_curso -= 1
+
+
+def _en_paralelo(despachador, entradas, **kwargs):
+    """Lanza predecir() por cada entrada en su propio hilo; retorna (hilos, resultados)"""
+    resultados = [None] * len(entradas)
+
+    def llamar(i):
+        try:
+            resultados[i] = despachador.predecir(entradas[i], **kwargs)
+        except Exception as e:
+            resultados[i] = e
+
+    hilos = [threading.Thread(target=llamar, args=(i,)) for i in range(len(entradas))]
+    for hilo in hilos:
+        hilo.start()
+    return hilos, resultados
+
+
+def _esperar_cola(despachador, n):
+    limite = time.monotonic() + 5
+    while despachador._cola.qsize() < n:
+        assert time.monotonic() < limite, "las solicitudes no llegaron a la cola"
+        time.sleep(0.001)
+
+
+def _con_primer_lote_bloqueado(funcion, despachador, n):
+    """Ocupa el hilo con una solicitud y encola n más; retorna todos los resultados"""
+    funcion.bloqueo.clear()
+    primero, resultado_primero = _en_paralelo(despachador, [np.full(2, -1.0)])
+    limite = time.monotonic() + 5
+    while funcion.en_curso == 0:
+        assert time.monotonic() < limite
+        time.sleep(0.001)
+    entradas = [np.full(2, float(i)) for i in range(n)]
+    hilos, resultados = _en_paralelo(despachador, entradas)
+    _esperar_cola(despachador, n)
+    funcion.bloqueo.set()
+    for hilo in primero + hilos:
+        hilo.join(5)
+    return entradas, resultado_primero + resultados
+
+
+def test_solicitudes_concurrentes_en_un_lote():
+    funcion = FuncionLote()
+    despachador = DespachadorLotes(funcion, max_lote=16, espera_ms=1)
+    entradas, resultados = _con_primer_lote_bloqueado(funcion, despachador, 8)
+    assert funcion.lotes == [1, 8]
+    # Cada solicitud recibe su propia fila
+    for entrada, resultado in zip(entradas, resultados[1:]):
+        assert np.array_equal(resultado, entrada * 2)
+    assert despachador.estadisticas()['lote_mayor'] == 8
+    despachador.cerrar()
+
+
+def test_max_lote():
+    funcion = FuncionLote()
+    despachador = DespachadorLotes(funcion, max_lote=4, espera_ms=1)
+    _, resultados = _con_primer_lote_bloqueado(funcion, despachador, 10)
+    assert funcion.lotes == [1, 4, 4, 2]
+    assert all(isinstance(r, np.ndarray) for r in resultados)
+    despachador.cerrar()
+
+
+def test_error_llega_a_todas_las_solicitudes():
+    funcion = FuncionLote(error=ValueError("modelo no disponible"))
+    despachador = DespachadorLotes(funcion, max_lote=16, espera_ms=1)
+    _, resultados = _con_primer_lote_bloqueado(funcion, despachador, 5)
+    assert funcion.lotes == [1, 5]
+    assert all(isinstance(r, ValueError) for r in resultados)
+    despachador.cerrar()
+
+
+def test_timeout():
+    funcion = FuncionLote()
+    funcion.bloqueo.clear()
+    despachador = DespachadorLotes(funcion, max_lote=4, espera_ms=1)
+    try:
+        despachador.predecir(np.zeros(2), timeout=0.05)
+        assert False, "se esperaba TimeoutError"
+    except TimeoutError:
+        pass
+    finally:
+        funcion.bloqueo.set()
+        despachador.cerrar()
+
+
+def test_cerrado_atiende_la_cola_y_no_llama_en_paralelo():
+    funcion = FuncionLote()
+    despachador = DespachadorLotes(funcion, max_lote=16, espera_ms=1)
+
+    # Lote en curso y solicitudes en cola al cerrar: se atienden igual
+    funcion.bloqueo.clear()
+    primero, resultados_en_cola = _en_paralelo(despachador, [np.ones(2)])
+    while funcion.en_curso == 0:
+        time.sleep(0.001)
+    en_cola, resultados_cola = _en_paralelo(despachador, [np.full(2, 3.0)] * 3)
+    _esperar_cola(despachador, 3)
+    despachador.cerrar()
+
+    # Tras cerrar(): llamadas directas, nunca simultáneas con el hilo ni entre sí
+    directos, resultados_directos = _en_paralelo(despachador, [np.full(2, 5.0)] * 6)
+    time.sleep(0.02)
+    funcion.bloqueo.set()
+    for hilo in primero + en_cola + directos:
+        hilo.join(5)
+
+    assert np.array_equal(resultados_en_cola[0], np.full(2, 2.0))
+    assert all(np.array_equal(r, np.full(2, 6.0)) for r in resultados_cola)
+    assert all(np.array_equal(r, np.full(2, 10.0)) for r in resultados_directos)
+    assert funcion.max_en_curso == 1
+    assert sorted(funcion.lotes) == [1] * 7 + [3]
+
+
+if __name__ == "__main__":
+    sys.exit(ejecutar_pruebas(globals()))
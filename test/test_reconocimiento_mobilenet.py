@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Pruebas del reconocimiento de equipos (backend/reconocimiento_mobilenet.py)
+
+No requieren base de datos ni el modelo MobileNetV2 entrenado. Las pruebas
+que usan Keras se omiten si TensorFlow no está instalado.
+
+Uso:
+    python -m pytest test/test_reconocimiento_mobilenet.py
+    python test/test_reconocimiento_mobilenet.py
+"""
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend import reconocimiento_mobilenet as RM
+from auxiliares_pruebas import ejecutar_pruebas
+
+
+def test_metricas_de_la_epoca_restaurada_sin_parada_temprana():
+    """Entrenamiento hasta la última época con la mejor val_loss antes"""
+    if not RM._importar_tensorflow():
+        print("⚠️ TensorFlow no instalado: prueba omitida")
+        return
+    tf = RM.tf
+    # val_loss mínima en la época 3 (índice 2); después empeora durante
+    # menos épocas que la paciencia, así que no hay parada temprana
+    val_loss = [5.0, 4.0, 1.0, 2.0, 3.0, 4.0]
+    pesos_por_epoca = []
+
+    def forzar_val_loss(epoca, logs):
+        logs['val_loss'] = val_loss[epoca]
+        pesos_por_epoca.append([w.copy() for w in modelo.get_weights()])
+
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=(32, 4)).astype(np.float32)
+    y = rng.integers(0, 2, 32)
+    modelo = tf.keras.Sequential([tf.keras.Input((4,)), tf.keras.layers.Dense(2, activation='softmax')])
+    modelo.compile(optimizer=tf.keras.optimizers.SGD(0.5), loss='sparse_categorical_crossentropy',
+                   metrics=['accuracy'])
+    parada = RM.EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)
+    historial = modelo.fit(
+        x, y, epochs=len(val_loss), validation_data=(x, y), verbose=0,
+        callbacks=[tf.keras.callbacks.LambdaCallback(on_epoch_end=forzar_val_loss), parada]
+    ).history
+
+    assert len(historial['accuracy']) == len(val_loss) and parada.stopped_epoch == 0
+    assert parada.best_epoch == 2
+    # Keras restauró los pesos de la mejor época aunque no se detuvo
+    for restaurado, guardado in zip(modelo.get_weights(), pesos_por_epoca[2]):
+        assert np.array_equal(restaurado, guardado)
+
+    train_acc, val_acc = RM.ReconocimientoMobileNet._precision_epoca_restaurada(historial, parada)
+    assert train_acc == historial['accuracy'][2]
+    assert val_acc == historial['val_accuracy'][2]
+
+
+def _histogramas(n, semilla):
+    """Histogramas HSV como los del entrenamiento, de imágenes sintéticas"""
+    rng = np.random.default_rng(semilla)
+    return np.asarray([
+        RM.ReconocimientoMobileNet._calcular_histograma(
+            None, cv2.GaussianBlur(rng.integers(0, 255, (224, 224, 3), dtype=np.uint8), (21, 21), 0))
+        for _ in range(n)
+    ], dtype=np.float32)
+
+
+def test_comparar_igual_a_compare_hist():
+    """La comparación vectorizada reproduce cv2.compareHist contra cada referencia"""
+    referencias = _histogramas(12, 0)
+    consultas = _histogramas(4, 1)
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, 'referencias.npz')
+        np.savez(ruta, histogramas=referencias)
+        comparador = RM.ReferenciasHistograma(ruta, os.path.join(carpeta, 'no_existe.json'))
+
+        for h in list(consultas) + [referencias[3]]:
+            correlacion, chi, interseccion = comparador.comparar(h)
+            for metodo, obtenido in ((cv2.HISTCMP_CORREL, correlacion), (cv2.HISTCMP_CHISQR, chi),
+                                     (cv2.HISTCMP_INTERSECT, interseccion)):
+                esperado = np.array([cv2.compareHist(h, r, metodo) for r in referencias])
+                assert np.allclose(obtenido, esperado, rtol=1e-4, atol=1e-5), metodo
+
+
+def test_recarga_con_otro_archivo():
+    """Al cambiar el archivo se usan la matriz y sus derivados del archivo nuevo"""
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, 'referencias.npz')
+        comparador = RM.ReferenciasHistograma(ruta, os.path.join(carpeta, 'no_existe.json'))
+        assert comparador.comparar(_histogramas(1, 2)[0]) is None
+
+        np.savez(ruta, histogramas=_histogramas(5, 3))
+        matriz, centrada, normas = comparador.obtener()
+        assert len(matriz) == len(centrada) == len(normas) == 5
+
+        nuevas = _histogramas(8, 4)
+        np.savez(ruta, histogramas=nuevas)
+        os.utime(ruta, ns=(1, 1))  # firma distinta aunque el tamaño coincida
+        matriz, centrada, normas = comparador.obtener()
+        assert np.array_equal(matriz, nuevas) and len(centrada) == len(normas) == 8
+        assert all(len(r) == 8 for r in comparador.comparar(nuevas[0]))
+
+
+if __name__ == "__main__":
+    sys.exit(ejecutar_pruebas(globals()))
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Pruebas de los índices de vectores de equipos (backend/services/vectores_equipos.py)
+
+No requieren base de datos: el índice residente se prueba con una base
+de datos en memoria (BaseDatosMemoria).
+
+Uso:
+    python -m pytest test/test_vectores_equipos.py
+    python test/test_vectores_equipos.py
+"""
+
+import os
+import sys
+
+import numpy as np
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.services import vectores_equipos as V
+from auxiliares_pruebas import BaseDatosMemoria, ejecutar_pruebas
+
+
+def _vectores(n, semilla=0):
+    m = np.random.default_rng(semilla).normal(size=(n, V.VECTOR_DIM)).astype(np.float32)
+    return m / np.linalg.norm(m, axis=1, keepdims=True)
+
+
+def _agrupados(n, grupos=40, semilla=0):
+    """Vectores alrededor de `grupos` centros (como fotos de equipos parecidos)"""
+    rng = np.random.default_rng(semilla)
+    centros = _vectores(grupos, semilla + 1)
+    m = centros[rng.integers(0, grupos, n)] + 0.08 * rng.normal(size=(n, V.VECTOR_DIM)).astype(np.float32)
+    return (m / np.linalg.norm(m, axis=1, keepdims=True)).astype(np.float32)
+
+
+def test_ivf_tamanos_pequenos():
+    """N = 0, 1 y 2: sin errores y cada vector se encuentra a sí mismo"""
+    consulta = _vectores(1, 9)[0]
+    vacio = V.IndiceIVF([], [])
+    assert len(vacio) == 0 and vacio.buscar(consulta) == []
+
+    for n in (1, 2):
+        m = _vectores(n)
+        indice = V.IndiceIVF(list(range(1, n + 1)), list(m))
+        assert indice.centroides.shape[1] == V.VECTOR_DIM
+        for i in range(n):
+            assert indice.buscar(m[i], 1)[0][0] == i + 1
+        assert len(indice.buscar(consulta, 5)) == n
+
+
+def test_ivf_muchos_igual_a_plano():
+    m = _agrupados(3000)
+    ids = list(range(1000, 4000))
+    plano, ivf = V.IndicePlano(ids, list(m)), V.IndiceIVF(ids, list(m))
+    assert len(ivf.centroides) == int(np.sqrt(3000))
+    assert sum(len(lista) for lista in ivf.listas) == 3000
+
+    # Consultas: otras "fotos" de equipos indexados
+    rng = np.random.default_rng(5)
+    consultas = m[rng.choice(3000, 50, replace=False)] + 0.05 * rng.normal(size=(50, V.VECTOR_DIM)).astype(np.float32)
+    consultas /= np.linalg.norm(consultas, axis=1, keepdims=True)
+    aciertos = sum(
+        len({i for i, _ in ivf.buscar(q, 5)} & {i for i, _ in plano.buscar(q, 5)})
+        for q in consultas
+    )
+    assert aciertos / (5 * len(consultas)) >= 0.9
+
+    # Con todas las listas como sondas la búsqueda es exacta
+    exacto = V.IndiceIVF(ids, [m], centroides=ivf.centroides, sondas=len(ivf.centroides))
+    for q in consultas[:10]:
+        assert [i for i, _ in exacto.buscar(q, 5)] == [i for i, _ in plano.buscar(q, 5)]
+
+
+def test_actualizada_quitar_y_reinsertar():
+    m = _vectores(20)
+    nuevo = _vectores(1, 3)[0]
+    for clase in (V.IndicePlano, V.IndiceIVF):
+        original = clase(list(range(20)), list(m))
+
+        sin_5 = original.actualizada([5], [], [])
+        assert len(sin_5) == 19 and 5 not in [i for i, _ in sin_5.buscar(m[5], 19)]
+
+        # Reemplazo de la foto del equipo 5: sale el vector anterior, entra el nuevo
+        reemplazado = original.actualizada([5], [5], [nuevo])
+        assert len(reemplazado) == 20
+        assert reemplazado.buscar(nuevo, 1)[0][0] == 5
+        assert reemplazado.buscar(m[5], 1)[0][0] != 5
+
+        # El original no cambia (las búsquedas en curso siguen usándolo)
+        equipo, similitud = original.buscar(m[5], 1)[0]
+        assert len(original) == 20 and equipo == 5 and similitud > 0.999
+        assert type(reemplazado) is clase
+
+
+def test_ivf_crece_desde_vacio():
+    """Índice IVF creado sin fotos que recibe las primeras una a una"""
+    m = _agrupados(400)
+    indice = V.IndiceIVF([], [])
+    for i in range(400):
+        indice = indice.actualizada([], [i], [m[i]])
+        assert indice.buscar(m[i], 1)[0][0] == i
+    # Los centroides se reentrenaron al crecer (no quedó una sola lista)
+    assert len(indice.centroides) * 2 >= int(np.sqrt(400))
+
+
+def test_vector_de_imagen():
+    rng = np.random.default_rng(1)
+    imagen = cv2.GaussianBlur(rng.integers(0, 255, (240, 320, 3), dtype=np.uint8), (15, 15), 0)
+    vector = V.calcular_vector(imagen)
+    assert vector.shape == (V.VECTOR_DIM,) and abs(float(np.linalg.norm(vector)) - 1) < 1e-4
+    _, jpeg = cv2.imencode('.jpg', cv2.resize(imagen, (160, 120)), [cv2.IMWRITE_JPEG_QUALITY, 60])
+    assert float(vector @ V.vector_desde_bytes(jpeg.tobytes())) > 0.9
+    assert np.array_equal(V.bytes_a_vector(V.vector_a_bytes(vector)), vector)
+    assert V.bytes_a_vector(b'\x00' * 12) is None
+    assert V.calcular_vector(None) is None
+
+
+class BaseDatosEquipos(BaseDatosMemoria):
+    """Fotos de equipos en memoria (id -> vector)"""
+
+    def __init__(self):
+        super().__init__()
+        self.equipos = {}
+        self.cargas = []  # ids consultados en cada lectura (None = todos)
+
+    def ejecutar_query(self, query, params=None):
+        ids = [int(i) for i in params[1:]] if 'IN (' in query else None
+        self.cargas.append(ids)
+        return [
+            {'id': i, 'imagen_url': f'/uploads/equipos/{i}.jpg', 'imagen_vector': V.vector_a_bytes(v)}
+            for i, v in self.equipos.items() if ids is None or i in ids
+        ]
+
+
+def test_indice_residente_ivf():
+    """Primera foto con AI_IMAGES_INDICE=ivf, reemplazos y cambios de otro worker"""
+    tipo_anterior = V.TIPO_INDICE
+    V.TIPO_INDICE = 'ivf'
+    try:
+        db, residente = BaseDatosEquipos(), V.IndiceResidente()
+        m = _vectores(3)
+        assert len(residente.obtener(db)) == 0
+
+        db.equipos[1] = m[0]
+        residente.notificar_cambio(db, [1])
+        indice = residente.obtener(db)
+        assert indice.tipo == 'ivf' and indice.buscar(m[0], 1)[0][0] == 1
+
+        db.equipos[2] = m[1]
+        residente.notificar_cambio(db, [2])
+        assert residente.obtener(db).buscar(m[1], 1)[0][0] == 2
+        assert db.cargas == [None, [1], [2]]
+
+        # Foto eliminada
+        del db.equipos[1]
+        residente.notificar_cambio(db, [1])
+        assert [i for i, _ in residente.obtener(db).buscar(m[0], 5)] == [2]
+
+        # Cambio de otro worker: recarga completa
+        db.equipos[3] = m[2]
+        db.cambio_externo(V.IndiceResidente.NOMBRE_VERSION)
+        assert len(residente.obtener(db)) == 2
+        assert db.cargas[-1] is None
+    finally:
+        V.TIPO_INDICE = tipo_anterior
+
+
+if __name__ == "__main__":
+    sys.exit(ejecutar_pruebas(globals()))